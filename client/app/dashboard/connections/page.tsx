@@ -54,8 +54,9 @@ export default function Page() {
   const { latest } = useDataStore();
 
   // Always call hooks in the same order.
-  const analysis =
-    latest?.analysis_results?.congestion_analysis?.packet_flow || [];
+  // Not an array until the records have been paged in from the artifact
+  const flow = latest?.analysis_results?.congestion_analysis?.packet_flow;
+  const analysis = useMemo(() => (Array.isArray(flow) ? flow : []), [flow]);
 
   const packetFlow = useMemo(() => {
     return analysis
@@ -14,8 +14,10 @@ export default function Page() {
 
   const summary =
     analysis_data?.analysis_results?.delay_categorization?.summary;
-  const table_data =
+  const packet_flow =
     analysis_data?.analysis_results?.congestion_analysis?.packet_flow;
+  // Not an array until the records have been paged in from the artifact
+  const table_data = Array.isArray(packet_flow) ? packet_flow : null;
   console.log(analysis_data);
 
   return (
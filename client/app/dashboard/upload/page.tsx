@@ -18,6 +18,48 @@ import { useUser } from "@clerk/nextjs";
 
 // state management
 import { useDataStore } from "../../../store/useDataStore";
+import { resolvePacketFlow } from "@/lib/packet-flow";
+
+const API_URL = "http://localhost:8000";
+
+// Fills the stored capture in as the server publishes each analyzer's result.
+// Not tied to this page: it keeps running after the redirect to the dashboard.
+function followProgress(pcapng_id: string) {
+  const source = new EventSource(`${API_URL}/storage/${pcapng_id}/progress`);
+
+  source.addEventListener("result", async (event) => {
+    const { analyzer, result: published } = JSON.parse(
+      (event as MessageEvent).data
+    );
+    // Per-packet records are paged in from the capture's packet_flow artifact
+    const result =
+      analyzer === "congestion_analysis"
+        ? await resolvePacketFlow(API_URL, pcapng_id, published).catch(
+            (error) => {
+              console.error("Packet flow error:", error);
+              return { ...published, packet_flow: [] };
+            }
+          )
+        : published;
+    const { latest, setLatest } = useDataStore.getState();
+    if (latest?.pcapng_id !== pcapng_id) return;
+    setLatest({
+      ...latest,
+      analysis_results: { ...latest.analysis_results, [analyzer]: result },
+    });
+  });
+
+  source.addEventListener("complete", () => {
+    source.close();
+    toast("Analysis complete");
+  });
+
+  source.addEventListener("failed", (event) => {
+    source.close();
+    const { error } = JSON.parse((event as MessageEvent).data);
+    toast(`Analysis failed: ${error}`);
+  });
+}
 
 export default function Component() {
   // Properly type the file state
@@ -52,13 +94,19 @@ export default function Component() {
     // The backend is expecting user_id, but it's not being properly included in the request
     formData.append("user_id", user.id);
 
+    // The connections and overview charts render per-packet flow data
+    formData.append("detail", "packets");
+
+    // Answer right after the first look; results arrive over the progress stream
+    formData.append("background", "true");
+
     console.log("User ID being sent:", user.id);
     console.log("File being sent:", file.name);
 
     setUploading(true);
 
     try {
-      const response = await fetch("http://localhost:8000/storage/upload/", {
+      const response = await fetch(`${API_URL}/storage/upload/`, {
         method: "POST",
         body: formData,
       });
@@ -72,9 +120,14 @@ export default function Component() {
       const result = await response.json();
       console.log("Upload successful:", result);
 
-      setLatest(result);
+      setLatest({
+        pcapng_id: result.pcapng_id,
+        first_look: result.first_look,
+        analysis_results: {},
+      });
+      followProgress(result.pcapng_id);
 
-      toast("File uploaded successfully");
+      toast("File uploaded successfully, analysis running");
       router.push("/dashboard"); // Redirect to "/dashboard"
     } catch (error: unknown) {
       console.error("Upload error:", error);
@@ -98,7 +151,9 @@ export default function Component() {
             <span className="text-sm font-medium text-gray-500">
               Drag and drop a file or click to browse
             </span>
-            <span className="text-xs text-gray-500">.pcapng files only</span>
+            <span className="text-xs text-gray-500">
+              .pcap / .pcapng files, optionally .gz or .zst compressed
+            </span>
           </div>
           <div className="space-y-2 text-sm">
             <Label htmlFor="file" className="text-sm font-medium">
@@ -107,7 +162,7 @@ export default function Component() {
             <Input
               id="file"
               type="file"
-              accept=".pcapng"
+              accept=".pcap,.pcapng,.gz,.zst"
               onChange={handleFileChange}
             />
             {file && (
@@ -72,20 +72,29 @@ interface AnalysisResults {
 }
 
 interface DashboardProps {
-  analysisResults: AnalysisResults;
+  // Results arrive one analyzer at a time over the progress stream
+  analysisResults: Partial<AnalysisResults>;
 }
 
+const Pending = () => (
+  <p className="text-sm text-muted-foreground">Waiting for analysis results...</p>
+);
+
 const Dashboard: React.FC<DashboardProps> = ({ analysisResults }) => {
+  const congestion = analysisResults.congestion_analysis;
+  const delaySummary = analysisResults.delay_categorization?.summary;
+  const mqtt = analysisResults.mqtt_analysis;
+
   // -------------------------------
   // 1. Congestion Analysis Chart (Doughnut)
   // -------------------------------
-  const congestionData = {
+  const congestionData = congestion && {
     labels: ['Congestion Score', 'Remaining'],
     datasets: [
       {
         data: [
-          analysisResults.congestion_analysis.congestion_score,
-          100 - analysisResults.congestion_analysis.congestion_score,
+          congestion.congestion_score,
+          100 - congestion.congestion_score,
         ],
         backgroundColor: ['#34D399', '#D1D5DB'],
       },
@@ -95,17 +104,11 @@ const Dashboard: React.FC<DashboardProps> = ({ analysisResults }) => {
   // -------------------------------
   // 2. Delay Categorization Chart (Doughnut)
   // -------------------------------
-  const delayLabels = Object.keys(
-    analysisResults.delay_categorization.summary
-  );
-  const delayValues = Object.values(
-    analysisResults.delay_categorization.summary
-  );
-  const delayData = {
-    labels: delayLabels,
+  const delayData = delaySummary && {
+    labels: Object.keys(delaySummary),
     datasets: [
       {
-        data: delayValues,
+        data: Object.values(delaySummary),
         backgroundColor: ['#F87171', '#FBBF24', '#34D399', '#60A5FA'],
       },
     ],
@@ -114,17 +117,11 @@ const Dashboard: React.FC<DashboardProps> = ({ analysisResults }) => {
   // -------------------------------
   // 3. Protocol Distribution Chart (Pie Chart)
   // -------------------------------
-  const protocolLabels = Object.keys(
-    analysisResults.mqtt_analysis.protocol_distribution
-  );
-  const protocolValues = Object.values(
-    analysisResults.mqtt_analysis.protocol_distribution
-  );
-  const protocolData = {
-    labels: protocolLabels,
+  const protocolData = mqtt?.protocol_distribution && {
+    labels: Object.keys(mqtt.protocol_distribution),
     datasets: [
       {
-        data: protocolValues,
+        data: Object.values(mqtt.protocol_distribution),
         backgroundColor: ['#60A5FA', '#FBBF24', '#F87171', '#34D399', '#A78BFA'],
       },
     ],
@@ -133,7 +130,8 @@ const Dashboard: React.FC<DashboardProps> = ({ analysisResults }) => {
   // -------------------------------
   // 4. Latency Trend Chart (Line Chart) for All Packets
   // -------------------------------
-  const packetFlow = analysisResults.congestion_analysis.packet_flow || [];
+  const packetFlow =
+    congestion && Array.isArray(congestion.packet_flow) ? congestion.packet_flow : [];
   
   const latencyTrendLabels = packetFlow.map((packet, index) =>
     packet.timestamp ? new Date(packet.timestamp).toLocaleTimeString() : `Packet ${index + 1}`
@@ -186,12 +184,18 @@ const Dashboard: React.FC<DashboardProps> = ({ analysisResults }) => {
               <CardTitle>Congestion Analysis</CardTitle>
             </CardHeader>
             <CardContent>
-              <div style={chartContainerStyle}>
-                <Doughnut data={congestionData} options={chartOptions} />
-              </div>
-              <p className="mt-2">
-                Congestion Level: <strong>{analysisResults.congestion_analysis.congestion_level}</strong>
-              </p>
+              {congestion && congestionData ? (
+                <>
+                  <div style={chartContainerStyle}>
+                    <Doughnut data={congestionData} options={chartOptions} />
+                  </div>
+                  <p className="mt-2">
+                    Congestion Level: <strong>{congestion.congestion_level}</strong>
+                  </p>
+                </>
+              ) : (
+                <Pending />
+              )}
             </CardContent>
           </Card>
         </TabsContent>
@@ -203,9 +207,13 @@ const Dashboard: React.FC<DashboardProps> = ({ analysisResults }) => {
               <CardTitle>Delay Categorization</CardTitle>
             </CardHeader>
             <CardContent>
-              <div style={chartContainerStyle}>
-                <Doughnut data={delayData} options={chartOptions} />
-              </div>
+              {delayData ? (
+                <div style={chartContainerStyle}>
+                  <Doughnut data={delayData} options={chartOptions} />
+                </div>
+              ) : (
+                <Pending />
+              )}
             </CardContent>
           </Card>
         </TabsContent>
@@ -217,12 +225,18 @@ const Dashboard: React.FC<DashboardProps> = ({ analysisResults }) => {
               <CardTitle>Protocol Distribution</CardTitle>
             </CardHeader>
             <CardContent>
-              <div style={chartContainerStyle}>
-                <Pie data={protocolData} options={chartOptions} />
-              </div>
-              <p className="mt-2">
-                Total Packet Count: <strong>{analysisResults.mqtt_analysis.packet_count}</strong>
-              </p>
+              {mqtt && protocolData ? (
+                <>
+                  <div style={chartContainerStyle}>
+                    <Pie data={protocolData} options={chartOptions} />
+                  </div>
+                  <p className="mt-2">
+                    Total Packet Count: <strong>{mqtt.packet_count}</strong>
+                  </p>
+                </>
+              ) : (
+                <Pending />
+              )}
             </CardContent>
           </Card>
         </TabsContent>
@@ -234,9 +248,13 @@ const Dashboard: React.FC<DashboardProps> = ({ analysisResults }) => {
               <CardTitle>Latency Trend</CardTitle>
             </CardHeader>
             <CardContent>
-              <div style={chartContainerStyle}>
-                <Line data={latencyTrendData} options={chartOptions} />
-              </div>
+              {congestion ? (
+                <div style={chartContainerStyle}>
+                  <Line data={latencyTrendData} options={chartOptions} />
+                </div>
+              ) : (
+                <Pending />
+              )}
             </CardContent>
           </Card>
         </TabsContent>
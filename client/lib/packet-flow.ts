@@ -0,0 +1,67 @@
+/* eslint-disable @typescript-eslint/no-explicit-any */
+
+// Rows requested per call to the packet_flow artifact endpoint
+const PACKET_FLOW_PAGE_SIZE = 10000;
+
+// Per-packet congestion output is stored server-side as a columnar artifact;
+// the analysis result only references it: { artifact, rows } or, for the
+// retransmissions, { artifact, flag, count }.
+function isArtifactRef(value: any): boolean {
+  return value != null && !Array.isArray(value) && typeof value.artifact === "string";
+}
+
+async function fetchPacketFlow(
+  apiUrl: string,
+  pcapngId: string,
+  flag?: string
+): Promise<any[]> {
+  const records: any[] = [];
+  let total = Infinity;
+  while (records.length < total) {
+    const params = new URLSearchParams({
+      start: String(records.length),
+      stop: String(records.length + PACKET_FLOW_PAGE_SIZE),
+    });
+    if (flag) params.set("flag", flag);
+    const response = await fetch(
+      `${apiUrl}/storage/analysis/${pcapngId}/artifacts/packet_flow?${params}`
+    );
+    if (!response.ok) {
+      throw new Error(`Packet flow request failed: ${response.status}`);
+    }
+    const page = await response.json();
+    total = page.total;
+    if (page.records.length === 0) break;
+    records.push(...page.records);
+  }
+  return records;
+}
+
+// Replaces the artifact references in a congestion_analysis result with the
+// records they point to, so the charts and tables can keep reading arrays.
+export async function resolvePacketFlow(
+  apiUrl: string,
+  pcapngId: string,
+  congestion: any
+): Promise<any> {
+  if (!congestion) return congestion;
+  const resolved = { ...congestion };
+  if (isArtifactRef(congestion.packet_flow)) {
+    resolved.packet_flow = await fetchPacketFlow(apiUrl, pcapngId);
+  }
+  const tcp = congestion.detailed_metrics?.tcp_analysis;
+  if (isArtifactRef(tcp?.retransmissions)) {
+    resolved.detailed_metrics = {
+      ...congestion.detailed_metrics,
+      tcp_analysis: {
+        ...tcp,
+        retransmissions: await fetchPacketFlow(
+          apiUrl,
+          pcapngId,
+          tcp.retransmissions.flag
+        ),
+      },
+    };
+  }
+  return resolved;
+}
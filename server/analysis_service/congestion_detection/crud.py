@@ -0,0 +1,303 @@
+import math
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Hashable, List, Optional, Union
+
+import numpy as np
+from scapy.all import PacketList
+
+from analysis_storage.schema import DetailLevel
+from packet_extract_service.table import (
+    L4_UDP,
+    NO_HOST,
+    NO_PORT,
+    PacketTable,
+    as_packet_table,
+    group_rows,
+)
+
+# Detector defaults (delays in ms)
+EWMA_ALPHA = 0.05  # Weight of the newest sample in the baseline mean/variance
+WARMUP_SAMPLES = 20  # Samples used to learn the baseline before detecting
+DRIFT_STD = 0.5  # CUSUM allowance k, in baseline standard deviations
+THRESHOLD_STD = 8.0  # CUSUM decision threshold h, in baseline standard deviations
+RECOVERY_ALPHA = 0.3  # Fast EWMA used to decide that an event has ended
+MIN_DRIFT_MS = 1.0
+MIN_THRESHOLD_MS = 50.0  # Never flag less than this much accumulated excess delay
+
+
+class CusumDetector:
+    """
+    One-sided CUSUM change-point detector over an EWMA baseline.
+
+    Keeps O(1) state per series. The baseline mean and variance are learned
+    with exponentially weighted updates and frozen while an event is open,
+    so sustained congestion never becomes the new "normal". An event starts
+    when the accumulated excess delay S = max(0, S + x - mean - k) crosses
+    h, and ends once a fast EWMA of recent delays is back within mean + k.
+    """
+
+    __slots__ = (
+        "mean",
+        "var",
+        "samples",
+        "cusum",
+        "run_start",
+        "in_event",
+        "event_start",
+        "event_peak",
+        "event_sum",
+        "event_count",
+        "recent",
+        "last_timestamp",
+    )
+
+    def __init__(self):
+        self.mean = 0.0
+        self.var = 0.0
+        self.samples = 0
+        self.cusum = 0.0
+        self.run_start = None
+        self.in_event = False
+        self.event_start = None
+        self.event_peak = 0.0
+        self.event_sum = 0.0
+        self.event_count = 0
+        self.recent = 0.0
+        self.last_timestamp = None
+
+    def update(self, timestamp: float, delay_ms: float) -> Optional[Dict[str, Any]]:
+        """
+        Feeds one delay sample.
+
+        Returns:
+            A "start" or "end" event dictionary when the state changes,
+            otherwise None
+        """
+        self.last_timestamp = timestamp
+
+        if self.samples < WARMUP_SAMPLES:
+            self._learn(delay_ms)
+            return None
+
+        std = math.sqrt(self.var)
+        drift = max(MIN_DRIFT_MS, DRIFT_STD * std)
+        threshold = max(MIN_THRESHOLD_MS, THRESHOLD_STD * std)
+
+        if self.cusum == 0.0:
+            self.run_start = timestamp
+        self.cusum = max(0.0, self.cusum + delay_ms - self.mean - drift)
+
+        if self.in_event:
+            self.event_peak = max(self.event_peak, delay_ms)
+            self.event_sum += delay_ms
+            self.event_count += 1
+            self.recent += RECOVERY_ALPHA * (delay_ms - self.recent)
+            if self.recent <= self.mean + drift:
+                return self._close(timestamp)
+            return None
+
+        if self.cusum > threshold:
+            self.in_event = True
+            self.event_start = self.run_start
+            self.event_peak = delay_ms
+            self.event_sum = delay_ms
+            self.event_count = 1
+            self.recent = delay_ms
+            return {
+                "event": "start",
+                "start_time": self.event_start,
+                "detected_at": timestamp,
+                "baseline_delay_ms": self.mean,
+            }
+
+        # Only learn from samples that are not part of a congestion episode
+        self._learn(delay_ms)
+        return None
+
+    def finish(self) -> Optional[Dict[str, Any]]:
+        """Closes an open event at the last seen sample (end of input)."""
+        if self.in_event:
+            return self._close(self.last_timestamp)
+        return None
+
+    def _learn(self, delay_ms: float):
+        if self.samples == 0:
+            self.mean = delay_ms
+        else:
+            diff = delay_ms - self.mean
+            self.mean += EWMA_ALPHA * diff
+            self.var = (1 - EWMA_ALPHA) * (self.var + EWMA_ALPHA * diff * diff)
+        self.samples += 1
+
+    def _close(self, timestamp: float) -> Dict[str, Any]:
+        event = {
+            "event": "end",
+            "start_time": self.event_start,
+            "end_time": timestamp,
+            "duration": timestamp - self.event_start,
+            "baseline_delay_ms": self.mean,
+            "mean_delay_ms": self.event_sum / self.event_count,
+            "peak_delay_ms": self.event_peak,
+            "packets": self.event_count,
+        }
+        self.in_event = False
+        self.cusum = 0.0
+        self.event_count = 0
+        return event
+
+
+class OnlineCongestionDetector:
+    """
+    Streaming congestion detection, globally and per flow.
+
+    Feed packets in arrival order with `update()`; start/end events are
+    returned as soon as they are detected, so the same object serves offline
+    captures and live ingestion. Memory is one CusumDetector per flow; with
+    `max_flows` only that many least recently seen flows are kept (an open
+    event of a forgotten flow is closed at its last packet).
+    """
+
+    def __init__(self, max_flows: Optional[int] = None):
+        self.max_flows = max_flows
+        self.global_detector = CusumDetector()
+        self.flow_detectors: "OrderedDict[Hashable, CusumDetector]" = OrderedDict()
+        self.last_timestamp = None
+        self.flow_last_timestamp: "OrderedDict[Hashable, float]" = OrderedDict()
+
+    def update(self, timestamp: float, flow: Hashable = None) -> List[Dict[str, Any]]:
+        """
+        Feeds one packet and returns any congestion events it triggers.
+
+        Args:
+            timestamp: Packet time in seconds
+            flow: Flow key, or None to feed only the global detector
+        """
+        events = []
+
+        if self.last_timestamp is not None:
+            event = self.global_detector.update(
+                timestamp, (timestamp - self.last_timestamp) * 1000
+            )
+            if event:
+                event["scope"] = "global"
+                events.append(event)
+        self.last_timestamp = timestamp
+
+        if flow is not None:
+            previous = self.flow_last_timestamp.get(flow)
+            if previous is not None:
+                detector = self.flow_detectors.get(flow)
+                if detector is None:
+                    detector = self.flow_detectors[flow] = CusumDetector()
+                else:
+                    self.flow_detectors.move_to_end(flow)
+                event = detector.update(timestamp, (timestamp - previous) * 1000)
+                if event:
+                    event["scope"] = "flow"
+                    event["flow"] = flow
+                    events.append(event)
+                self.flow_last_timestamp.move_to_end(flow)
+            self.flow_last_timestamp[flow] = timestamp
+            if self.max_flows is not None:
+                while len(self.flow_last_timestamp) > self.max_flows:
+                    events.extend(self._forget(next(iter(self.flow_last_timestamp))))
+
+        return events
+
+    def _forget(self, flow: Hashable) -> List[Dict[str, Any]]:
+        """Drops a flow's state, closing its open event if any."""
+        del self.flow_last_timestamp[flow]
+        detector = self.flow_detectors.pop(flow, None)
+        event = detector.finish() if detector is not None else None
+        if not event:
+            return []
+        event["scope"] = "flow"
+        event["flow"] = flow
+        return [event]
+
+    def finish(self) -> List[Dict[str, Any]]:
+        """Closes all open events (end of capture or stream)."""
+        events = []
+        event = self.global_detector.finish()
+        if event:
+            event["scope"] = "global"
+            events.append(event)
+        for flow, detector in self.flow_detectors.items():
+            event = detector.finish()
+            if event:
+                event["scope"] = "flow"
+                event["flow"] = flow
+                events.append(event)
+        return events
+
+
+def detect_congestion_change_points(
+    file_path: Path,
+    packets: Union[PacketList, PacketTable],
+    detail: DetailLevel = DetailLevel.FLOWS,
+):
+    """
+    Replays a capture through OnlineCongestionDetector.
+
+    Flows are keyed by (protocol, src, sport, dst, dport) from the packet
+    table; packets without addresses only feed the global detector.
+
+    Returns:
+        Dictionary with event counts, and at the "flows" level and above the
+        list of closed congestion intervals
+    """
+    table = as_packet_table(packets)
+    flow_ids, _, _ = group_rows(
+        table["l4"], table["src"], table["sport"], table["dst"], table["dport"]
+    )
+    flow_names = _flow_names(table, flow_ids)
+    flow_keys = np.where(table["src"] != NO_HOST, flow_ids, -1).tolist()
+
+    detector = OnlineCongestionDetector()
+    intervals = []
+    for timestamp, flow in zip(table["timestamp"].tolist(), flow_keys):
+        for event in detector.update(timestamp, flow if flow >= 0 else None):
+            if event["event"] == "end":
+                intervals.append(event)
+    intervals.extend(detector.finish())
+
+    global_events = [e for e in intervals if e["scope"] == "global"]
+    flow_events = [e for e in intervals if e["scope"] == "flow"]
+    results = {
+        "global_events": len(global_events),
+        "flow_events": len(flow_events),
+        "flows_affected": len({e["flow"] for e in flow_events}),
+        "congested_seconds": float(sum(e["duration"] for e in global_events)),
+    }
+
+    if DetailLevel(detail).includes(DetailLevel.FLOWS):
+        for event in flow_events:
+            event["flow"] = flow_names[event["flow"]]
+        results["events"] = global_events + flow_events
+
+    return results
+
+
+def _flow_names(table: PacketTable, flow_ids: np.ndarray) -> List[str]:
+    """
+    Readable "src:sport-dst:dport" (or "src-dst") names for each flow id,
+    "UDP: "-prefixed for UDP as in the congestion analysis flow keys.
+    """
+    if len(flow_ids) == 0:
+        return []
+    first_rows = np.zeros(flow_ids.max() + 1, dtype=np.int64)
+    first_rows[flow_ids[::-1]] = np.arange(len(flow_ids))[::-1]
+    srcs = table.host_names(table["src"][first_rows].tolist())
+    dsts = table.host_names(table["dst"][first_rows].tolist())
+    return [
+        ("UDP: " if l4 == L4_UDP else "")
+        + (f"{s}:{sp}-{d}:{dp}" if sp != NO_PORT else f"{s}-{d}")
+        for s, sp, d, dp, l4 in zip(
+            srcs,
+            table["sport"][first_rows].tolist(),
+            dsts,
+            table["dport"][first_rows].tolist(),
+            table["l4"][first_rows].tolist(),
+        )
+    ]
@@ -5,10 +5,13 @@ from sklearn.cluster import DBSCAN
 import os
 from pathlib import Path
 from typing import List, Dict, Any, Optional, Union
+from analysis_service.profile.schema import DEFAULT_PROFILE, AnalysisProfile
+from packet_extract_service.table import L3_IPV4, L4_TCP, NO_PORT, PacketTable
 
 
 class DelayAnalyzer:
-    def __init__(self):
+    def __init__(self, profile: AnalysisProfile = DEFAULT_PROFILE):
+        self.profile = profile
         self.df = None
         self.delay_categories = {
             "bundling_delay": [],
@@ -19,8 +22,11 @@ class DelayAnalyzer:
         }
         self.mqtt_ports = set([1883, 8883])  # Using set for faster lookups
 
-    def process_packets(self, packets: List[Any]) -> bool:
+    def process_packets(self, packets: Union[List[Any], PacketTable]) -> bool:
         """Process packet capture and extract relevant information"""
+        if isinstance(packets, PacketTable):
+            return self.process_table(packets)
+
         # Pre-allocate list with estimated size for better memory usage
         packet_data = []
         packet_data_append = packet_data.append  # Local reference for faster access
@@ -35,7 +41,42 @@ class DelayAnalyzer:
             return False
 
         self.df = pd.DataFrame(packet_data)
+        self._prepare_frame()
+        return True
+
+    def process_table(self, table: PacketTable) -> bool:
+        """
+        process_packets over an already decoded PacketTable: builds the
+        same frame (IPv4 packets only, absent ports / sequence numbers as
+        NaN) from its columns, without touching Scapy packets.
+        """
+        rows = np.flatnonzero(table["l3"] == L3_IPV4)
+        if len(rows) == 0:
+            return False
+        part = table.take(rows)
+        has_ports = part["sport"] != NO_PORT
+        mqtt_ports = list(self.mqtt_ports)
+
+        self.df = pd.DataFrame(
+            {
+                "packet_id": rows.astype(np.int64),
+                "timestamp": part["timestamp"],
+                "src_ip": part.host_names(part["src"].tolist()),
+                "dst_ip": part.host_names(part["dst"].tolist()),
+                "src_port": _optional_column(part["sport"], has_ports),
+                "dst_port": _optional_column(part["dport"], has_ports),
+                "protocol": part["ip_proto"].astype(np.int64),
+                "seq_num": _optional_column(part["seq"], part["l4"] == L4_TCP),
+                "ip_length": part["ip_len"].astype(np.int64),
+                "total_length": part["size"].astype(np.int64),
+                "is_mqtt": has_ports
+                & (np.isin(part["sport"], mqtt_ports) | np.isin(part["dport"], mqtt_ports)),
+            }
+        )
+        self._prepare_frame()
+        return True
 
+    def _prepare_frame(self):
         # Optimize data types to reduce memory usage
         self._optimize_dtypes()
 
@@ -43,8 +84,6 @@ class DelayAnalyzer:
         self.df.sort_values("timestamp", inplace=True)
         self.df["delay"] = self.df["timestamp"].diff().fillna(0)
 
-        return True
-
     def _optimize_dtypes(self):
         """Optimize DataFrame data types to reduce memory usage"""
         # Numeric columns that can be downcasted
@@ -208,7 +247,7 @@ class DelayAnalyzer:
                     bundle_time = end_time - start_time
 
                     # Record bundling delay event if significant
-                    if bundle_time > 0.01:  # Minimum threshold to consider it bundling
+                    if bundle_time > self.profile.bundle_min_duration:  # Minimum threshold to consider it bundling
                         self.delay_categories["bundling_delay"].append(
                             {
                                 "src_ip": src_ip,
@@ -288,7 +327,7 @@ class DelayAnalyzer:
                 processing_delay = first_response_time - in_time
 
                 # Skip if delay is too small
-                if processing_delay <= 0.05:  # Less than 50ms delay
+                if processing_delay <= self.profile.broker_min_delay:  # 50ms by default
                     continue
 
                 # Find window of responses more efficiently
@@ -428,7 +467,7 @@ class DelayAnalyzer:
                 overall_mean = np.mean(delays)
                 delay_increase = avg_delay / overall_mean if overall_mean > 0 else 0
 
-                if delay_increase > 1.5:  # At least 50% increase in delays
+                if delay_increase > self.profile.congestion_delay_factor:  # 50% increase by default
                     self.delay_categories["network_congestion"].append(
                         {
                             "start_time": start_time,
@@ -471,7 +510,7 @@ class DelayAnalyzer:
             max_jitter = np.max(delay_diffs)
 
             # Record significant jitter events
-            if mean_jitter > 0.01:  # At least 10ms average jitter
+            if mean_jitter > self.profile.jitter_min_mean:  # 10ms average jitter by default
                 self.delay_categories["jitter"].append(
                     {
                         "flow": flow,
@@ -542,11 +581,26 @@ class DelayAnalyzer:
         return summary
 
 
-def analyze_packet_delays(file_path, packets):
-    """Main function to analyze packet delays in MQTT-based IoT workflows"""
+def _optional_column(values: np.ndarray, present: np.ndarray) -> np.ndarray:
+    """Integer column, or float with NaN where absent (as pandas builds it from None)."""
+    if present.all():
+        return values.astype(np.int64)
+    return np.where(present, values, np.nan)
+
+
+def analyze_packet_delays(
+    file_path,
+    packets: Union[List[Any], PacketTable],
+    profile: AnalysisProfile = DEFAULT_PROFILE,
+):
+    """Main function to analyze packet delays in MQTT-based IoT workflows
+
+    `packets` may be Scapy packets or their PacketTable; `profile` sets the
+    bundling, broker, congestion and jitter cut-offs.
+    """
     try:
         # Initialize analyzer
-        analyzer = DelayAnalyzer()
+        analyzer = DelayAnalyzer(profile)
 
         # Process packets
         start_time = None  # You could add timing code here if needed
@@ -0,0 +1,128 @@
+import heapq
+import itertools
+from typing import Any, Dict, Hashable, List, Optional, Sequence
+
+import numpy as np
+
+DEFAULT_TOP_K = 100
+
+
+class SpaceSaving:
+    """
+    Space-Saving top-K heavy-hitter sketch (Metwally et al.) for weighted
+    streams.
+
+    Holds at most `k` counters however many distinct keys are seen. When a
+    new key arrives and the table is full, the smallest counter is handed
+    over to it and its old value becomes the new key's error bound. Every
+    reported value overestimates the true total by at most its `error`, and
+    any key with a true total above total_weight / k is guaranteed to be
+    kept.
+    """
+
+    def __init__(self, k: int = DEFAULT_TOP_K):
+        if k < 1:
+            raise ValueError("k must be at least 1")
+        self.k = k
+        self.counters: Dict[Hashable, List[float]] = {}  # key -> [value, error]
+        self.total_weight = 0.0
+        self._heap = []  # (value, seq, key) min-heap, may contain stale entries
+        self._seq = itertools.count()  # tie-breaker so keys are never compared
+
+    def __len__(self) -> int:
+        return len(self.counters)
+
+    def update(self, key: Hashable, weight: float = 1.0):
+        """Adds `weight` to `key`."""
+        self.total_weight += weight
+        counter = self.counters.get(key)
+
+        if counter is not None:
+            counter[0] += weight
+        elif len(self.counters) < self.k:
+            counter = self.counters[key] = [weight, 0.0]
+        else:
+            value, victim = self._pop_min()
+            del self.counters[victim]
+            counter = self.counters[key] = [value + weight, value]
+
+        heapq.heappush(self._heap, (counter[0], next(self._seq), key))
+        if len(self._heap) > 4 * self.k:
+            self._heap = [
+                (c[0], next(self._seq), key) for key, c in self.counters.items()
+            ]
+            heapq.heapify(self._heap)
+
+    def _pop_min(self):
+        """Smallest live counter, skipping heap entries made stale by updates."""
+        while True:
+            value, _, key = heapq.heappop(self._heap)
+            counter = self.counters.get(key)
+            if counter is not None and counter[0] == value:
+                return value, key
+
+    def report(self, limit: Optional[int] = None) -> Dict[str, Any]:
+        """Top entries by value plus an "other" bucket for everything else."""
+        ranked = sorted(self.counters.items(), key=lambda kv: kv[1][0], reverse=True)
+        if limit is not None:
+            ranked = ranked[:limit]
+        top = [
+            {"key": key, "value": value, "error": error}
+            for key, (value, error) in ranked
+        ]
+        covered = sum(entry["value"] for entry in top)
+        max_error = sum(entry["error"] for entry in top)
+        return {
+            "top": top,
+            "other": {
+                # Top values overestimate, so "other" can only be underestimated
+                "value": max(0.0, self.total_weight - covered),
+                "error": max_error,
+            },
+            "total": self.total_weight,
+            "exact": max_error == 0,
+        }
+
+
+def top_k_report(
+    keys: Sequence[Any], weights: np.ndarray, k: int = DEFAULT_TOP_K
+) -> Dict[str, Any]:
+    """
+    Exact top-K over already aggregated totals, in the SpaceSaving report
+    format (all errors are zero).
+
+    Args:
+        keys: Display key per aggregate
+        weights: Aggregated total per key
+        k: Number of entries to keep
+    """
+    weights = np.asarray(weights, dtype=np.float64)
+    candidates = np.nonzero(weights > 0)[0]
+    if len(candidates) > k:
+        top_idx = candidates[np.argpartition(-weights[candidates], k - 1)[:k]]
+    else:
+        top_idx = candidates
+    top_idx = top_idx[np.argsort(-weights[top_idx], kind="stable")]
+
+    top = [
+        {"key": keys[i], "value": _plain(weights[i]), "error": 0}
+        for i in top_idx.tolist()
+    ]
+    total = float(weights.sum())
+    covered = float(weights[top_idx].sum())
+    return {
+        "top": top,
+        "other": {
+            "value": _plain(total - covered),
+            "keys": len(candidates) - len(top_idx),
+            "error": 0,
+        },
+        "total": _plain(total),
+        "exact": True,
+    }
+
+
+def _plain(value: float):
+    """Whole-number totals (packets, bytes) are reported as ints."""
+    value = float(value)
+    return int(value) if value.is_integer() else value
@@ -1,310 +1,156 @@
 from pathlib import Path
+from typing import NamedTuple, Optional, Union
+import numpy as np
 from scapy.all import PacketList
-
-
-def analyze_network_congestion(file_path: Path, packets: PacketList):
+from analysis_storage.schema import DetailLevel
+from artifact_service.crud import Artifact, write_artifact
+from analysis_service.congestion_detection.crud import detect_congestion_change_points
+from analysis_service.heavy_hitters.crud import DEFAULT_TOP_K, top_k_report
+from analysis_service.profile.schema import DEFAULT_PROFILE, AnalysisProfile
+from packet_extract_service.table import (
+    L3_ARP,
+    L3_IPV4,
+    L4_TCP,
+    L4_UDP,
+    NO_PORT,
+    PacketTable,
+    as_packet_table,
+    group_rows,
+)
+
+# Common broker ports (for broker detection)
+BROKER_PORTS = [1883, 8883, 8884, 8885, 8886, 5671, 5672]  # MQTT, AMQP typical ports
+
+# Flow kinds, in the order the per-packet classification checks them
+KIND_OTHER, KIND_IP, KIND_TCP, KIND_UDP, KIND_ARP = range(5)
+KIND_NAMES = ["Other", "IP", "TCP", "UDP", "ARP"]
+
+# Per-packet flag bits of the packet_flow artifact
+PACKET_FLAGS = {
+    "retransmission": 1,
+    "bulk_upload": 2,
+    "broker": 4,
+    "device_to_broker": 8,
+}
+PACKET_FLOW_ARTIFACT = "packet_flow"
+
+
+def analyze_network_congestion(
+    file_path: Path,
+    packets: Union[PacketList, PacketTable],
+    detail: DetailLevel = DetailLevel.FLOWS,
+    top_k: int = DEFAULT_TOP_K,
+    artifact_dir: Optional[Path] = None,
+    profile: AnalysisProfile = DEFAULT_PROFILE,
+    flows: Optional["FlowGrouping"] = None,
+    delays_ms: Optional[np.ndarray] = None,
+    is_retransmission: Optional[np.ndarray] = None,
+):
     """
     Analyzes network congestion, jitter, and inefficient packet aggregation
     without dependencies on other functions.
 
+    Runs over the columnar packet table: global and per-flow deltas come
+    from np.diff over flow-grouped timestamps, broker tagging is a
+    set-membership mask, and only O(flows) Python objects are built unless
+    per-packet detail is requested.
+
     Args:
         file_path: Path to the packet capture file
-        packets: Scapy PacketList object containing network packets
+        packets: Scapy PacketList or an already decoded PacketTable
+        detail: Output detail level. Per-flow tables and event lists are only
+            kept from "flows" up, per-packet records only at "packets".
+        top_k: Number of flows kept in `ip_communication` and in each
+            heavy-hitter ranking; the rest is folded into "other" buckets.
+        artifact_dir: When set, per-packet output is written there as a
+            columnar "packet_flow" artifact (see read_packet_flow) and only
+            referenced from the result, instead of being inlined as JSON.
+            The written artifacts are listed under results["artifacts"].
+        profile: Jitter spike, bundling, congestion window and bulk upload
+            thresholds.
+        flows, delays_ms, is_retransmission: Already computed group_flows(),
+            file-order delays (np.diff of the timestamps * 1000) and
+            retransmission_mask() of the table, if the caller has them.
 
     Returns:
         Dictionary with congestion analysis results
     """
-    # Initialize statistics
-    packet_count = len(packets)
-    retransmission_count = 0
-    jitter_values = []
-    jitter_spikes = []
-    bundling_delays = []
-    congestion_events = []
-    protocol_distribution = {}
-
-    # Extract IP address information for aggregate stats
-    ip_communication = {}
-
-    # Create packet_flow list for individual packet flow information
-    packet_flow = []
-
-    # Track previous timestamp to calculate delays
-    prev_timestamp = None
-    flow_timestamps = {}  # Track timestamps by flow
-    last_seq_nums = {}  # Track TCP sequence numbers for retransmission detection
-    bulk_upload_flows = set()  # Track flows with bulk uploads
-    known_brokers = set()  # Set of IPs identified as brokers
-    packet_counts_by_flow = {}  # Track packet counts for bulk upload detection
-
-    # Set thresholds
-    JITTER_SPIKE_THRESHOLD_MS = 50  # ms
-    BUNDLING_DELAY_THRESHOLD_MS = 25  # ms
-    CONGESTION_WINDOW_SIZE = 10  # packets
-    BULK_UPLOAD_THRESHOLD = (
-        15  # Number of packets in short time to consider bulk upload
+    detail = DetailLevel(detail)
+    keep_flows = detail.includes(DetailLevel.FLOWS)
+    keep_packets = detail.includes(DetailLevel.PACKETS)
+
+    table = as_packet_table(packets)
+    packet_count = len(table)
+    timestamps = table["timestamp"]
+    sizes = table["size"]
+    l3 = table["l3"]
+    l4 = table["l4"]
+    src = table["src"]
+    dst = table["dst"]
+    sport = table["sport"]
+    dport = table["dport"]
+    is_ipv4 = l3 == L3_IPV4
+
+    (
+        kind,
+        has_hosts,
+        has_ports,
+        flow_src,
+        flow_dst,
+        flow_sport,
+        flow_dport,
+        flow_ids,
+        flow_order,
+        flow_starts,
+    ) = flows if flows is not None else group_flows(table)
+    flow_count = len(flow_starts)
+
+    # Global inter-packet delays (file order)
+    if delays_ms is None:
+        delays_ms = np.diff(timestamps) * 1000
+    jitter_values = delays_ms
+
+    # Jitter spikes: only counted from the second delay on
+    spike_ids = np.nonzero(delays_ms > profile.jitter_spike_threshold_ms)[0] + 1
+    spike_ids = spike_ids[spike_ids >= 2]
+
+    # Congestion events: trailing window of delays with a high mean
+    congestion_event_count = 0
+    window_size = profile.congestion_window_size
+    if len(delays_ms) >= window_size:
+        windows = np.lib.stride_tricks.sliding_window_view(delays_ms, window_size)
+        window_means = windows.sum(axis=1) / window_size
+        congestion_event_count = int(
+            np.count_nonzero(window_means > profile.jitter_spike_threshold_ms)
+        )
+
+    # Per-flow delays: diff over each flow's timestamps, in file order
+    sorted_flows = flow_ids[flow_order]
+    sorted_times = timestamps[flow_order]
+    same_flow = np.zeros(packet_count, dtype=bool)
+    same_flow[1:] = sorted_flows[1:] == sorted_flows[:-1]
+    flow_delay_sorted = np.full(packet_count, np.nan)
+    flow_delay_sorted[1:] = np.diff(sorted_times) * 1000
+    flow_delay_sorted[~same_flow] = np.nan
+    flow_delay_ms = np.empty(packet_count)
+    flow_delay_ms[flow_order] = flow_delay_sorted
+    has_flow_delay = ~np.isnan(flow_delay_ms)
+
+    # Bundling delays (potentially inefficient packet aggregation)
+    bundling_count = int(
+        np.count_nonzero(
+            flow_delay_ms[has_flow_delay] > profile.bundling_delay_threshold_ms
+        )
     )
-    BULK_UPLOAD_TIME_WINDOW = 1.0  # seconds
-
-    # Common broker ports (for broker detection)
-    BROKER_PORTS = {
-        1883,
-        8883,
-        8884,
-        8885,
-        8886,
-        5671,
-        5672,
-    }  # MQTT, AMQP typical ports
-
-    # Sliding window for congestion detection
-    delay_window = []
-
-    # First pass to identify broker IPs based on port usage
-    for pkt in packets:
-        if pkt.haslayer("TCP") or pkt.haslayer("UDP"):
-            layer = "TCP" if pkt.haslayer("TCP") else "UDP"
-            if pkt[layer].sport in BROKER_PORTS:
-                known_brokers.add(pkt["IP"].src)
-            if pkt[layer].dport in BROKER_PORTS:
-                known_brokers.add(pkt["IP"].dst)
-
-    # Main packet analysis
-    for i, pkt in enumerate(packets):
-        flow_info = {"packet_id": i, "size": len(pkt)}
-
-        # Add timestamp if available
-        current_timestamp = None
-        if hasattr(pkt, "time"):
-            current_timestamp = float(pkt.time)
-            flow_info["timestamp"] = current_timestamp
-
-        # Check for IP layer
-        if pkt.haslayer("IP"):
-            flow_info["src_ip"] = pkt["IP"].src
-            flow_info["dst_ip"] = pkt["IP"].dst
-
-            # Track protocol distribution
-            ip_proto = pkt["IP"].proto
-            proto_name = "Other"
-
-            # Add port information if available
-            if pkt.haslayer("TCP"):
-                flow_info["protocol"] = "TCP"
-                flow_info["src_port"] = pkt["TCP"].sport
-                flow_info["dst_port"] = pkt["TCP"].dport
-                flow_info["flow"] = (
-                    f"{pkt['IP'].src}:{pkt['TCP'].sport}-{pkt['IP'].dst}:{pkt['TCP'].dport}"
-                )
-                proto_name = "TCP"
-
-                # Check for TCP retransmission
-                flow_key = flow_info["flow"]
-                seq_num = pkt["TCP"].seq
-
-                if flow_key in last_seq_nums and seq_num == last_seq_nums[flow_key]:
-                    retransmission_count += 1
-                    flow_info["retransmission"] = True
-
-                last_seq_nums[flow_key] = seq_num
-
-            elif pkt.haslayer("UDP"):
-                flow_info["protocol"] = "UDP"
-                flow_info["src_port"] = pkt["UDP"].sport
-                flow_info["dst_port"] = pkt["UDP"].dport
-                flow_info["flow"] = (
-                    f"{pkt['IP'].src}:{pkt['UDP'].sport}-{pkt['IP'].dst}:{pkt['UDP'].dport}"
-                )
-                proto_name = "UDP"
-            else:
-                flow_info["protocol"] = "IP"
-                flow_info["flow"] = f"{pkt['IP'].src}-{pkt['IP'].dst}"
-
-            # Update protocol distribution
-            protocol_distribution[proto_name] = (
-                protocol_distribution.get(proto_name, 0) + 1
-            )
-
-        elif pkt.haslayer("ARP"):
-            flow_info["protocol"] = "ARP"
-            if hasattr(pkt["ARP"], "psrc") and hasattr(pkt["ARP"], "pdst"):
-                flow_info["src_ip"] = pkt["ARP"].psrc
-                flow_info["dst_ip"] = pkt["ARP"].pdst
-                flow_info["flow"] = f"ARP: {pkt['ARP'].psrc}-{pkt['ARP'].pdst}"
-
-            # Update protocol distribution
-            protocol_distribution["ARP"] = protocol_distribution.get("ARP", 0) + 1
-
-        else:
-            flow_info["protocol"] = "Other"
-            flow_info["flow"] = f"Unknown flow (packet {i})"
-
-            # Update protocol distribution
-            protocol_distribution["Other"] = protocol_distribution.get("Other", 0) + 1
-
-        # Calculate delay information
-        if current_timestamp is not None:
-            # Global delay (from first packet)
-            if prev_timestamp is not None:
-                packet_delay_ms = (current_timestamp - prev_timestamp) * 1000
-                flow_info["delay_from_previous_ms"] = packet_delay_ms
-
-                # Track jitter (variation in delay)
-                jitter_values.append(packet_delay_ms)
-
-                # Check for jitter spikes
-                if (
-                    len(jitter_values) > 1
-                    and packet_delay_ms > JITTER_SPIKE_THRESHOLD_MS
-                ):
-                    jitter_spikes.append(
-                        {
-                            "packet_id": i,
-                            "delay_ms": packet_delay_ms,
-                            "timestamp": current_timestamp,
-                        }
-                    )
-
-                # Update delay window for congestion detection
-                delay_window.append(packet_delay_ms)
-                if len(delay_window) > CONGESTION_WINDOW_SIZE:
-                    delay_window.pop(0)
-
-                # Detect congestion events (sustained high delays)
-                if (
-                    len(delay_window) == CONGESTION_WINDOW_SIZE
-                    and sum(delay_window) / len(delay_window)
-                    > JITTER_SPIKE_THRESHOLD_MS
-                ):
-                    congestion_events.append(
-                        {
-                            "start_packet": i - CONGESTION_WINDOW_SIZE,
-                            "end_packet": i,
-                            "avg_delay_ms": sum(delay_window) / len(delay_window),
-                            "timestamp": current_timestamp,
-                        }
-                    )
-
-            # Flow-specific delay
-            if "flow" in flow_info:
-                flow_key = flow_info["flow"]
-
-                # Track packet counts by flow for bulk upload detection
-                if flow_key not in packet_counts_by_flow:
-                    packet_counts_by_flow[flow_key] = {
-                        "count": 0,
-                        "first_timestamp": current_timestamp,
-                    }
-
-                packet_counts_by_flow[flow_key]["count"] += 1
-                packet_counts_by_flow[flow_key]["last_timestamp"] = current_timestamp
-
-                # Detect bulk uploads (many packets in a short time)
-                if (
-                    packet_counts_by_flow[flow_key]["count"] >= BULK_UPLOAD_THRESHOLD
-                    and (
-                        current_timestamp
-                        - packet_counts_by_flow[flow_key]["first_timestamp"]
-                    )
-                    <= BULK_UPLOAD_TIME_WINDOW
-                ):
-                    bulk_upload_flows.add(flow_key)
-
-                if flow_key in flow_timestamps:
-                    flow_delay_ms = (
-                        current_timestamp - flow_timestamps[flow_key]
-                    ) * 1000
-                    flow_info["flow_delay_ms"] = flow_delay_ms
-
-                    # Check for bundling delays (potentially inefficient packet aggregation)
-                    if flow_delay_ms > BUNDLING_DELAY_THRESHOLD_MS:
-                        bundling_delays.append(
-                            {
-                                "flow": flow_key,
-                                "packet_id": i,
-                                "delay_ms": flow_delay_ms,
-                                "timestamp": current_timestamp,
-                            }
-                        )
-
-                flow_timestamps[flow_key] = current_timestamp
-
-            # Update previous timestamp for next iteration
-            prev_timestamp = current_timestamp
-
-        # Add packet classification fields
-        # Add retransmission classification (already detected earlier)
-        flow_info["packet_type"] = {
-            "transmission": not flow_info.get("retransmission", False),
-            "retransmission": flow_info.get("retransmission", False),
-            "bulk_upload": "flow" in flow_info
-            and flow_info["flow"] in bulk_upload_flows,
-            "broker": False,  # Will be updated below
-            "device_to_broker": False,  # Will be updated below
-        }
-
-        # Determine if broker-related
-        if "src_ip" in flow_info and "dst_ip" in flow_info:
-            # If either source or destination is a known broker
-            if flow_info["src_ip"] in known_brokers:
-                flow_info["packet_type"]["broker"] = True
-                if flow_info["dst_ip"] not in known_brokers:
-                    flow_info["packet_type"]["device_to_broker"] = True
-            elif flow_info["dst_ip"] in known_brokers:
-                flow_info["packet_type"]["broker"] = True
-                flow_info["packet_type"]["device_to_broker"] = True
-
-        # Add to packet_flow list
-        packet_flow.append(flow_info)
 
-        # Also update aggregate statistics
-        if "flow" in flow_info:
-            key = flow_info["flow"]
-
-            if key not in ip_communication:
-                ip_communication[key] = {
-                    "src_ip": flow_info.get("src_ip", "Unknown"),
-                    "dst_ip": flow_info.get("dst_ip", "Unknown"),
-                    "src_port": flow_info.get("src_port", None),
-                    "dst_port": flow_info.get("dst_port", None),
-                    "protocol": flow_info.get("protocol", "Unknown"),
-                    "packet_count": 0,
-                    "bytes": 0,
-                    "avg_delay_ms": 0,
-                    "total_delay_ms": 0,
-                }
-
-            ip_communication[key]["packet_count"] += 1
-            ip_communication[key]["bytes"] += len(pkt)
-
-            # Update delay statistics for the flow
-            if "flow_delay_ms" in flow_info:
-                current_delay = flow_info["flow_delay_ms"]
-                current_count = ip_communication[key]["packet_count"]
-
-                # Update running average of delay
-                ip_communication[key]["total_delay_ms"] += current_delay
-                ip_communication[key]["avg_delay_ms"] = (
-                    ip_communication[key]["total_delay_ms"] / (current_count - 1)
-                    if current_count > 1
-                    else 0
-                )
+    if is_retransmission is None:
+        is_retransmission = retransmission_mask(table, kind, flow_ids, flow_order)
+    retransmission_count = int(np.count_nonzero(is_retransmission))
 
     # Calculate jitter (average of absolute differences between consecutive delays)
     jitter = 0
     if len(jitter_values) > 1:
-        jitter_diffs = [
-            abs(jitter_values[i] - jitter_values[i - 1])
-            for i in range(1, len(jitter_values))
-        ]
-        jitter = sum(jitter_diffs) / len(jitter_diffs) if jitter_diffs else 0
-
-    # Calculate average bundling delay
-    avg_bundling_delay = (
-        sum([d["delay_ms"] for d in bundling_delays]) / len(bundling_delays)
-        if bundling_delays
-        else 0
-    )
+        jitter = float(np.mean(np.abs(np.diff(jitter_values))))
 
     # Extract congestion-specific metrics
     congestion_metrics = {
@@ -312,13 +158,176 @@ def analyze_network_congestion(file_path: Path, packets: PacketList):
             retransmission_count / packet_count if packet_count > 0 else 0
         ),
         "jitter_ms": jitter,
-        "jitter_spikes": len(jitter_spikes),
-        "packet_aggregation_inefficiency": len(bundling_delays),
-        "congestion_events": len(congestion_events),
+        "jitter_spikes": len(spike_ids),
+        "packet_aggregation_inefficiency": bundling_count,
+        "congestion_events": congestion_event_count,
     }
 
-    # Calculate congestion score (0-100 scale)
-    congestion_score = min(
+    congestion_score = score_congestion(congestion_metrics)
+    results = {
+        "congestion_metrics": congestion_metrics,
+        "congestion_score": congestion_score,
+        "congestion_level": congestion_level(congestion_score),
+    }
+    detailed_metrics = {
+        "jitter_analysis": {
+            "mean_jitter_ms": jitter,
+        },
+        "tcp_analysis": {},
+        # Online EWMA + CUSUM detector replayed over the capture
+        "change_points": detect_congestion_change_points(file_path, table, detail),
+    }
+
+    if not keep_flows:
+        results["detailed_metrics"] = detailed_metrics
+        return results
+
+    # Flow-level output: one representative row per flow
+    first_rows = flow_order[flow_starts]
+    flow_keys = flow_key_names(table, kind, first_rows)
+
+    flow_packets = np.bincount(flow_ids, minlength=flow_count)
+    flow_bytes = np.bincount(flow_ids, weights=sizes, minlength=flow_count)
+    flow_total_delay = np.bincount(
+        flow_ids[has_flow_delay],
+        weights=flow_delay_ms[has_flow_delay],
+        minlength=flow_count,
+    )
+
+    # Keep the top_k flows by packets (in first-seen order), fold the rest
+    kept = np.arange(flow_count)
+    if flow_count > top_k:
+        kept = np.sort(np.argpartition(-flow_packets, top_k - 1)[:top_k])
+    dropped = np.ones(flow_count, dtype=bool)
+    dropped[kept] = False
+
+    ip_communication = {}
+    first_kind = kind[first_rows].tolist()
+    first_src = table.host_names(flow_src[first_rows].tolist())
+    first_dst = table.host_names(flow_dst[first_rows].tolist())
+    first_sport = flow_sport[first_rows].tolist()
+    first_dport = flow_dport[first_rows].tolist()
+    for f in kept.tolist():
+        key = flow_keys[f]
+        count = int(flow_packets[f])
+        total_delay = float(flow_total_delay[f]) if count > 1 else 0
+        ip_communication[key] = {
+            "src_ip": first_src[f] or "Unknown",
+            "dst_ip": first_dst[f] or "Unknown",
+            "src_port": first_sport[f] if first_sport[f] != NO_PORT else None,
+            "dst_port": first_dport[f] if first_dport[f] != NO_PORT else None,
+            "protocol": KIND_NAMES[first_kind[f]],
+            "packet_count": count,
+            "bytes": int(flow_bytes[f]),
+            "avg_delay_ms": total_delay / (count - 1) if count > 1 else 0,
+            "total_delay_ms": total_delay,
+        }
+
+    jitter_spikes = [
+        {"packet_id": i, "delay_ms": d, "timestamp": t}
+        for i, d, t in zip(
+            spike_ids.tolist(),
+            delays_ms[spike_ids - 1].tolist(),
+            timestamps[spike_ids].tolist(),
+        )
+    ]
+
+    retrans_ids = np.nonzero(is_retransmission)[0]
+
+    results["ip_communication"] = ip_communication  # Aggregate stats by flow
+    results["ip_communication_other"] = {
+        "flows": int(np.count_nonzero(dropped)),
+        "packet_count": int(flow_packets[dropped].sum()),
+        "bytes": int(flow_bytes[dropped].sum()),
+    }
+    results["heavy_hitters"] = _heavy_hitters(
+        table,
+        flow_keys,
+        flow_ids,
+        flow_delay_ms,
+        has_hosts,
+        has_ports,
+        flow_packets,
+        flow_bytes,
+        flow_total_delay,
+        top_k,
+    )
+    detailed_metrics["jitter_analysis"]["jitter_spikes"] = jitter_spikes
+
+    if not keep_packets:
+        results["detailed_metrics"] = detailed_metrics
+        detailed_metrics["tcp_analysis"]["retransmissions"] = [
+            {"packet_id": i, "flow": flow_keys[f], "timestamp": t}
+            for i, f, t in zip(
+                retrans_ids.tolist(),
+                flow_ids[retrans_ids].tolist(),
+                timestamps[retrans_ids].tolist(),
+            )
+        ]
+        return results
+
+    # Per-packet classification: bulk uploads and broker involvement
+    is_bulk = _bulk_upload_mask(flow_ids, flow_order, flow_starts, timestamps, profile)
+
+    port_mask = is_ipv4 & ((l4 == L4_TCP) | (l4 == L4_UDP))
+    broker_hosts = np.union1d(
+        src[port_mask & np.isin(sport, BROKER_PORTS)],
+        dst[port_mask & np.isin(dport, BROKER_PORTS)],
+    )
+    src_is_broker = has_hosts & np.isin(src, broker_hosts)
+    dst_is_broker = has_hosts & np.isin(dst, broker_hosts)
+
+    flags = (
+        is_retransmission * PACKET_FLAGS["retransmission"]
+        + is_bulk * PACKET_FLAGS["bulk_upload"]
+        + (src_is_broker | dst_is_broker) * PACKET_FLAGS["broker"]
+        + (src_is_broker ^ dst_is_broker) * PACKET_FLAGS["device_to_broker"]
+    ).astype(np.uint8)
+    columns = {
+        "timestamp": timestamps,
+        "size": sizes.astype(np.int32),
+        "kind": kind,
+        "src": src,
+        "dst": dst,
+        "sport": sport,
+        "dport": dport,
+        "flow": flow_ids.astype(np.int32),
+        "delay_ms": np.concatenate(([np.nan], delays_ms)),
+        "flow_delay_ms": flow_delay_ms,
+        "flags": flags,
+    }
+
+    results["detailed_metrics"] = detailed_metrics
+    if artifact_dir is not None:
+        manifest = write_artifact(
+            artifact_dir,
+            PACKET_FLOW_ARTIFACT,
+            columns,
+            {"hosts": table.hosts, "flows": flow_keys},
+        )
+        results["packet_flow"] = {
+            "artifact": PACKET_FLOW_ARTIFACT,
+            "rows": manifest["rows"],
+        }
+        detailed_metrics["tcp_analysis"]["retransmissions"] = {
+            "artifact": PACKET_FLOW_ARTIFACT,
+            "flag": "retransmission",
+            "count": len(retrans_ids),
+        }
+        results["artifacts"] = {PACKET_FLOW_ARTIFACT: manifest}
+        return results
+
+    packet_flow = packet_flow_records(columns, table.hosts, flow_keys)
+    results["packet_flow"] = packet_flow  # Individual packet flow information
+    detailed_metrics["tcp_analysis"]["retransmissions"] = [
+        packet_flow[i] for i in retrans_ids.tolist()
+    ]
+    return results
+
+
+def score_congestion(congestion_metrics: dict) -> float:
+    """Congestion score (0-100 scale) from the congestion_metrics fields."""
+    return min(
         100,
         (
             (congestion_metrics["retransmission_rate"] * 50)
@@ -328,30 +337,313 @@ def analyze_network_congestion(file_path: Path, packets: PacketList):
         ),
     )
 
-    # Classify congestion level
-    congestion_level = "Low"
+
+def congestion_level(congestion_score: float) -> str:
+    """Classifies a congestion score."""
+    level = "Low"
     if congestion_score > 30:
-        congestion_level = "Moderate"
+        level = "Moderate"
     if congestion_score > 60:
-        congestion_level = "High"
+        level = "High"
     if congestion_score > 80:
-        congestion_level = "Severe"
+        level = "Severe"
+    return level
+
+
+class FlowGrouping(NamedTuple):
+    kind: np.ndarray  # KIND_* per packet
+    has_hosts: np.ndarray
+    has_ports: np.ndarray
+    flow_src: np.ndarray  # Flow key columns (-1 / NO_PORT where not part of the key)
+    flow_dst: np.ndarray
+    flow_sport: np.ndarray
+    flow_dport: np.ndarray
+    flow_ids: np.ndarray  # group_rows() output over the flow key
+    flow_order: np.ndarray
+    flow_starts: np.ndarray
+
+
+def group_flows(table: PacketTable) -> FlowGrouping:
+    """
+    Classifies packets and groups them into the flows used by the
+    congestion analysis (and by anything that must agree with it, such as
+    retransmission counts in rollups).
+    """
+    l3 = table["l3"]
+    l4 = table["l4"]
+    packet_ids = np.arange(len(table))
+
+    # Classify each packet the same way the flow keys are built:
+    # IPv4 -> TCP / UDP / IP, otherwise ARP, otherwise Other
+    is_ipv4 = l3 == L3_IPV4
+    kind = np.full(len(table), KIND_OTHER, dtype=np.int8)
+    kind[is_ipv4] = KIND_IP
+    kind[is_ipv4 & (l4 == L4_TCP)] = KIND_TCP
+    kind[is_ipv4 & (l4 == L4_UDP)] = KIND_UDP
+    kind[l3 == L3_ARP] = KIND_ARP
+    has_ports = (kind == KIND_TCP) | (kind == KIND_UDP)
+    has_hosts = is_ipv4 | (kind == KIND_ARP)
+
+    # Flow grouping: "Other" packets each form their own flow
+    flow_src = np.where(has_hosts, table["src"], -1)
+    flow_dst = np.where(has_hosts, table["dst"], -1)
+    flow_sport = np.where(has_ports, table["sport"], NO_PORT)
+    flow_dport = np.where(has_ports, table["dport"], NO_PORT)
+    flow_unique = np.where(kind == KIND_OTHER, packet_ids, -1)
+    flow_ids, flow_order, flow_starts = group_rows(
+        kind, flow_src, flow_sport, flow_dst, flow_dport, flow_unique
+    )
+    return FlowGrouping(
+        kind,
+        has_hosts,
+        has_ports,
+        flow_src,
+        flow_dst,
+        flow_sport,
+        flow_dport,
+        flow_ids,
+        flow_order,
+        flow_starts,
+    )
+
+
+def retransmission_mask(
+    table: PacketTable,
+    kind: Optional[np.ndarray] = None,
+    flow_ids: Optional[np.ndarray] = None,
+    flow_order: Optional[np.ndarray] = None,
+) -> np.ndarray:
+    """
+    TCP retransmissions: packets with the same sequence number as their
+    flow's previous packet. Pass an existing group_flows() result to avoid
+    regrouping.
+    """
+    if kind is None:
+        flows = group_flows(table)
+        kind, flow_ids, flow_order = flows.kind, flows.flow_ids, flows.flow_order
+
+    sorted_flows = flow_ids[flow_order]
+    seq_sorted = table["seq"][flow_order]
+    retrans_sorted = np.zeros(len(table), dtype=bool)
+    retrans_sorted[1:] = (sorted_flows[1:] == sorted_flows[:-1]) & (
+        seq_sorted[1:] == seq_sorted[:-1]
+    )
+    is_retransmission = np.empty(len(table), dtype=bool)
+    is_retransmission[flow_order] = retrans_sorted
+    return is_retransmission & (kind == KIND_TCP)
+
+
+def read_packet_flow(
+    artifact_dir: Path,
+    start: int = 0,
+    stop: Optional[int] = None,
+    flag: Optional[str] = None,
+) -> dict:
+    """
+    Reads packet_flow records back from a stored artifact.
+
+    Only the requested row range is read from the memory-mapped columns.
+    With `flag` (a PACKET_FLAGS name), rows are the matching packets
+    only and `start`/`stop` index into that filtered list.
+
+    Returns:
+        {"total": rows available, "records": packet_flow records}
+    """
+    artifact = Artifact(artifact_dir, PACKET_FLOW_ARTIFACT)
+    if flag is None:
+        total = artifact.rows
+        start = min(max(0, start), total)
+        stop = total if stop is None else max(start, min(total, stop))
+        rows = np.arange(start, stop)
+        columns = artifact.slice(start, stop)
+    else:
+        if flag not in PACKET_FLAGS:
+            raise ValueError(f"Unknown packet flag: {flag}")
+        matches = np.flatnonzero(artifact.column("flags") & PACKET_FLAGS[flag])
+        total = len(matches)
+        rows = matches[start:stop]
+        columns = artifact.take(rows)
 
     return {
-        "congestion_metrics": congestion_metrics,
-        "congestion_score": congestion_score,
-        "congestion_level": congestion_level,
-        "ip_communication": ip_communication,  # Aggregate stats by flow
-        "packet_flow": packet_flow,  # Individual packet flow information
-        "detailed_metrics": {
-            "jitter_analysis": {
-                "mean_jitter_ms": jitter,
-                "jitter_spikes": jitter_spikes,
-            },
-            "tcp_analysis": {
-                "retransmissions": [
-                    p for p in packet_flow if p.get("retransmission", False)
-                ],
-            },
+        "total": total,
+        "records": packet_flow_records(
+            columns,
+            artifact.dictionaries["hosts"],
+            artifact.dictionaries["flows"],
+            rows,
+        ),
+    }
+
+
+def _heavy_hitters(
+    table: PacketTable,
+    flow_keys: list,
+    flow_ids: np.ndarray,
+    flow_delay_ms: np.ndarray,
+    has_hosts: np.ndarray,
+    has_ports: np.ndarray,
+    flow_packets: np.ndarray,
+    flow_bytes: np.ndarray,
+    flow_total_delay: np.ndarray,
+    top_k: int,
+) -> dict:
+    """Top flows, hosts and ports by packets, bytes and accumulated flow delay."""
+    sizes = table["size"]
+    delays = np.nan_to_num(flow_delay_ms)
+
+    # Hosts and ports count once per packet endpoint (source and destination)
+    host_ids = np.concatenate((table["src"][has_hosts], table["dst"][has_hosts]))
+    ports = np.concatenate((table["sport"][has_ports], table["dport"][has_ports]))
+    host_rows = np.concatenate((np.nonzero(has_hosts)[0],) * 2)
+    port_rows = np.concatenate((np.nonzero(has_ports)[0],) * 2)
+
+    def by_metrics(keys, ids, rows, size):
+        return {
+            "packets": top_k_report(keys, np.bincount(ids, minlength=size), top_k),
+            "bytes": top_k_report(
+                keys, np.bincount(ids, weights=sizes[rows], minlength=size), top_k
+            ),
+            "delay_ms": top_k_report(
+                keys, np.bincount(ids, weights=delays[rows], minlength=size), top_k
+            ),
+        }
+
+    port_names = np.unique(ports)
+    port_ids = np.searchsorted(port_names, ports)
+    return {
+        "flows": {
+            "packets": top_k_report(flow_keys, flow_packets, top_k),
+            "bytes": top_k_report(flow_keys, flow_bytes, top_k),
+            "delay_ms": top_k_report(flow_keys, flow_total_delay, top_k),
         },
+        "hosts": by_metrics(table.hosts, host_ids, host_rows, len(table.hosts)),
+        "ports": by_metrics(
+            port_names.tolist(), port_ids, port_rows, len(port_names)
+        ),
     }
+
+
+def flow_key_names(table: PacketTable, kind: np.ndarray, rows: np.ndarray) -> list:
+    """
+    Builds the flow key string for each representative row: distinct for
+    every flow of group_flows(), which tells TCP and UDP apart.
+    """
+    kinds = kind[rows].tolist()
+    srcs = table.host_names(table["src"][rows].tolist())
+    dsts = table.host_names(table["dst"][rows].tolist())
+    sports = table["sport"][rows].tolist()
+    dports = table["dport"][rows].tolist()
+
+    keys = []
+    for row, k, s, d, sp, dp in zip(rows.tolist(), kinds, srcs, dsts, sports, dports):
+        if k == KIND_TCP:
+            keys.append(f"{s}:{sp}-{d}:{dp}")
+        elif k == KIND_UDP:
+            # Prefixed so a UDP flow never shares a key with the TCP flow of the same tuple
+            keys.append(f"UDP: {s}:{sp}-{d}:{dp}")
+        elif k == KIND_IP:
+            keys.append(f"{s}-{d}")
+        elif k == KIND_ARP:
+            keys.append(f"ARP: {s}-{d}")
+        else:
+            keys.append(f"Unknown flow (packet {row})")
+    return keys
+
+
+def _bulk_upload_mask(
+    flow_ids: np.ndarray,
+    flow_order: np.ndarray,
+    flow_starts: np.ndarray,
+    timestamps: np.ndarray,
+    profile: AnalysisProfile = DEFAULT_PROFILE,
+) -> np.ndarray:
+    """
+    Marks packets of flows that reached profile.bulk_upload_threshold
+    packets within profile.bulk_upload_time_window of the flow's first
+    packet, from the packet that crossed the threshold onwards.
+    """
+    packet_count = len(flow_ids)
+    sorted_flows = flow_ids[flow_order]
+    position = np.arange(packet_count) - flow_starts[sorted_flows]
+    elapsed = timestamps[flow_order] - timestamps[flow_order[flow_starts]][sorted_flows]
+    crossed = (position >= profile.bulk_upload_threshold - 1) & (
+        elapsed <= profile.bulk_upload_time_window
+    )
+
+    first_crossing = np.full(len(flow_starts), packet_count)
+    np.minimum.at(first_crossing, sorted_flows[crossed], position[crossed])
+
+    is_bulk = np.empty(packet_count, dtype=bool)
+    is_bulk[flow_order] = position >= first_crossing[sorted_flows]
+    return is_bulk
+
+
+def packet_flow_records(
+    columns: dict,
+    hosts: list,
+    flow_keys: list,
+    packet_ids: Optional[np.ndarray] = None,
+) -> list:
+    """
+    Materializes one record per packet (only at the "packets" detail level).
+
+    Args:
+        columns: packet_flow columns (see analyze_network_congestion), for
+            all packets or for the rows in `packet_ids`
+        hosts: Host id -> address
+        flow_keys: Flow id -> flow key
+        packet_ids: Packet number of each row, defaults to 0..n-1
+    """
+    if packet_ids is None:
+        packet_ids = np.arange(len(columns["timestamp"]))
+    rows = zip(
+        packet_ids.tolist(),
+        columns["kind"].tolist(),
+        columns["size"].tolist(),
+        columns["timestamp"].tolist(),
+        columns["src"].tolist(),
+        columns["dst"].tolist(),
+        columns["sport"].tolist(),
+        columns["dport"].tolist(),
+        columns["flow"].tolist(),
+        columns["delay_ms"].tolist(),
+        columns["flow_delay_ms"].tolist(),
+        columns["flags"].tolist(),
+    )
+
+    packet_flow = []
+    for i, k, size, ts, s, d, sp, dp, f, delay, fd, flags in rows:
+        retrans = bool(flags & PACKET_FLAGS["retransmission"])
+        flow_info = {"packet_id": i, "size": size, "timestamp": ts}
+        if k == KIND_ARP:
+            flow_info["protocol"] = "ARP"
+            flow_info["src_ip"] = hosts[s]
+            flow_info["dst_ip"] = hosts[d]
+        elif k != KIND_OTHER:
+            flow_info["src_ip"] = hosts[s]
+            flow_info["dst_ip"] = hosts[d]
+            flow_info["protocol"] = KIND_NAMES[k]
+            if k == KIND_TCP or k == KIND_UDP:
+                flow_info["src_port"] = sp
+                flow_info["dst_port"] = dp
+        else:
+            flow_info["protocol"] = "Other"
+        flow_info["flow"] = flow_keys[f]
+
+        if retrans:
+            flow_info["retransmission"] = True
+        if delay == delay:  # not NaN (first packet has no previous)
+            flow_info["delay_from_previous_ms"] = delay
+        if fd == fd:  # not NaN
+            flow_info["flow_delay_ms"] = fd
+
+        flow_info["packet_type"] = {
+            "transmission": not retrans,
+            "retransmission": retrans,
+            "bulk_upload": bool(flags & PACKET_FLAGS["bulk_upload"]),
+            "broker": bool(flags & PACKET_FLAGS["broker"]),
+            "device_to_broker": bool(flags & PACKET_FLAGS["device_to_broker"]),
+        }
+        packet_flow.append(flow_info)
+
+    return packet_flow
@@ -1,11 +1,30 @@
 from pathlib import Path
+from typing import Union
 from scapy.all import PacketList
 import numpy as np
-from sklearn.cluster import KMeans
-from collections import defaultdict
-
-
-def detect_network_patterns(file_path: Path, packets: PacketList):
+from analysis_service.heavy_hitters.crud import DEFAULT_TOP_K
+from packet_extract_service.table import (
+    L3_IPV4,
+    L4_ICMP,
+    L4_TCP,
+    L4_UDP,
+    NO_PORT,
+    PacketTable,
+    as_packet_table,
+    group_rows,
+)
+
+PROTOCOL_NAMES = {L4_TCP: "TCP", L4_UDP: "UDP", L4_ICMP: "ICMP"}
+
+# Root-cause factors keyed by host or port are bounded to the top_k keys
+BOUNDED_FACTORS = ("by_source", "by_destination", "by_port")
+
+
+def detect_network_patterns(
+    file_path: Path,
+    packets: Union[PacketList, PacketTable],
+    top_k: int = DEFAULT_TOP_K,
+):
     """
     Advanced analysis of network traffic patterns.
     Generalized for all protocols with focus on:
@@ -14,72 +33,36 @@ def detect_network_patterns(file_path: Path, packets: PacketList):
     - Upload/download transmission delays
     - Retransmission patterns
     - Root cause analysis by correlating delays with packet size, protocol type, source/destination
-    """
 
-    # Extract timestamps and organize by connection/flow
-    flows = {}
-    analyzed_packets = []
-    protocols = defaultdict(int)
-
-    # Root cause analysis data structures
-    delay_factors = {
-        "by_size": defaultdict(list),
-        "by_protocol": defaultdict(list),
-        "by_source": defaultdict(list),
-        "by_destination": defaultdict(list),
-        "by_port": defaultdict(list),
+    Per-flow state lives in columnar arrays rather than per-packet dicts.
+    Root-cause tables keyed by host or port keep the `top_k` keys with the
+    most delay samples; everything else is folded into an exact "other"
+    entry, so the output stays bounded on scans and DDoS-like captures.
+    """
+    table = as_packet_table(packets)
+    l4 = table["l4"]
+
+    # Protocol distribution over all packets, in first-seen order
+    names = np.array([PROTOCOL_NAMES.get(code, "Unknown") for code in range(256)])
+    labels, first_index, counts = np.unique(
+        names[l4.astype(np.uint8)], return_index=True, return_counts=True
+    )
+    protocols = {
+        str(labels[i]): int(counts[i])
+        for i in np.argsort(first_index, kind="stable").tolist()
     }
 
-    for i, pkt in enumerate(packets):
-        protocol_type = "Unknown"
-        dst_port = src_port = None
-        src_ip = dst_ip = None
-
-        # Identify packet protocol type
-        if pkt.haslayer("TCP"):
-            protocol_type = "TCP"
-            dst_port = pkt["TCP"].dport
-            src_port = pkt["TCP"].sport
-        elif pkt.haslayer("UDP"):
-            protocol_type = "UDP"
-            dst_port = pkt["UDP"].dport
-            src_port = pkt["UDP"].sport
-        elif pkt.haslayer("ICMP"):
-            protocol_type = "ICMP"
-
-        protocols[protocol_type] += 1
-
-        if pkt.haslayer("IP"):
-            src_ip = pkt["IP"].src
-            dst_ip = pkt["IP"].dst
-            flow_id = f"{src_ip}:{src_port}-{dst_ip}:{dst_port}"
-
-            analyzed_packets.append((i, pkt, float(pkt.time), protocol_type))
-            if flow_id not in flows:
-                flows[flow_id] = []
-
-            flows[flow_id].append(
-                {
-                    "index": i,
-                    "time": float(pkt.time),
-                    "size": len(pkt),
-                    "protocol": protocol_type,
-                    "src_ip": src_ip,
-                    "dst_ip": dst_ip,
-                    "src_port": src_port,
-                    "dst_port": dst_port,
-                    "seq": (
-                        pkt["TCP"].seq
-                        if pkt.haslayer("TCP") and hasattr(pkt["TCP"], "seq")
-                        else None
-                    ),
-                }
-            )
+    # Flows are IPv4 conversations keyed by address and port
+    rows = np.nonzero(table["l3"] == L3_IPV4)[0]
+    sport = table["sport"][rows]
+    dport = table["dport"][rows]
+    flow_ids, _, _ = group_rows(table["src"][rows], sport, table["dst"][rows], dport)
+    flow_count = int(flow_ids.max()) + 1 if len(flow_ids) else 0
 
     results = {
-        "packet_count": len(analyzed_packets),
-        "protocol_distribution": dict(protocols),
-        "flows": len(flows),
+        "packet_count": len(rows),
+        "protocol_distribution": protocols,
+        "flows": flow_count,
         "patterns": {
             "periodic_transmissions": [],
             "bursty_traffic": [],
@@ -88,44 +71,108 @@ def detect_network_patterns(file_path: Path, packets: PacketList):
         "root_cause_analysis": {},
     }
 
-    for flow_id, packets in flows.items():
-        if len(packets) < 2:
-            continue
-
-        packets.sort(key=lambda p: p["time"])
-        delays = [
-            packets[i + 1]["time"] - packets[i]["time"] for i in range(len(packets) - 1)
-        ]
-
-        for i in range(len(packets) - 1):
-            pkt = packets[i]
-            delay = delays[i]
-            if delay > 0.001:
-                size_bucket = (
-                    f"{(pkt['size'] // 100) * 100}-{(pkt['size'] // 100 + 1) * 100}"
-                )
-                delay_factors["by_size"][size_bucket].append(delay)
-                delay_factors["by_protocol"][pkt["protocol"]].append(delay)
-                delay_factors["by_source"][pkt["src_ip"]].append(delay)
-                delay_factors["by_destination"][pkt["dst_ip"]].append(delay)
-                if pkt["dst_port"]:
-                    delay_factors["by_port"][f"dst:{pkt['dst_port']}"].append(delay)
-                if pkt["src_port"]:
-                    delay_factors["by_port"][f"src:{pkt['src_port']}"].append(delay)
+    # Delays between consecutive packets of each flow, ordered by time;
+    # each delay is attributed to the earlier packet of the pair
+    timestamps = table["timestamp"][rows]
+    order = np.lexsort((timestamps, flow_ids))
+    sorted_flows = flow_ids[order]
+    delays = np.diff(timestamps[order])
+    valid = (sorted_flows[1:] == sorted_flows[:-1]) & (delays > 0.001)
+    source_rows = rows[order[:-1][valid]]
+    delays = delays[valid]
+
+    sizes = table["size"][source_rows]
+    size_low = (sizes // 100) * 100
+    src_ports = table["sport"][source_rows]
+    dst_ports = table["dport"][source_rows]
+    hosts = table.hosts
+
+    factor_keys = {
+        "by_size": [f"{lo}-{lo + 100}" for lo in size_low.tolist()],
+        "by_protocol": [
+            PROTOCOL_NAMES.get(code, "Unknown") for code in l4[source_rows].tolist()
+        ],
+        "by_source": [hosts[h] for h in table["src"][source_rows].tolist()],
+        "by_destination": [hosts[h] for h in table["dst"][source_rows].tolist()],
+    }
+
+    # Ports: destination then source per delay sample, skipping missing ones
+    port_keys = []
+    port_delays = []
+    for delay, dp, sp in zip(delays.tolist(), dst_ports.tolist(), src_ports.tolist()):
+        if dp != NO_PORT and dp:
+            port_keys.append(f"dst:{dp}")
+            port_delays.append(delay)
+        if sp != NO_PORT and sp:
+            port_keys.append(f"src:{sp}")
+            port_delays.append(delay)
 
     # Root cause analysis processing
-    for factor, delays in delay_factors.items():
-        stats = {}
-        for key, delay_list in delays.items():
-            if delay_list:
-                avg_delay = sum(delay_list) / len(delay_list)
-                stats[key] = {
-                    "avg_delay": avg_delay,
-                    "min_delay": min(delay_list),
-                    "max_delay": max(delay_list),
-                    "count": len(delay_list),
-                    "std_dev": np.std(delay_list) if len(delay_list) > 1 else 0,
-                }
-        results["root_cause_analysis"][factor] = stats
+    for factor, keys in factor_keys.items():
+        results["root_cause_analysis"][factor] = _delay_stats(
+            keys, delays, top_k if factor in BOUNDED_FACTORS else None
+        )
+    results["root_cause_analysis"]["by_port"] = _delay_stats(
+        port_keys, np.array(port_delays, dtype=np.float64), top_k
+    )
 
     return results
+
+
+def _delay_stats(keys: list, delays: np.ndarray, top_k=None) -> dict:
+    """
+    Per-key delay statistics in first-seen key order.
+
+    With `top_k`, only the keys with the most samples are listed and the
+    remainder is summarized under "other".
+    """
+    if not keys:
+        return {}
+
+    names, first_index, key_ids = np.unique(
+        np.array(keys, dtype=object), return_index=True, return_inverse=True
+    )
+    stats_order = np.argsort(first_index, kind="stable")
+
+    counts = np.bincount(key_ids, minlength=len(names))
+    others = np.zeros(len(names), dtype=bool)
+    if top_k is not None and len(names) > top_k:
+        kept = np.argpartition(-counts, top_k - 1)[:top_k]
+        others[:] = True
+        others[kept] = False
+        stats_order = stats_order[~others[stats_order]]
+
+    sums = np.bincount(key_ids, weights=delays, minlength=len(names))
+    means = sums / counts
+    squares = np.bincount(
+        key_ids, weights=(delays - means[key_ids]) ** 2, minlength=len(names)
+    )
+    mins = np.full(len(names), np.inf)
+    np.minimum.at(mins, key_ids, delays)
+    maxs = np.full(len(names), -np.inf)
+    np.maximum.at(maxs, key_ids, delays)
+
+    stats = {}
+    for i in stats_order.tolist():
+        count = int(counts[i])
+        stats[names[i]] = {
+            "avg_delay": float(means[i]),
+            "min_delay": float(mins[i]),
+            "max_delay": float(maxs[i]),
+            "count": count,
+            "std_dev": float(np.sqrt(squares[i] / count)) if count > 1 else 0,
+        }
+
+    if others.any():
+        rest = others[key_ids]
+        rest_delays = delays[rest]
+        stats["other"] = {
+            "avg_delay": float(rest_delays.mean()),
+            "min_delay": float(rest_delays.min()),
+            "max_delay": float(rest_delays.max()),
+            "count": int(rest.sum()),
+            "std_dev": float(rest_delays.std()) if len(rest_delays) > 1 else 0,
+            "keys": int(others.sum()),
+        }
+
+    return stats
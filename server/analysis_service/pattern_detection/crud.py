@@ -1,17 +1,57 @@
 from pathlib import Path
+from typing import Optional, Union
 from scapy.all import PacketList
 import numpy as np
-
-
-def advanced_pattern_detection(file_path: Path, packets: PacketList):
-    """Performs advanced pattern detection on network traffic."""
-    timestamps = [float(pkt.time) for pkt in packets if hasattr(pkt, "time")]
+from analysis_storage.schema import DetailLevel
+from analysis_service.profile.schema import DEFAULT_PROFILE, AnalysisProfile
+from packet_extract_service.table import (
+    L3_IPV4,
+    L3_IPV6,
+    NO_HOST,
+    NO_PORT,
+    TOP_DNS,
+    TOP_HTTP,
+    TOP_LAYER_NAMES,
+    TOP_TCP,
+    TOP_TLS,
+    TOP_UDP,
+    PacketTable,
+    as_packet_table,
+)
+
+# Highest layers whose packets are paired with the reverse direction
+CONVERSATION_LAYERS = {TOP_TCP, TOP_UDP, TOP_HTTP, TOP_TLS, TOP_DNS}
+
+
+def advanced_pattern_detection(
+    file_path: Path,
+    packets: Union[PacketList, PacketTable],
+    detail: DetailLevel = DetailLevel.FLOWS,
+    profile: AnalysisProfile = DEFAULT_PROFILE,
+    delays: Optional[np.ndarray] = None,
+):
+    """Performs advanced pattern detection on network traffic.
+
+    Runs over the columnar packet table (decoded from `packets` when given
+    a PacketList); the highest layer of each packet is classified while
+    the table is built.
+
+    Per-packet protocol records (`packet_protocols`) are only built and
+    returned at the "packets" detail level. Gaps over
+    `profile.packet_loss_gap_factor` median delays count as packet loss.
+    `delays` takes already computed inter-packet delays (np.diff of the
+    timestamps).
+    """
+    keep_packets = DetailLevel(detail).includes(DetailLevel.PACKETS)
+    table = as_packet_table(packets)
+    timestamps = table["timestamp"]
 
     if len(timestamps) < 10:  # Need more packets for meaningful analysis
         return {"error": "Insufficient packets for advanced analysis"}
 
     # Calculate inter-packet delays
-    delays = np.diff(timestamps)
+    if delays is None:
+        delays = np.diff(timestamps)
 
     # Basic statistics
     stats = {
@@ -28,7 +68,7 @@ def advanced_pattern_detection(file_path: Path, packets: PacketList):
     # Assuming sequential packets should have consistent timing
     # Detect gaps that are significantly larger than the median delay
     median_delay = np.median(delays)
-    threshold = median_delay * 3  # Threshold for considering a gap as packet loss
+    threshold = median_delay * profile.packet_loss_gap_factor  # Threshold for considering a gap as packet loss
     large_gaps = delays[delays > threshold]
     estimated_lost_packets = sum(gap // median_delay for gap in large_gaps)
 
@@ -53,154 +93,96 @@ def advanced_pattern_detection(file_path: Path, packets: PacketList):
         else:
             stats["periodic_pattern_detected"] = False
 
-    # Group by protocols - detailed per packet
+    # Group by protocols, in order of first appearance
+    top_layers = table["top_layer"]
+    sizes = table["size"]
+    codes, first_rows = np.unique(top_layers, return_index=True)
     protocol_stats = {}
-    packet_protocols = []
+    for code in codes[np.argsort(first_rows)].tolist():
+        in_protocol = top_layers == code
+        latency = _protocol_latency(timestamps[in_protocol])
+        # The protocol's delay count is reported as its count
+        protocol_stats[TOP_LAYER_NAMES[code]] = {
+            "count": latency.pop("count"),
+            "bytes": int(sizes[in_protocol].sum()),
+            **latency,
+        }
+
+    results = {
+        "statistics": stats,
+        "protocol_distribution": protocol_stats,
+    }
 
-    # Structure to track protocol-based latency
-    protocol_latency = {}
-
-    # Track packets by conversation (src IP, dst IP, src port, dst port)
-    conversations = {}
-
-    # Process each packet
-    for i, pkt in enumerate(packets):
-        # Get detailed protocol information for each packet
-        packet_proto_info = {"packet_id": i}
-
-        # Identify the highest layer protocol
-        highest_layer = "Other"
-
-        # Check common protocols
-        if pkt.haslayer("TCP"):
-            highest_layer = "TCP"
-            if pkt.haslayer("HTTP"):
-                highest_layer = "HTTP"
-            elif pkt.haslayer("TLS") or pkt.haslayer("SSL"):
-                highest_layer = "TLS/SSL"
-        elif pkt.haslayer("UDP"):
-            highest_layer = "UDP"
-            if pkt.haslayer("DNS"):
-                highest_layer = "DNS"
-        elif pkt.haslayer("ICMP"):
-            highest_layer = "ICMP"
-        elif pkt.haslayer("ARP"):
-            highest_layer = "ARP"
-
-        packet_proto_info["protocol"] = highest_layer
-        packet_proto_info["size"] = len(pkt)
-
-        # Extract IP information
-        src_ip = "N/A"
-        dst_ip = "N/A"
-        if pkt.haslayer("IP"):
-            src_ip = pkt["IP"].src
-            dst_ip = pkt["IP"].dst
-        elif pkt.haslayer("IPv6"):
-            src_ip = pkt["IPv6"].src
-            dst_ip = pkt["IPv6"].dst
-
-        packet_proto_info["src_ip"] = src_ip
-        packet_proto_info["dst_ip"] = dst_ip
-
-        # Extract port information
-        src_port = "N/A"
-        dst_port = "N/A"
-        if pkt.haslayer("TCP"):
-            src_port = pkt["TCP"].sport
-            dst_port = pkt["TCP"].dport
-        elif pkt.haslayer("UDP"):
-            src_port = pkt["UDP"].sport
-            dst_port = pkt["UDP"].dport
-
-        packet_proto_info["src_port"] = src_port
-        packet_proto_info["dst_port"] = dst_port
-
-        # Add current timestamp
-        if hasattr(pkt, "time"):
-            packet_proto_info["timestamp"] = float(pkt.time)
-
-            # Track conversation for delay calculation
-            if highest_layer in ["TCP", "UDP", "HTTP", "TLS/SSL", "DNS"]:
-                # Create a conversation key (a tuple of src/dst IPs and ports)
-                forward_key = (src_ip, dst_ip, src_port, dst_port)
-                reverse_key = (dst_ip, src_ip, dst_port, src_port)
-
-                # For protocols with request/response pattern, we calculate delay
-                # Check if this packet could be a response to a previous packet
-                if reverse_key in conversations:
-                    # This might be a response, calculate delay from the last packet in reverse direction
-                    request_time = conversations[reverse_key]["last_time"]
-                    packet_proto_info["delay"] = float(pkt.time) - request_time
-                else:
-                    # This is a new conversation or a continuing conversation in the same direction
-                    packet_proto_info["delay"] = 0.0
-
-                # Update conversation tracking
-                if forward_key not in conversations:
-                    conversations[forward_key] = {
-                        "packets": 0,
-                        "last_time": float(pkt.time),
-                    }
-                else:
-                    conversations[forward_key]["last_time"] = float(pkt.time)
-                conversations[forward_key]["packets"] += 1
-            else:
-                # For other protocols without clear request/response pattern
-                packet_proto_info["delay"] = 0.0
-
-        packet_protocols.append(packet_proto_info)
-
-        # Also maintain the protocol distribution summary
-        if highest_layer not in protocol_stats:
-            protocol_stats[highest_layer] = {"count": 0, "bytes": 0}
-
-        protocol_stats[highest_layer]["count"] += 1
-        protocol_stats[highest_layer]["bytes"] += len(pkt)
-
-        # Initialize protocol latency tracking
-        if highest_layer not in protocol_latency:
-            protocol_latency[highest_layer] = {
-                "timestamps": [],
-                "delays": [],
-                "total_delay": 0,
-                "count": 0,
-                "avg_latency": 0,
-            }
+    if keep_packets:
+        results["packet_protocols"] = _packet_protocols(table)
 
-        # Add timestamp to the protocol's list
-        if hasattr(pkt, "time"):
-            protocol_latency[highest_layer]["timestamps"].append(float(pkt.time))
-
-    # Calculate per-protocol latency statistics
-    for protocol in protocol_latency:
-        timestamps = protocol_latency[protocol]["timestamps"]
-        if len(timestamps) > 1:
-            # Calculate delays between packets of the same protocol
-            delays = np.diff(timestamps)
-            protocol_latency[protocol]["delays"] = delays.tolist()
-            protocol_latency[protocol]["total_delay"] = float(np.sum(delays))
-            protocol_latency[protocol]["count"] = len(delays)
-            protocol_latency[protocol]["avg_latency"] = float(np.mean(delays))
-
-            # Add additional latency statistics
-            protocol_latency[protocol]["min_latency"] = float(np.min(delays))
-            protocol_latency[protocol]["max_latency"] = float(np.max(delays))
-            protocol_latency[protocol]["median_latency"] = float(np.median(delays))
-            protocol_latency[protocol]["std_latency"] = float(np.std(delays))
-
-            # Remove the raw timestamps and delays lists to keep output clean
-            del protocol_latency[protocol]["timestamps"]
-            del protocol_latency[protocol]["delays"]
-
-    # Add protocol latency statistics to protocol_stats
-    for protocol in protocol_latency:
-        if protocol in protocol_stats:
-            for key, value in protocol_latency[protocol].items():
-                if key != "timestamps" and key != "delays":
-                    protocol_stats[protocol][key] = value
+    return results
 
+
+def _protocol_latency(timestamps: np.ndarray) -> dict:
+    """Statistics of the delays between consecutive packets of one protocol."""
+    if len(timestamps) < 2:
+        return {"total_delay": 0, "count": 0, "avg_latency": 0}
+    delays = np.diff(timestamps)
     return {
-        "statistics": stats,
-        "protocol_distribution": protocol_stats,
+        "total_delay": float(np.sum(delays)),
+        "count": len(delays),
+        "avg_latency": float(np.mean(delays)),
+        "min_latency": float(np.min(delays)),
+        "max_latency": float(np.max(delays)),
+        "median_latency": float(np.median(delays)),
+        "std_latency": float(np.std(delays)),
     }
+
+
+def _packet_protocols(table: PacketTable) -> list:
+    """
+    Per-packet protocol records. `delay` is the time since the last packet
+    of the reverse direction of the packet's conversation (src/dst IP and
+    port), 0 for the first packet of a conversation and for protocols
+    without a request/response pattern.
+    """
+    has_ip = (table["l3"] == L3_IPV4) | (table["l3"] == L3_IPV6)
+    has_ports = table["sport"] != NO_PORT
+    src_ips = table.host_names(np.where(has_ip, table["src"], NO_HOST).tolist())
+    dst_ips = table.host_names(np.where(has_ip, table["dst"], NO_HOST).tolist())
+    src_ports = np.where(has_ports, table["sport"], NO_PORT).tolist()
+    dst_ports = np.where(has_ports, table["dport"], NO_PORT).tolist()
+
+    packet_protocols = []
+    last_times = {}  # (src IP, dst IP, src port, dst port) -> last packet time
+    for i, (code, size, timestamp, src_ip, dst_ip, src_port, dst_port) in enumerate(
+        zip(
+            table["top_layer"].tolist(),
+            table["size"].tolist(),
+            table["timestamp"].tolist(),
+            src_ips,
+            dst_ips,
+            src_ports,
+            dst_ports,
+        )
+    ):
+        src_ip = src_ip or "N/A"
+        dst_ip = dst_ip or "N/A"
+        src_port = src_port if src_port != NO_PORT else "N/A"
+        dst_port = dst_port if dst_port != NO_PORT else "N/A"
+        delay = 0.0
+        if code in CONVERSATION_LAYERS:
+            reverse_time = last_times.get((dst_ip, src_ip, dst_port, src_port))
+            if reverse_time is not None:
+                delay = timestamp - reverse_time
+            last_times[(src_ip, dst_ip, src_port, dst_port)] = timestamp
+        packet_protocols.append(
+            {
+                "packet_id": i,
+                "protocol": TOP_LAYER_NAMES[code],
+                "size": size,
+                "src_ip": src_ip,
+                "dst_ip": dst_ip,
+                "src_port": src_port,
+                "dst_port": dst_port,
+                "timestamp": timestamp,
+                "delay": delay,
+            }
+        )
+    return packet_protocols
@@ -0,0 +1,83 @@
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, NamedTuple, Tuple
+
+import numpy as np
+
+from analysis_service.network_analysis.crud import group_flows, retransmission_mask
+from packet_extract_service.table import build_packet_table
+
+logger = logging.getLogger(__name__)
+
+
+class Product(NamedTuple):
+    compute: Callable[..., Any]  # Called with the products in `inputs`, in order
+    inputs: Tuple[str, ...]
+
+
+# Intermediate products shared by the analyzers. "packets" (the decoded
+# Scapy packets) has no producer: it is always a source of the capture.
+PRODUCTS: Dict[str, Product] = {
+    "table": Product(build_packet_table, ("packets",)),
+    # Inter-packet delays in file order, in seconds
+    "deltas": Product(lambda table: np.diff(table["timestamp"]), ("table",)),
+    "delays_ms": Product(lambda deltas: deltas * 1000, ("deltas",)),
+    # Flows of the congestion analysis (FlowGrouping)
+    "flows": Product(group_flows, ("table",)),
+    "retransmissions": Product(
+        lambda table, flows: retransmission_mask(
+            table, flows.kind, flows.flow_ids, flows.flow_order
+        ),
+        ("table", "flows"),
+    ),
+}
+
+
+def product_inputs(names) -> set:
+    """`names` and every product they are computed from."""
+    needed = set()
+    pending = list(names)
+    while pending:
+        name = pending.pop()
+        if name not in needed:
+            needed.add(name)
+            if name in PRODUCTS:
+                pending.extend(PRODUCTS[name].inputs)
+    return needed
+
+
+class CaptureProducts:
+    """
+    Intermediate products of one capture, each computed on first use and
+    kept for every later analyzer.
+
+    `sources` maps product names to loaders that replace the producer in
+    PRODUCTS (e.g. "table" read from the decoded table cache instead of
+    built from packets). Each product has its own lock, so analyzers
+    running in parallel that need the same product wait for the one
+    computing it rather than computing it again.
+    """
+
+    def __init__(self, sources: Dict[str, Callable[[], Any]]):
+        self.sources = sources
+        self.values: Dict[str, Any] = {}
+        self.locks = {name: threading.Lock() for name in {*PRODUCTS, *sources}}
+
+    def get(self, name: str) -> Any:
+        if name in self.values:
+            return self.values[name]
+        if name not in self.locks:
+            raise KeyError(f"Unknown product {name!r}")
+        with self.locks[name]:
+            if name not in self.values:
+                if name in self.sources:
+                    value = self.sources[name]()
+                else:
+                    product = PRODUCTS[name]
+                    inputs = [self.get(source) for source in product.inputs]
+                    start = time.time()
+                    value = product.compute(*inputs)
+                    logger.debug("Computed %s in %.3f seconds", name, time.time() - start)
+                self.values[name] = value
+        return self.values[name]
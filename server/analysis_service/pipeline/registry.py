@@ -0,0 +1,199 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, NamedTuple, Optional, Tuple
+
+from analysis_service.delay_categorization.crud import analyze_packet_delays
+from analysis_service.heavy_hitters.crud import DEFAULT_TOP_K
+from analysis_service.network_analysis.crud import analyze_network_congestion
+from analysis_service.pattern_anomalies.crud import detect_network_patterns
+from analysis_service.pattern_detection.crud import advanced_pattern_detection
+from analysis_service.profile.schema import DEFAULT_PROFILE, PROFILE_FIELDS, AnalysisProfile
+from analysis_service.tcp_analysis.analysis import analyze_tcp_window_size
+from analysis_storage.schema import DetailLevel
+from cache_service.result_cache import RESULT_CACHE, get_result_cache, result_cache_key
+from latency_analysis_service.crud import calculate_average_latency
+from progress_service.hub import ProgressChannel
+from rollup_service.crud import compute_rollups
+from .products import CaptureProducts, product_inputs
+
+ANALYZER_WORKERS = int(os.getenv("ANALYZER_WORKERS", "4"))  # Analyzers run at once per capture
+
+
+class AnalysisOptions(NamedTuple):
+    file_path: Path
+    detail: DetailLevel = DetailLevel.FLOWS
+    top_k: int = DEFAULT_TOP_K
+    profile: AnalysisProfile = DEFAULT_PROFILE
+    artifact_dir: Optional[Path] = None  # Where per-packet output is written, if anywhere
+    capture_sha256: Optional[str] = None  # Results are cached only when the capture's digest is known
+    start: Optional[float] = None  # Capture time range the packets were selected from
+    end: Optional[float] = None
+
+
+class Analyzer(NamedTuple):
+    run: Callable[..., Any]  # Called with the options, then the products in `products`
+    products: Tuple[str, ...]  # Intermediate products it reads (see PRODUCTS)
+    params: Tuple[str, ...]  # Options the result depends on, besides its profile fields
+    # Bump when the analyzer's output changes (also through a product it
+    # reads), so cached results of earlier versions miss. None: not cached.
+    version: Optional[int]
+    # Writes per-packet output to options.artifact_dir when it is set, and
+    # returns it inline otherwise: the two results are cached apart
+    artifacts: bool = False
+
+
+# Keyed by the names of the upload analysis response, in its order; the
+# profile fields each analyzer reads are listed in PROFILE_FIELDS.
+# avg_latency stays on the Scapy packets: their exact decimal timestamps
+# give a different mean than float64 deltas.
+ANALYZERS: Dict[str, Analyzer] = {
+    "avg_latency": Analyzer(
+        lambda options, packets: calculate_average_latency(options.file_path, packets),
+        ("packets",),
+        (),
+        1,
+    ),
+    "pattern_analysis": Analyzer(
+        lambda options, table, deltas: advanced_pattern_detection(
+            options.file_path, table, options.detail, options.profile, deltas
+        ),
+        ("table", "deltas"),
+        ("detail",),
+        1,
+    ),
+    "mqtt_analysis": Analyzer(
+        lambda options, table: detect_network_patterns(options.file_path, table, options.top_k),
+        ("table",),
+        ("top_k",),
+        1,
+    ),
+    "congestion_analysis": Analyzer(
+        lambda options, table, flows, delays_ms, retransmissions: analyze_network_congestion(
+            options.file_path,
+            table,
+            options.detail,
+            options.top_k,
+            options.artifact_dir,
+            options.profile,
+            flows,
+            delays_ms,
+            retransmissions,
+        ),
+        ("table", "flows", "delays_ms", "retransmissions"),
+        ("detail", "top_k"),
+        2,  # 2: UDP flow keys are "UDP: "-prefixed
+        artifacts=True,
+    ),
+    "tcp_window_analysis": Analyzer(
+        lambda options, packets: analyze_tcp_window_size(options.file_path, packets),
+        ("packets",),
+        (),
+        1,
+    ),
+    "delay_categorization": Analyzer(
+        lambda options, table: analyze_packet_delays(options.file_path, table, options.profile),
+        ("table",),
+        (),
+        1,
+    ),
+}
+
+# Stored next to the analysis rather than part of it
+ROLLUP_ANALYZER = Analyzer(
+    lambda options, table, delays_ms, retransmissions: compute_rollups(
+        table, delays_ms=delays_ms, is_retransmission=retransmissions
+    ),
+    ("table", "delays_ms", "retransmissions"),
+    (),
+    None,  # Arrays keyed by resolution, not a JSON result
+)
+
+
+def run_analyzers(
+    analyzers: Dict[str, Analyzer],
+    products: CaptureProducts,
+    options: AnalysisOptions,
+    progress: Optional[ProgressChannel] = None,
+    on_result: Optional[Callable[[str, Any], None]] = None,
+    workers: int = ANALYZER_WORKERS,
+) -> Dict[str, Any]:
+    """
+    Runs analyzers over one capture, up to `workers` at a time (CPU-bound,
+    call from a worker thread). Versioned analyzers first look up their
+    result in the persistent result cache when `options.capture_sha256`
+    is set, and store it there on a miss.
+
+    Every analyzer is scheduled at once; it starts as soon as the products
+    it declares are ready, and each product is computed only by the first
+    analyzer that asks for it. Analyzers on the Scapy packets thus run
+    while the table and its products are still being built. `on_result`
+    is called from the worker thread as each analyzer finishes.
+
+    Returns:
+        Results keyed and ordered like `analyzers`. The first failure, in
+        that order, is raised once every analyzer has stopped.
+    """
+
+    cache = get_result_cache()
+
+    def run(name: str, analyzer: Analyzer):
+        key = result_key(name, analyzer, options)
+        result = None if key is None else cache.get(RESULT_CACHE, key)
+        if result is not None:
+            if progress is not None:
+                progress.stage(name, "finished", seconds=0.0, cached=True)
+        else:
+            inputs = [products.get(product) for product in analyzer.products]
+            if progress is not None:
+                progress.stage(name, "started")
+            start = time.time()
+            result = analyzer.run(options, *inputs)
+            end = time.time()
+            if progress is not None:
+                progress.stage(name, "finished", seconds=end - start)
+            # Results referencing artifact files belong to one stored capture
+            if key is not None and not (isinstance(result, dict) and result.get("artifacts")):
+                cache.set(RESULT_CACHE, key, result)
+        if on_result is not None:
+            on_result(name, result)
+        return result
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = {name: pool.submit(run, name, analyzer) for name, analyzer in analyzers.items()}
+    return {name: future.result() for name, future in futures.items()}
+
+
+def analyzer_params(name: str, options) -> Dict[str, Any]:
+    """
+    The options (AnalysisOptions, or a request with the same fields) and
+    profile fields analyzer `name` reads: what its cached results are
+    keyed by, besides the capture.
+    """
+    params = {param: getattr(options, param) for param in ANALYZERS[name].params}
+    params["profile"] = {
+        field: getattr(options.profile, field) for field in PROFILE_FIELDS.get(name, ())
+    }
+    return params
+
+
+def result_key(name: str, analyzer: Analyzer, options: AnalysisOptions) -> Optional[str]:
+    """Result cache key of an analyzer run, or None when it is not cached."""
+    if analyzer.version is None or options.capture_sha256 is None:
+        return None
+    params = {
+        **analyzer_params(name, options),
+        "start": options.start,
+        "end": options.end,
+    }
+    if analyzer.artifacts:
+        params["inline"] = options.artifact_dir is None
+    return result_cache_key(options.capture_sha256, name, analyzer.version, params)
+
+
+def analyzer_products(names: Iterable[str]) -> set:
+    """Products (with what they are computed from) the named analyzers read."""
+    return product_inputs(
+        product for name in names for product in ANALYZERS[name].products
+    )
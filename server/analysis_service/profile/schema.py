@@ -0,0 +1,58 @@
+from pydantic import BaseModel, Field
+
+# Congestion analysis (analyze_network_congestion, live windows)
+JITTER_SPIKE_THRESHOLD_MS = 50  # ms
+BUNDLING_DELAY_THRESHOLD_MS = 25  # ms
+CONGESTION_WINDOW_SIZE = 10  # packets
+BULK_UPLOAD_THRESHOLD = 15  # Number of packets in short time to consider bulk upload
+BULK_UPLOAD_TIME_WINDOW = 1.0  # seconds
+
+# Delay categorization (DelayAnalyzer)
+BUNDLE_MIN_DURATION = 0.01  # seconds; shorter small-packet clusters are not bundling
+BROKER_MIN_DELAY = 0.05  # seconds; faster broker responses are not processing delays
+CONGESTION_DELAY_FACTOR = 1.5  # Event delays over the capture mean needed for congestion
+JITTER_MIN_MEAN = 0.01  # seconds of mean delay variation for a flow to count as jittery
+
+# Pattern detection (advanced_pattern_detection)
+PACKET_LOSS_GAP_FACTOR = 3  # Gaps over this many median delays count as packet loss
+
+
+class AnalysisProfile(BaseModel):
+    """
+    Thresholds of the analyzers. Defaults reproduce the stored analysis; a
+    request can pass its own to look at a capture with finer (or coarser)
+    settings.
+    """
+
+    jitter_spike_threshold_ms: float = Field(JITTER_SPIKE_THRESHOLD_MS, gt=0)
+    bundling_delay_threshold_ms: float = Field(BUNDLING_DELAY_THRESHOLD_MS, gt=0)
+    congestion_window_size: int = Field(CONGESTION_WINDOW_SIZE, ge=1)
+    bulk_upload_threshold: int = Field(BULK_UPLOAD_THRESHOLD, ge=1)
+    bulk_upload_time_window: float = Field(BULK_UPLOAD_TIME_WINDOW, gt=0)
+    bundle_min_duration: float = Field(BUNDLE_MIN_DURATION, ge=0)
+    broker_min_delay: float = Field(BROKER_MIN_DELAY, ge=0)
+    congestion_delay_factor: float = Field(CONGESTION_DELAY_FACTOR, gt=0)
+    jitter_min_mean: float = Field(JITTER_MIN_MEAN, ge=0)
+    packet_loss_gap_factor: float = Field(PACKET_LOSS_GAP_FACTOR, gt=0)
+
+
+DEFAULT_PROFILE = AnalysisProfile()
+
+# Profile fields each analyzer reads, by analysis result key: a change to
+# any other field leaves that analyzer's result as it was
+PROFILE_FIELDS = {
+    "pattern_analysis": ("packet_loss_gap_factor",),
+    "congestion_analysis": (
+        "jitter_spike_threshold_ms",
+        "bundling_delay_threshold_ms",
+        "congestion_window_size",
+        "bulk_upload_threshold",
+        "bulk_upload_time_window",
+    ),
+    "delay_categorization": (
+        "bundle_min_duration",
+        "broker_min_delay",
+        "congestion_delay_factor",
+        "jitter_min_mean",
+    ),
+}
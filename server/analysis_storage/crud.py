@@ -1,10 +1,44 @@
+from typing import List, Optional, Tuple, Union
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
+from fastapi.concurrency import run_in_threadpool
+from cache_service.cache import cache_get_async, get_cache
+from storage_service.model import PcapngFile
 from .model import AnalysisResultsDB
-from .schema import AnalysisResults
+from .schema import AnalysisResults, DetailLevel
 
+# Cache namespaces
+ANALYSIS_CACHE = "analysis"
+LATEST_CACHE = "latest"
 
-def create_analysis_result(db: Session, analysis_data: AnalysisResults):
-    db_analysis = AnalysisResultsDB(
+# Sections (column, key path) that only exist from a given detail level up.
+# Stripped on read when a lower level is requested.
+FLOW_DETAIL_SECTIONS = [
+    ("congestion_analysis", ("ip_communication",)),
+    ("congestion_analysis", ("ip_communication_other",)),
+    ("congestion_analysis", ("heavy_hitters",)),
+    ("congestion_analysis", ("detailed_metrics", "jitter_analysis", "jitter_spikes")),
+    ("congestion_analysis", ("detailed_metrics", "tcp_analysis", "retransmissions")),
+    ("congestion_analysis", ("detailed_metrics", "change_points", "events")),
+]
+PACKET_DETAIL_SECTIONS = [
+    ("congestion_analysis", ("packet_flow",)),
+    ("pattern_analysis", ("packet_protocols",)),
+]
+
+ANALYSIS_COLUMNS = [
+    "average_latency",
+    "pattern_analysis",
+    "mqtt_analysis",
+    "congestion_analysis",
+    "tcp_window_analysis",
+    "delay_analysis",
+]
+
+
+def _new_analysis_row(analysis_data: AnalysisResults) -> AnalysisResultsDB:
+    return AnalysisResultsDB(
         pcapng_id=analysis_data.pcapng_id,  # Link to specific PCAPNG file
         average_latency=analysis_data.average_latency,
         pattern_analysis=analysis_data.pattern_analysis,
@@ -12,20 +46,259 @@ def create_analysis_result(db: Session, analysis_data: AnalysisResults):
         congestion_analysis=analysis_data.congestion_analysis,
         tcp_window_analysis=analysis_data.tcp_window_analysis,
         delay_analysis=analysis_data.delay_analysis,
+        artifacts=analysis_data.artifacts,
     )
+
+
+def _invalidate_analysis(pcapng_id: str, owner: Optional[PcapngFile]):
+    """New results change both the per-capture and the owner's latest view."""
+    cache = get_cache()
+    cache.invalidate(ANALYSIS_CACHE, str(pcapng_id))
+    if owner is not None:
+        cache.invalidate(LATEST_CACHE, owner.user_id)
+
+
+def create_analysis_result(db: Session, analysis_data: AnalysisResults):
+    db_analysis = _new_analysis_row(analysis_data)
     db.add(db_analysis)
     db.commit()
     db.refresh(db_analysis)
+    _invalidate_analysis(
+        analysis_data.pcapng_id, db.get(PcapngFile, str(analysis_data.pcapng_id))
+    )
+    return db_analysis
+
+
+async def create_analysis_result_async(
+    db: AsyncSession, analysis_data: AnalysisResults
+):
+    """Async counterpart of create_analysis_result."""
+    db_analysis = _new_analysis_row(analysis_data)
+    db.add(db_analysis)
+    await db.commit()
+    owner = await db.get(PcapngFile, str(analysis_data.pcapng_id))
+    await run_in_threadpool(_invalidate_analysis, analysis_data.pcapng_id, owner)
     return db_analysis
 
 
+async def delete_analysis_results_async(db: AsyncSession, pcapng_id: str):
+    """Removes a capture's analysis rows (e.g. those of a failed attempt before a retry)."""
+    await db.execute(delete(AnalysisResultsDB).where(AnalysisResultsDB.pcapng_id == str(pcapng_id)))
+    await db.commit()
+    owner = await db.get(PcapngFile, str(pcapng_id))
+    await run_in_threadpool(_invalidate_analysis, pcapng_id, owner)
+
+
 def get_analysis_results(db: Session, result_id: int):
     return db.query(AnalysisResultsDB).filter(AnalysisResultsDB.id == result_id).first()
 
 
-def get_analysis_by_pcapng(db: Session, pcapng_id: int):
-    return (
-        db.query(AnalysisResultsDB)
-        .filter(AnalysisResultsDB.pcapng_id == pcapng_id)
-        .all()
-    )
\ No newline at end of file
+def get_analysis_by_pcapng(
+    db: Session,
+    pcapng_id: int,
+    detail: DetailLevel = DetailLevel.PACKETS,
+    fields: Optional[str] = None,
+):
+    """
+    Analysis rows of a capture, read through the cache.
+
+    The full (packets level) rows are cached; the detail level is applied
+    on every read, so one entry serves all levels. With `fields` (see
+    parse_fields) only the requested columns / JSON paths are returned:
+    taken from the cached rows when present, otherwise extracted by the
+    database without loading the other columns.
+    """
+    projection = parse_fields(fields) if fields else None
+    cached = get_cache().get(ANALYSIS_CACHE, str(pcapng_id))
+
+    if cached is not None:
+        results = cached
+    elif projection is not None:
+        rows = db.execute(_projection_select(pcapng_id, projection)).all()
+        results = _projection_results(rows, projection)
+    else:
+        rows = db.execute(_analysis_select(pcapng_id)).scalars().all()
+        results = [analysis_to_dict(row) for row in rows]
+
+    return _finish_analysis_read(pcapng_id, results, cached, projection, detail)
+
+
+async def get_analysis_by_pcapng_async(
+    db: AsyncSession,
+    pcapng_id: str,
+    detail: DetailLevel = DetailLevel.PACKETS,
+    fields: Optional[str] = None,
+):
+    """
+    Async counterpart of get_analysis_by_pcapng (same caching and
+    projection). Cache I/O and the decoding / detail filtering of the
+    rows run in the threadpool, off the event loop.
+    """
+    projection = parse_fields(fields) if fields else None
+    cached = await cache_get_async(ANALYSIS_CACHE, str(pcapng_id))
+
+    if cached is not None:
+        results = cached
+    elif projection is not None:
+        rows = (await db.execute(_projection_select(pcapng_id, projection))).all()
+        results = _projection_results(rows, projection)
+    else:
+        rows = (await db.execute(_analysis_select(pcapng_id))).scalars().all()
+        results = [analysis_to_dict(row) for row in rows]
+
+    return await run_in_threadpool(
+        _finish_analysis_read, pcapng_id, results, cached, projection, detail
+    )
+
+
+def _analysis_select(pcapng_id: str):
+    return select(AnalysisResultsDB).where(AnalysisResultsDB.pcapng_id == pcapng_id)
+
+
+def _finish_analysis_read(pcapng_id, results, cached, projection, detail) -> list:
+    """
+    Shared tail of the sync/async reads: fills the cache with freshly
+    loaded full rows, projects cached rows and applies the detail level.
+    """
+    if cached is None and projection is None and results:
+        get_cache().set(ANALYSIS_CACHE, str(pcapng_id), results)
+    if cached is not None and projection is not None:
+        results = [_project(result, projection) for result in results]
+    return [apply_detail_level(result, detail) for result in results]
+
+
+def parse_fields(fields: str) -> List[Tuple[str, Tuple[Union[str, int], ...]]]:
+    """
+    Parses a `fields` projection such as
+    "delay_analysis.summary,congestion_analysis.congestion_score".
+
+    Each entry is a column name, optionally followed by a dotted path into
+    its JSON; all-digit path parts index into lists.
+
+    Returns:
+        List of (column, path) pairs, path empty for whole columns
+
+    Raises:
+        ValueError: On unknown columns or empty path parts
+    """
+    projection = []
+    for field in fields.split(","):
+        field = field.strip()
+        if not field:
+            continue
+        column, *path = field.split(".")
+        if column not in ANALYSIS_COLUMNS:
+            raise ValueError(f"Unknown analysis field: {column}")
+        if not all(path):
+            raise ValueError(f"Malformed field path: {field}")
+        projection.append(
+            (column, tuple(int(key) if key.isdigit() else key for key in path))
+        )
+    if not projection:
+        raise ValueError("No fields requested")
+    return projection
+
+
+def _projection_select(pcapng_id: str, projection):
+    """
+    Selects only the projected columns / JSON paths. Paths are extracted
+    in the database (`#>` on PostgreSQL, JSON_EXTRACT on SQLite), so the
+    rest of each JSON document never leaves the server.
+    """
+    expressions = []
+    for column, path in projection:
+        attribute = getattr(AnalysisResultsDB, column)
+        expressions.append(attribute[path] if path else attribute)
+
+    return select(
+        AnalysisResultsDB.id, AnalysisResultsDB.pcapng_id, *expressions
+    ).where(AnalysisResultsDB.pcapng_id == pcapng_id)
+
+
+def _projection_results(rows, projection) -> List[dict]:
+    """Rebuilds nested result dicts from projected rows."""
+    results = []
+    for row in rows:
+        result = {"id": row[0], "pcapng_id": row[1]}
+        for (column, path), value in zip(projection, row[2:]):
+            _set_path(result, (column,) + path, value)
+        results.append(result)
+    return results
+
+
+def _project(result: dict, projection) -> dict:
+    """Applies a projection to an already loaded analysis row."""
+    projected = {"id": result["id"], "pcapng_id": result["pcapng_id"]}
+    for column, path in projection:
+        value = result.get(column)
+        for key in path:
+            try:
+                value = value[key]
+            except (KeyError, IndexError, TypeError):
+                value = None
+                break
+        _set_path(projected, (column,) + path, value)
+    return projected
+
+
+def _set_path(result: dict, path: tuple, value):
+    """Stores `value` at a nested key path, creating dicts along the way."""
+    node = result
+    for key in path[:-1]:
+        child = node.get(key)
+        if not isinstance(child, dict):
+            child = node[key] = {}
+        node = child
+    node[path[-1]] = value
+
+
+def analysis_to_dict(row: AnalysisResultsDB) -> dict:
+    """Plain dict view of a stored analysis row."""
+    result = {"id": row.id, "pcapng_id": row.pcapng_id}
+    for column in ANALYSIS_COLUMNS:
+        result[column] = getattr(row, column)
+    result["artifacts"] = public_artifacts(row.artifacts)
+    return result
+
+
+def public_artifacts(manifest: Optional[dict]) -> Optional[dict]:
+    """
+    Client view of a stored artifact manifest: name -> rows and columns.
+    The on-disk paths stay server-side; records are read through
+    /storage/analysis/{pcapng_id}/artifacts/{name}.
+    """
+    if manifest is None:
+        return None
+    return {
+        name: {"rows": entry["rows"], "columns": list(entry["columns"])}
+        for name, entry in manifest.items()
+    }
+
+
+def apply_detail_level(result: dict, detail: DetailLevel) -> dict:
+    """
+    Drops sections above the requested detail level from a stored analysis.
+
+    Stored rows only contain what was computed at upload time, so asking for a
+    higher level than was stored simply returns what is there.
+    """
+    detail = DetailLevel(detail)
+    sections = []
+    if not detail.includes(DetailLevel.PACKETS):
+        sections += PACKET_DETAIL_SECTIONS
+    if not detail.includes(DetailLevel.FLOWS):
+        sections += FLOW_DETAIL_SECTIONS
+
+    for column, path in sections:
+        node = result.get(column)
+        for key in path[:-1]:
+            node = node.get(key) if isinstance(node, dict) else None
+        if isinstance(node, dict) and path[-1] in node:
+            # Copy along the path so ORM-held JSON is never mutated in place
+            node = result[column] = dict(result[column])
+            for key in path[:-1]:
+                node[key] = dict(node[key])
+                node = node[key]
+            del node[path[-1]]
+
+    return result
@@ -0,0 +1,26 @@
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Engine
+from .model import AnalysisResultsDB
+
+
+def migrate_analysis_results(engine: Engine):
+    """
+    Adds columns and indexes introduced after analysis_results was first
+    created (`create_all` never alters existing tables). Safe to run on
+    every start.
+    """
+    table = AnalysisResultsDB.__table__
+    inspector = inspect(engine)
+    if not inspector.has_table(table.name):
+        return  # Fresh database: create_all builds the full table
+
+    existing = {column["name"] for column in inspector.get_columns(table.name)}
+    with engine.begin() as conn:
+        for column in table.columns:
+            if column.name not in existing:
+                column_type = column.type.compile(dialect=engine.dialect)
+                conn.execute(
+                    text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}")
+                )
+        for index in table.indexes:
+            index.create(conn, checkfirst=True)
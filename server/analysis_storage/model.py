@@ -8,7 +8,7 @@ class AnalysisResultsDB(Base):
     __tablename__ = "analysis_results"
 
     id = Column(String, primary_key=True, index=True, default=lambda: str(uuid.uuid4()))
-    pcapng_id = Column(String, ForeignKey("pcapng_storage.id"), nullable=False)  # Links to uploaded file
+    pcapng_id = Column(String, ForeignKey("pcapng_storage.id"), nullable=False, index=True)  # Links to uploaded file
  # Linking to PCAPNG file
     average_latency = Column(Float, nullable=True)
     pattern_analysis = Column(JSON, nullable=True)
@@ -16,4 +16,5 @@ class AnalysisResultsDB(Base):
     congestion_analysis = Column(JSON, nullable=True)
     tcp_window_analysis = Column(JSON, nullable=True)
     delay_analysis = Column(JSON, nullable=True)
+    artifacts = Column(JSON, nullable=True)  # Columnar artifact files: name -> {path, rows, columns}
 
@@ -1,5 +1,24 @@
+from enum import Enum
 from pydantic import BaseModel
-from typing import Dict, Any
+from typing import Dict, Any, Optional
+
+
+class DetailLevel(str, Enum):
+    """How much of an analysis is materialized and stored.
+
+    summary  - scalar metrics only
+    flows    - adds per-flow tables and per-event lists (O(flows))
+    packets  - adds per-packet records (O(packets))
+    """
+
+    SUMMARY = "summary"
+    FLOWS = "flows"
+    PACKETS = "packets"
+
+    def includes(self, level: "DetailLevel") -> bool:
+        """True if this level contains everything produced at `level`."""
+        order = list(DetailLevel)
+        return order.index(self) >= order.index(DetailLevel(level))
 
 
 class AnalysisResults(BaseModel):
@@ -10,6 +29,7 @@ class AnalysisResults(BaseModel):
     congestion_analysis: Dict[str, Any]
     tcp_window_analysis: Dict[str, Any]
     delay_analysis: Dict[str, Any]
+    artifacts: Optional[Dict[str, Any]] = None
 
     class Config:
         from_attributes = True # Enable ORM compatibility
@@ -0,0 +1,110 @@
+import json
+import os
+import shutil
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+
+META_FILE = "meta.json"
+
+# Uploaded captures, their artifacts and the on-disk caches. Shared by every
+# API process and job worker (a network mount when they run on several hosts).
+UPLOAD_DIR = Path(os.getenv("UPLOAD_DIR", "uploaded_pcapng_files"))
+
+
+def artifact_root(upload_dir: Path, pcapng_id: str) -> Path:
+    """Directory holding the artifacts of one capture, next to the upload."""
+    return Path(upload_dir) / f"{pcapng_id}.artifacts"
+
+
+def write_artifact(
+    root: Path,
+    name: str,
+    columns: Dict[str, np.ndarray],
+    dictionaries: Optional[Dict[str, List[Any]]] = None,
+    attributes: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    """
+    Writes a columnar artifact: one `.npy` file per column plus `meta.json`.
+
+    Columns must all have the same length. Repeated strings (hosts, flow
+    names) should be dictionary-encoded by the caller: stored as integer
+    codes in a column, with the values listed once in `dictionaries`.
+    Plain `.npy` is used rather than compressed `.npz` so readers can
+    memory-map the files and slice rows without loading whole columns.
+    `attributes` holds small artifact-level values (JSON-serializable).
+
+    The artifact is written to a temporary directory and renamed into
+    place, so readers never see a partial artifact.
+
+    Returns:
+        Manifest entry (path, rows, column dtypes) to store with the analysis
+    """
+    lengths = {len(values) for values in columns.values()}
+    if len(lengths) > 1:
+        raise ValueError(f"Artifact {name} has columns of different lengths")
+    rows = lengths.pop() if lengths else 0
+
+    root = Path(root)
+    target = root / name
+    staging = root / f".{name}.tmp"
+    shutil.rmtree(staging, ignore_errors=True)
+    staging.mkdir(parents=True)
+
+    for column, values in columns.items():
+        np.save(staging / f"{column}.npy", np.ascontiguousarray(values))
+    meta = {
+        "rows": rows,
+        "columns": {column: str(values.dtype) for column, values in columns.items()},
+        "dictionaries": dictionaries or {},
+        "attributes": attributes or {},
+    }
+    (staging / META_FILE).write_text(json.dumps(meta))
+
+    shutil.rmtree(target, ignore_errors=True)
+    staging.rename(target)
+    return {"path": str(target), "rows": rows, "columns": meta["columns"]}
+
+
+class Artifact:
+    """Read side of a columnar artifact; columns are memory-mapped on first use."""
+
+    def __init__(self, root: Path, name: str):
+        self.path = Path(root) / name
+        meta_path = self.path / META_FILE
+        if not meta_path.exists():
+            raise FileNotFoundError(f"Artifact {name} not found")
+        meta = json.loads(meta_path.read_text())
+        self.rows = meta["rows"]
+        self.column_names = list(meta["columns"])
+        self.dictionaries = meta["dictionaries"]
+        self.attributes = meta.get("attributes", {})
+        self._columns: Dict[str, np.ndarray] = {}
+
+    def column(self, name: str) -> np.ndarray:
+        if name not in self._columns:
+            if name not in self.column_names:
+                raise KeyError(f"Unknown artifact column: {name}")
+            self._columns[name] = np.load(self.path / f"{name}.npy", mmap_mode="r")
+        return self._columns[name]
+
+    def slice(
+        self, start: int, stop: int, columns: Optional[Iterable[str]] = None
+    ) -> Dict[str, np.ndarray]:
+        """Rows [start, stop) of the requested columns, copied out of the mmap."""
+        start = max(0, start)
+        stop = min(self.rows, stop)
+        return {
+            name: np.array(self.column(name)[start:stop])
+            for name in (columns or self.column_names)
+        }
+
+    def take(
+        self, rows: np.ndarray, columns: Optional[Iterable[str]] = None
+    ) -> Dict[str, np.ndarray]:
+        """Arbitrary rows (e.g. from a filter) of the requested columns."""
+        return {
+            name: np.asarray(self.column(name)[rows])
+            for name in (columns or self.column_names)
+        }
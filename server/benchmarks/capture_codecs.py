@@ -0,0 +1,91 @@
+"""
+Compressed capture throughput benchmark.
+
+Writes gzip and zstd copies of a capture to a temporary directory and
+times, for the original and each copy:
+
+  - streaming decompression alone (CaptureStream read to the end)
+  - the header-only first look (scan_capture_headers)
+  - the full scapy decode used by the upload path (read_capture)
+
+Throughput is reported against the decompressed size, so the codecs are
+directly comparable with the uncompressed file.
+
+    python benchmarks/capture_codecs.py capture.pcapng
+    python benchmarks/capture_codecs.py capture.pcapng --no-decode   # skip the slow scapy pass
+"""
+import argparse
+import gzip
+import os
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import zstandard
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("DATABASE_URL", "sqlite:///capture_codecs_benchmark.db")
+
+from capture_scan_service.codecs import open_capture  # noqa: E402
+from capture_scan_service.crud import scan_capture_headers  # noqa: E402
+from packet_extract_service.crud import read_capture  # noqa: E402
+
+READ_BYTES = 1024 * 1024
+
+
+def compress(source: Path, directory: Path) -> dict:
+    """Original capture plus gzip / zstd copies, keyed by codec."""
+    files = {"uncompressed": source}
+    start = time.time()
+    with open(source, "rb") as src, gzip.open(directory / (source.name + ".gz"), "wb", compresslevel=6) as dst:
+        shutil.copyfileobj(src, dst, READ_BYTES)
+    files["gzip"] = directory / (source.name + ".gz")
+    print(f"gzip -6 in {time.time() - start:.2f} seconds")
+
+    start = time.time()
+    with open(source, "rb") as src, open(directory / (source.name + ".zst"), "wb") as dst:
+        zstandard.ZstdCompressor(level=3).copy_stream(src, dst)
+    files["zstd"] = directory / (source.name + ".zst")
+    print(f"zstd -3 in {time.time() - start:.2f} seconds")
+    return files
+
+
+def decompress_only(path: Path) -> int:
+    with open_capture(path) as stream:
+        while stream.read(READ_BYTES):
+            pass
+        return stream.position
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("capture", type=Path)
+    parser.add_argument("--no-decode", action="store_true", help="skip read_capture")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        files = compress(args.capture, Path(directory))
+        print(f"\n{'codec':<14}{'stored MB':>10}{'stream MB/s':>13}{'first look MB/s':>17}{'decode MB/s':>13}")
+        for codec, path in files.items():
+            stored = path.stat().st_size / 1e6
+
+            start = time.perf_counter()
+            size = decompress_only(path) / 1e6
+            stream_rate = size / (time.perf_counter() - start)
+
+            first_look = scan_capture_headers(path)
+            scan_rate = size / first_look["scan_seconds"]
+
+            decode_rate = float("nan")
+            if not args.no_decode:
+                start = time.perf_counter()
+                read_capture(path)
+                decode_rate = size / (time.perf_counter() - start)
+
+            print(f"{codec:<14}{stored:>10.1f}{stream_rate:>13.1f}{scan_rate:>17.1f}{decode_rate:>13.1f}")
+
+
+if __name__ == "__main__":
+    main()
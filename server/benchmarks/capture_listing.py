@@ -0,0 +1,157 @@
+"""
+Capture listing / latest-capture benchmark.
+
+Seeds `--captures` pcapng_storage rows (spread over `--users` users, each
+with one small analysis row) into DATABASE_URL, then times:
+
+  - first and deep keyset pages of GET /storage/ (all users and one user)
+  - the single-query "latest with analysis" lookup
+  - the previous unpaginated listing and two-query latest lookup
+
+With --compare the same queries are also timed with the listing indexes
+dropped, to show what they buy.
+
+    DATABASE_URL=postgresql://... python benchmarks/capture_listing.py
+    python benchmarks/capture_listing.py --captures 100000   # SQLite default
+"""
+import argparse
+import os
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("DATABASE_URL", "sqlite:///capture_listing_benchmark.db")
+
+from sqlalchemy import delete, select  # noqa: E402
+
+import database  # noqa: E402
+from analysis_storage.model import AnalysisResultsDB  # noqa: E402
+from storage_service import crud  # noqa: E402
+from storage_service.model import PcapngFile  # noqa: E402
+
+INSERT_BATCH = 50000
+DEEP_PAGES = 50
+
+
+def seed(captures: int, users: int):
+    """Replaces the benchmark tables' content with `captures` synthetic uploads."""
+    database.Base.metadata.create_all(bind=database.engine)
+    start_time = datetime(2024, 1, 1)
+    start = time.time()
+    with database.engine.begin() as conn:
+        conn.execute(delete(AnalysisResultsDB))
+        conn.execute(delete(PcapngFile))
+        for offset in range(0, captures, INSERT_BATCH):
+            files, analyses = [], []
+            for n in range(offset, min(captures, offset + INSERT_BATCH)):
+                file_id = str(uuid.uuid4())
+                files.append({
+                    "id": file_id,
+                    "filename": f"capture-{n}.pcapng",
+                    "upload_timestamp": start_time + timedelta(seconds=n),
+                    "user_id": f"user-{n % users}",
+                })
+                analyses.append({
+                    "id": str(uuid.uuid4()),
+                    "pcapng_id": file_id,
+                    "average_latency": 0.01,
+                    "delay_analysis": {"summary": {"count": n}},
+                })
+            conn.execute(PcapngFile.__table__.insert(), files)
+            conn.execute(AnalysisResultsDB.__table__.insert(), analyses)
+    print(f"Seeded {captures} captures for {users} users in {time.time() - start:.1f} seconds")
+
+
+def timed(label: str, function, repeat: int = 5):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    print(f"{label:<48} {best * 1000:10.2f} ms")
+
+
+def walk_pages(user_id, pages: int):
+    cursor = None
+    with database.SessionLocal() as db:
+        for _ in range(pages):
+            page = crud.get_pcapng_file_page(db, user_id, cursor)
+            cursor = page["next_cursor"]
+            if cursor is None:
+                break
+
+
+def legacy_listing():
+    with database.SessionLocal() as db:
+        db.query(PcapngFile).all()
+
+
+def legacy_latest(user_id: str):
+    # Two round trips, as before the single-query join
+    with database.SessionLocal() as db:
+        latest = db.execute(
+            select(PcapngFile)
+            .where(PcapngFile.user_id == user_id)
+            .order_by(PcapngFile.upload_timestamp.desc())
+            .limit(1)
+        ).scalar()
+        db.execute(
+            select(AnalysisResultsDB).where(AnalysisResultsDB.pcapng_id == latest.id).limit(1)
+        ).scalar()
+
+
+def latest(user_id: str):
+    with database.SessionLocal() as db:
+        crud._latest_result(user_id, db.execute(crud._latest_select(user_id)).first())
+
+
+def run_queries(user_id: str, include_full_listing: bool):
+    timed("first page (all users)", lambda: walk_pages(None, 1))
+    timed(f"{DEEP_PAGES} pages (all users)", lambda: walk_pages(None, DEEP_PAGES), repeat=1)
+    timed(f"first page ({user_id})", lambda: walk_pages(user_id, 1))
+    timed(f"latest with analysis ({user_id})", lambda: latest(user_id))
+    timed(f"legacy two-query latest ({user_id})", lambda: legacy_latest(user_id))
+    if include_full_listing:
+        timed("legacy unpaginated listing", legacy_listing, repeat=1)
+
+
+def listing_indexes():
+    return list(PcapngFile.__table__.indexes) + [
+        index for index in AnalysisResultsDB.__table__.indexes
+        if "pcapng_id" in index.columns
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--captures", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--skip-seed", action="store_true")
+    parser.add_argument("--compare", action="store_true", help="also time without the listing indexes")
+    parser.add_argument("--full-listing", action="store_true", help="also time the old unpaginated listing")
+    args = parser.parse_args()
+
+    print(f"Database: {database.engine.url.render_as_string(hide_password=True)}")
+    if not args.skip_seed:
+        seed(args.captures, args.users)
+    user_id = f"user-{args.users // 2}"
+
+    print("\nWith listing indexes")
+    run_queries(user_id, args.full_listing)
+
+    if args.compare:
+        for index in listing_indexes():
+            index.drop(database.engine, checkfirst=True)
+        print("\nWithout listing indexes")
+        try:
+            run_queries(user_id, False)
+        finally:
+            for index in listing_indexes():
+                index.create(database.engine, checkfirst=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+import os
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+import redis
+from fastapi.concurrency import run_in_threadpool
+
+from job_service.crud import JOB_QUEUE_ENABLED
+from response_service.encoding import dumps, loads
+
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379")
+CACHE_TTL_SECONDS = int(os.getenv("CACHE_TTL_SECONDS", "300"))
+CACHE_MAX_BYTES = int(os.getenv("CACHE_MAX_BYTES", str(64 * 1024 * 1024)))  # In-process fallback only
+CACHE_KEY_PREFIX = "raven:"
+COMPRESSION_LEVEL = 6
+
+# Failures of a cache backend that are counted and treated as misses
+BACKEND_ERRORS = (redis.RedisError, OSError)
+
+
+def encode_payload(value: Any) -> bytes:
+    """JSON-serializes and zlib-compresses a cache value."""
+    return zlib.compress(dumps(value), COMPRESSION_LEVEL)
+
+
+def decode_payload(payload: bytes) -> Any:
+    return loads(zlib.decompress(payload))
+
+
+class LRUCache:
+    """
+    In-process byte-bounded LRU with per-entry TTL, used when Redis is not
+    reachable (development, tests). Same get/set/delete surface as
+    RedisCache, storing the same compressed payloads.
+
+    Only correct in a single process: invalidations made by another API
+    worker or a job worker never reach it, so it serves stale rows until
+    they expire. See create_cache.
+    """
+
+    name = "memory"
+
+    def __init__(self, max_bytes: int = CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.entries: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (expires_at, payload)
+        self.size = 0
+        self.lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            expires_at, payload = entry
+            if expires_at < time.monotonic():
+                self._remove(key)
+                return None
+            self.entries.move_to_end(key)
+            return payload
+
+    def set(self, key: str, payload: bytes, ttl: int):
+        if len(payload) > self.max_bytes:
+            return  # Never evict everything for a single oversized value
+        with self.lock:
+            if key in self.entries:
+                self._remove(key)
+            self.entries[key] = (time.monotonic() + ttl, payload)
+            self.size += len(payload)
+            while self.size > self.max_bytes:
+                self._remove(next(iter(self.entries)))
+
+    def delete(self, key: str):
+        with self.lock:
+            if key in self.entries:
+                self._remove(key)
+
+    def _remove(self, key: str):
+        _, payload = self.entries.pop(key)
+        self.size -= len(payload)
+
+
+class NullCache:
+    """Backend of a turned-off cache: every lookup misses, writes are dropped."""
+
+    name = "disabled"
+
+    def get(self, key: str) -> Optional[bytes]:
+        return None
+
+    def set(self, key: str, payload: bytes, ttl: int):
+        pass
+
+    def delete(self, key: str):
+        pass
+
+
+class RedisCache:
+    """Thin wrapper around a synchronous Redis client storing raw bytes."""
+
+    name = "redis"
+
+    def __init__(self, client: redis.Redis):
+        self.client = client
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self.client.get(key)
+
+    def set(self, key: str, payload: bytes, ttl: int):
+        self.client.set(key, payload, ex=ttl)
+
+    def delete(self, key: str):
+        self.client.delete(key)
+
+
+class ReadThroughCache:
+    """
+    Compressed JSON cache with hit/miss accounting per namespace.
+
+    Backend errors (e.g. Redis going away, a full disk) are counted and
+    treated as misses, so the database stays the source of truth.
+    """
+
+    def __init__(self, backend, ttl: int = CACHE_TTL_SECONDS):
+        self.backend = backend
+        self.ttl = ttl
+        self.stats: Dict[str, Dict[str, int]] = {}
+        self.lock = threading.Lock()
+
+    def get(self, namespace: str, key: str) -> Optional[Any]:
+        try:
+            payload = self.backend.get(self._key(namespace, key))
+        except BACKEND_ERRORS:
+            self._count(namespace, "errors")
+            payload = None
+        self._count(namespace, "misses" if payload is None else "hits")
+        return None if payload is None else decode_payload(payload)
+
+    def set(self, namespace: str, key: str, value: Any, ttl: Optional[int] = None):
+        try:
+            self.backend.set(
+                self._key(namespace, key), encode_payload(value), ttl or self.ttl
+            )
+            self._count(namespace, "sets")
+        except BACKEND_ERRORS:
+            self._count(namespace, "errors")
+
+    def invalidate(self, namespace: str, key: str):
+        try:
+            self.backend.delete(self._key(namespace, key))
+            self._count(namespace, "invalidations")
+        except BACKEND_ERRORS:
+            self._count(namespace, "errors")
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self.lock:
+            namespaces = {name: dict(counts) for name, counts in self.stats.items()}
+        for counts in namespaces.values():
+            lookups = counts.get("hits", 0) + counts.get("misses", 0)
+            counts["hit_rate"] = counts.get("hits", 0) / lookups if lookups else 0.0
+        return {"backend": self.backend.name, "ttl": self.ttl, "namespaces": namespaces}
+
+    def _key(self, namespace: str, key: str) -> str:
+        return f"{CACHE_KEY_PREFIX}{namespace}:{key}"
+
+    def _count(self, namespace: str, counter: str):
+        with self.lock:
+            counts = self.stats.setdefault(namespace, {})
+            counts[counter] = counts.get(counter, 0) + 1
+
+
+def create_cache(shared: bool = JOB_QUEUE_ENABLED) -> ReadThroughCache:
+    """
+    Redis when it answers a ping at REDIS_URL, otherwise the in-process LRU.
+
+    `shared` says other processes write the same database (job workers,
+    with JOB_QUEUE_ENABLED): without Redis their invalidations could not
+    reach this process, so caching is turned off rather than kept local.
+    """
+    if REDIS_URL:
+        client = redis.Redis.from_url(
+            REDIS_URL, socket_connect_timeout=0.5, socket_timeout=1.0
+        )
+        try:
+            client.ping()
+            return ReadThroughCache(RedisCache(client))
+        except redis.RedisError:
+            print(f"Redis unavailable at {REDIS_URL}")
+    if shared:
+        print("Caching disabled: other processes' invalidations need Redis")
+        return ReadThroughCache(NullCache())
+    print("Using the in-process cache")
+    return ReadThroughCache(LRUCache())
+
+
+_cache: Optional[ReadThroughCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> ReadThroughCache:
+    """Process-wide cache, created on first use."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = create_cache()
+    return _cache
+
+
+# Async paths go through the threadpool: a Redis round trip (and the ping
+# on first use) blocks, and so does (de)compressing and decoding payloads
+# that can run to several MB.
+async def cache_get_async(namespace: str, key: str) -> Optional[Any]:
+    return await run_in_threadpool(lambda: get_cache().get(namespace, key))
+
+
+async def cache_invalidate_async(namespace: str, key: str):
+    await run_in_threadpool(lambda: get_cache().invalidate(namespace, key))
@@ -0,0 +1,171 @@
+import hashlib
+import os
+import threading
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import redis
+
+from artifact_service.crud import UPLOAD_DIR, Artifact, write_artifact
+from response_service.encoding import dumps
+from .cache import REDIS_URL, ReadThroughCache, RedisCache
+
+# "disk" (default) or "redis"; Redis should then run with an LRU maxmemory-policy
+RESULT_CACHE_BACKEND = os.getenv("RESULT_CACHE_BACKEND", "disk")
+RESULT_CACHE_DIR = Path(os.getenv("RESULT_CACHE_DIR", str(UPLOAD_DIR / ".result_cache")))
+RESULT_CACHE_MAX_BYTES = int(os.getenv("RESULT_CACHE_MAX_BYTES", str(1024 * 1024 * 1024)))
+RESULT_CACHE_TTL_SECONDS = int(os.getenv("RESULT_CACHE_TTL_SECONDS", str(30 * 24 * 3600)))  # Redis only
+RESULT_CACHE = "results"
+CAPTURE_DIGEST_ARTIFACT = "capture_digest"
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+class DiskCache:
+    """
+    Size-bounded store of cache payloads on local disk, one file per key,
+    with the same get/set/delete surface as RedisCache.
+
+    Recency is the file's mtime, refreshed on every hit, so the LRU order
+    survives restarts and is shared by every process using the directory.
+    The directory size is only rescanned once this process's running
+    total passes `max_bytes`; entries are never expired by age.
+    """
+
+    name = "disk"
+
+    def __init__(self, directory: Path = RESULT_CACHE_DIR, max_bytes: int = RESULT_CACHE_MAX_BYTES):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.size: Optional[int] = None  # Bytes on disk as last scanned, plus writes since
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        path = self._path(key)
+        try:
+            payload = path.read_bytes()
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return payload
+
+    def set(self, key: str, payload: bytes, ttl: int):
+        if len(payload) > self.max_bytes:
+            return  # Never evict everything for a single oversized value
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        staging = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}")
+        staging.write_bytes(payload)
+        os.replace(staging, path)  # Readers never see a partial entry
+        with self.lock:
+            if self.size is not None:
+                self.size += len(payload)
+            if self.size is None or self.size > self.max_bytes:
+                self.evict()
+
+    def delete(self, key: str):
+        try:
+            self._path(key).unlink()
+        except FileNotFoundError:
+            pass
+
+    def evict(self):
+        """Removes least recently used entries until the directory fits max_bytes."""
+        entries = []
+        total = 0
+        for path in self.directory.glob("*/*"):
+            if path.name.startswith("."):
+                continue  # Entries being written
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue  # Evicted by another process meanwhile
+            entries.append((stat.st_mtime_ns, stat.st_size, path))
+            total += stat.st_size
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                path.unlink()
+                self.evictions += 1
+            except FileNotFoundError:
+                pass
+            total -= size
+        self.size = total
+
+    def _path(self, key: str) -> Path:
+        digest = hashlib.sha256(key.encode()).hexdigest()
+        return self.directory / digest[:2] / digest
+
+
+def create_result_cache() -> ReadThroughCache:
+    """The on-disk cache, or Redis when RESULT_CACHE_BACKEND is "redis" and it answers."""
+    if RESULT_CACHE_BACKEND == "redis":
+        client = redis.Redis.from_url(REDIS_URL, socket_connect_timeout=0.5, socket_timeout=1.0)
+        try:
+            client.ping()
+            return ReadThroughCache(RedisCache(client), RESULT_CACHE_TTL_SECONDS)
+        except redis.RedisError:
+            print(f"Redis unavailable at {REDIS_URL}, caching analysis results on disk")
+    RESULT_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    return ReadThroughCache(DiskCache(), RESULT_CACHE_TTL_SECONDS)
+
+
+_result_cache: Optional[ReadThroughCache] = None
+_result_cache_lock = threading.Lock()
+
+
+def get_result_cache() -> ReadThroughCache:
+    """Process-wide analysis result cache, created on first use."""
+    global _result_cache
+    if _result_cache is None:
+        with _result_cache_lock:
+            if _result_cache is None:
+                _result_cache = create_result_cache()
+    return _result_cache
+
+
+def result_cache_key(capture_sha256: str, analyzer: str, version: int, params: Dict[str, Any]) -> str:
+    """
+    Key of one analyzer's result: the capture's content, the analyzer and
+    its version (bumped when its output changes), and a hash of the
+    parameters it reads. Captures are identified by content, so a
+    re-upload of the same bytes hits whatever its id or file name.
+    """
+    params_hash = hashlib.sha1(dumps(params)).hexdigest()[:16]
+    return f"{capture_sha256}:{analyzer}:v{version}:{params_hash}"
+
+
+def capture_digest(file_path: Path, root: Path) -> str:
+    """
+    SHA-256 of a stored capture's bytes, kept as an attribute-only artifact
+    in `root` so later runs only hash a replaced file again.
+    """
+    stat = Path(file_path).stat()
+    try:
+        attributes = Artifact(root, CAPTURE_DIGEST_ARTIFACT).attributes
+        if (
+            attributes.get("file_size") == stat.st_size
+            and attributes.get("file_mtime_ns") == stat.st_mtime_ns
+        ):
+            return attributes["sha256"]
+    except FileNotFoundError:
+        pass
+
+    hasher = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        while chunk := f.read(HASH_CHUNK_SIZE):
+            hasher.update(chunk)
+    digest = hasher.hexdigest()
+    write_artifact(
+        root,
+        CAPTURE_DIGEST_ARTIFACT,
+        {},
+        attributes={
+            "sha256": digest,
+            "file_size": stat.st_size,
+            "file_mtime_ns": stat.st_mtime_ns,
+        },
+    )
+    return digest
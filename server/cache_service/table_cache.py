@@ -0,0 +1,136 @@
+import os
+import shutil
+import threading
+from pathlib import Path
+from typing import Dict, Optional
+
+import numpy as np
+
+from artifact_service.crud import META_FILE, UPLOAD_DIR, Artifact, write_artifact
+from packet_extract_service.table import PacketTable
+
+TABLE_CACHE_DIR = Path(os.getenv("TABLE_CACHE_DIR", str(UPLOAD_DIR / ".table_cache")))
+TABLE_CACHE_MAX_BYTES = int(os.getenv("TABLE_CACHE_MAX_BYTES", str(2 * 1024 * 1024 * 1024)))
+
+
+def table_cache_key(
+    pcapng_id: str,
+    file_path: Path,
+    start: Optional[float] = None,
+    end: Optional[float] = None,
+) -> str:
+    """
+    Entry name of a capture's decoded table, or of the table of its
+    [start, end] window. The file's size and mtime are part of the key, so
+    a replaced capture never reads a stale table.
+    """
+    stat = Path(file_path).stat()
+    key = f"{pcapng_id}-{stat.st_size}-{stat.st_mtime_ns}"
+    if start is not None or end is not None:
+        key += f"-{start!r}-{end!r}"
+    return key
+
+
+class PacketTableCache:
+    """
+    Decoded PacketTables on local disk, one columnar artifact per entry
+    (see artifact_service), bounded by `max_bytes` with least recently
+    used eviction.
+
+    Recency is the entry's meta.json mtime, refreshed on every hit, so the
+    LRU order survives restarts and is shared by every worker process
+    using the same directory. An entry evicted while being read is a miss.
+    """
+
+    def __init__(self, directory: Path = TABLE_CACHE_DIR, max_bytes: int = TABLE_CACHE_MAX_BYTES):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.stats = {"hits": 0, "misses": 0, "sets": 0, "evictions": 0}
+        self.lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[PacketTable]:
+        """The cached table, loaded into memory, or None."""
+        try:
+            artifact = Artifact(self.directory, key)
+            os.utime(artifact.path / META_FILE)
+            table = PacketTable(
+                artifact.slice(0, artifact.rows), artifact.dictionaries["hosts"]
+            )
+        except (FileNotFoundError, KeyError):
+            self._count("misses")
+            return None
+        self._count("hits")
+        return table
+
+    def get_window(self, key: str, start: Optional[float], end: Optional[float]) -> Optional[PacketTable]:
+        """
+        Rows of the cached whole-capture table `key` with timestamp in
+        [start, end]. The timestamps are filtered through the memory map,
+        so only the window's rows of the other columns are read.
+        """
+        try:
+            artifact = Artifact(self.directory, key)
+            os.utime(artifact.path / META_FILE)
+            timestamps = artifact.column("timestamp")
+            in_window = np.ones(artifact.rows, dtype=bool)
+            if start is not None:
+                in_window &= timestamps >= start
+            if end is not None:
+                in_window &= timestamps <= end
+            table = PacketTable(
+                artifact.take(np.flatnonzero(in_window)), artifact.dictionaries["hosts"]
+            )
+        except (FileNotFoundError, KeyError):
+            self._count("misses")
+            return None
+        self._count("hits")
+        return table
+
+    def put(self, key: str, table: PacketTable):
+        """Stores a table, then evicts least recently used entries over max_bytes."""
+        write_artifact(self.directory, key, table.columns, {"hosts": table.hosts})
+        self._count("sets")
+        self.evict()
+
+    def evict(self):
+        entries = []
+        total = 0
+        for path in self.directory.iterdir():
+            if path.name.startswith(".") or not path.is_dir():
+                continue  # Entries being written
+            try:
+                size = sum(f.stat().st_size for f in path.iterdir())
+                entries.append(((path / META_FILE).stat().st_mtime_ns, size, path))
+            except FileNotFoundError:
+                continue  # Evicted by another process meanwhile
+            total += size
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+            self._count("evictions")
+
+    def get_stats(self) -> Dict[str, int]:
+        with self.lock:
+            return dict(self.stats)
+
+    def _count(self, counter: str):
+        with self.lock:
+            self.stats[counter] += 1
+
+
+_table_cache: Optional[PacketTableCache] = None
+_table_cache_lock = threading.Lock()
+
+
+def get_table_cache() -> PacketTableCache:
+    """Process-wide decoded table cache, created on first use."""
+    global _table_cache
+    if _table_cache is None:
+        with _table_cache_lock:
+            if _table_cache is None:
+                TABLE_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+                _table_cache = PacketTableCache()
+    return _table_cache
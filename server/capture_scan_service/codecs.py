@@ -0,0 +1,142 @@
+import gzip
+from pathlib import Path
+from typing import BinaryIO, Optional, Union
+
+import zstandard
+
+GZIP_MAGIC = b"\x1f\x8b"
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+MAGIC_BYTES = 4  # Enough to tell every supported container apart
+SKIP_READ_BYTES = 1024 * 1024  # Decompressed bytes discarded per read when skipping
+
+
+def detect_codec(head: bytes) -> Optional[str]:
+    """Compression of a capture from its first bytes: "gzip", "zstd" or None."""
+    if head.startswith(GZIP_MAGIC):
+        return "gzip"
+    if head.startswith(ZSTD_MAGIC):
+        return "zstd"
+    return None
+
+
+class _CountingReader:
+    """
+    Compressed side of a CaptureStream: replays the bytes read to sniff the
+    codec, then reads through, counting what was consumed.
+    """
+
+    def __init__(self, file: BinaryIO, head: bytes):
+        self.file = file
+        self.head = head
+        self.bytes_read = len(head)
+
+    def read(self, count: int = -1) -> bytes:
+        head, self.head = self.head, b""
+        if count is not None and count >= 0:
+            if len(head) > count:
+                head, self.head = head[:count], head[count:]
+            count -= len(head)
+            if count == 0:
+                return head
+        data = self.file.read(count)
+        self.bytes_read += len(data)
+        return head + data
+
+
+class CaptureStream:
+    """
+    Decompressed, read-only view of a pcap / pcapng capture that may be
+    stored as .gz or .zst (detected from its magic bytes, not its name).
+
+    Decompression is streamed: nothing is written to disk and only the
+    codec's window is held in memory. `raw_position` counts compressed
+    bytes consumed, for progress against the stored file size.
+    """
+
+    def __init__(self, source: Union[Path, str, BinaryIO]):
+        if isinstance(source, (str, Path)):
+            self.file = open(source, "rb")
+            self.name = str(source)
+        else:
+            self.file = source
+            self.name = getattr(source, "name", "capture")
+        head = self.file.read(MAGIC_BYTES)
+        self.raw = _CountingReader(self.file, head)
+        self.codec = detect_codec(head)
+
+        if self.codec == "gzip":
+            self.stream = gzip.GzipFile(fileobj=self.raw, mode="rb")
+        elif self.codec == "zstd":
+            self.stream = zstandard.ZstdDecompressor().stream_reader(
+                self.raw, read_across_frames=True, closefd=False
+            )
+        else:
+            self.stream = self.raw
+        self.position = 0  # Decompressed bytes returned
+
+    @property
+    def raw_position(self) -> int:
+        return self.raw.bytes_read
+
+    def read(self, count: int = -1) -> bytes:
+        if count is None or count < 0:
+            data = self.stream.read()
+        else:
+            # Decompressors may return short reads before the end
+            data = self.stream.read(count)
+            if self.codec is not None and 0 < len(data) < count:
+                parts = [data]
+                remaining = count - len(data)
+                while remaining > 0:
+                    more = self.stream.read(remaining)
+                    if not more:
+                        break
+                    parts.append(more)
+                    remaining -= len(more)
+                data = b"".join(parts)
+        self.position += len(data)
+        return data
+
+    def skip_to(self, position: int):
+        """
+        Moves forward to decompressed `position`: a seek for uncompressed
+        files, decompress-and-discard (no decoding) for gzip / zstd.
+        """
+        if position < self.position:
+            raise ValueError("CaptureStream only moves forward")
+        if self.codec is None and self.file.seekable():
+            self.file.seek(position)
+            self.raw.head = b""
+            self.raw.bytes_read = position
+            self.position = position
+            return
+        while self.position < position:
+            if not self.read(min(SKIP_READ_BYTES, position - self.position)):
+                break
+
+    def seekable(self) -> bool:
+        return False
+
+    def tell(self) -> int:
+        return self.position
+
+    def close(self):
+        if self.codec is not None:
+            self.stream.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def open_capture(source: Union[Path, str, BinaryIO]) -> CaptureStream:
+    """Opens a capture file or stream, decompressing gzip / zstd on the fly."""
+    return CaptureStream(source)
+
+
+def is_compressed_capture(file_path: Path) -> bool:
+    with open(file_path, "rb") as f:
+        return detect_codec(f.read(MAGIC_BYTES)) is not None
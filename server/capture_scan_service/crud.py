@@ -0,0 +1,488 @@
+import mmap
+import os
+import struct
+import time
+from array import array
+from pathlib import Path
+from typing import Any, BinaryIO, Callable, Dict, Generator, Optional, Tuple
+
+import numpy as np
+
+from .codecs import MAGIC_BYTES, detect_codec, open_capture
+
+# Classic pcap magic numbers -> (byte order, timestamp resolution in seconds)
+PCAP_MAGIC = {
+    b"\xd4\xc3\xb2\xa1": ("<", 1e-6),
+    b"\xa1\xb2\xc3\xd4": (">", 1e-6),
+    b"\x4d\x3c\xb2\xa1": ("<", 1e-9),
+    b"\xa1\xb2\x3c\x4d": (">", 1e-9),
+}
+PCAPNG_SHB = b"\x0a\x0d\x0d\x0a"
+
+# pcapng block types
+IDB_BLOCK = 0x00000001
+OBSOLETE_PACKET_BLOCK = 0x00000002
+SIMPLE_PACKET_BLOCK = 0x00000003
+ENHANCED_PACKET_BLOCK = 0x00000006
+SECTION_HEADER_BLOCK = 0x0A0D0D0A
+
+# IDB options
+IF_TSRESOL = 9
+IF_TSOFFSET = 14
+
+
+def _parse_interface_block(body: bytes, endian: str) -> Tuple[int, float, int]:
+    """Returns (linktype, timestamp resolution, timestamp offset) of an IDB."""
+    linktype = struct.unpack(endian + "H", body[:2])[0]
+    resolution = 1e-6
+    ts_offset = 0
+
+    pos = 8
+    while pos + 4 <= len(body):
+        code, length = struct.unpack(endian + "HH", body[pos : pos + 4])
+        value = body[pos + 4 : pos + 4 + length]
+        if code == 0:
+            break
+        if code == IF_TSRESOL and length >= 1:
+            tsresol = value[0]
+            if tsresol & 0x80:
+                resolution = 2.0 ** -(tsresol & 0x7F)
+            else:
+                resolution = 10.0 ** -tsresol
+        elif code == IF_TSOFFSET and length >= 8:
+            ts_offset = struct.unpack(endian + "q", value[:8])[0]
+        pos += 4 + ((length + 3) & ~3)
+
+    return linktype, resolution, ts_offset
+
+
+def scan_capture_headers(
+    file_path: Path, time_budget: Optional[float] = None
+) -> Dict[str, Any]:
+    """
+    "First look" statistics from record headers only: capture duration,
+    packet/byte rates and inter-arrival statistics.
+
+    No protocol layer is decoded and packet bytes are never copied; the file
+    is memory-mapped and only the fixed-size record headers are unpacked, so
+    this runs at close to disk speed and can be returned long before the full
+    analysis finishes. gzip / zstd captures cannot be mapped; their record
+    headers are walked on the decompressed stream instead.
+
+    Args:
+        file_path: Path to a pcap or pcapng file
+        time_budget: Optional wall-clock limit in seconds. When exceeded the
+            scan stops, the result is marked incomplete and counts are
+            extrapolated from the scanned fraction of the file.
+
+    Returns:
+        Dictionary with first-look statistics
+    """
+    start = time.perf_counter()
+    deadline = start + time_budget if time_budget is not None else None
+
+    with open(file_path, "rb") as f:
+        file_size = os.fstat(f.fileno()).st_size
+        if file_size == 0:
+            raise ValueError("Capture file is empty")
+        if detect_codec(f.read(MAGIC_BYTES)) is not None:
+            columns = _scan_compressed(file_path, deadline)
+        else:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+                magic = buffer[:4]
+                if magic in PCAP_MAGIC:
+                    columns = _scan_pcap_buffer(buffer, magic, deadline)
+                elif magic == PCAPNG_SHB:
+                    columns = _scan_pcapng_buffer(buffer, deadline)
+                else:
+                    raise ValueError(
+                        "Unrecognized capture format (expected pcap or pcapng)"
+                    )
+
+    timestamps, caplens, wirelens, scanned_bytes = columns
+    summary = summarize_record_headers(
+        timestamps,
+        len(caplens),
+        int(caplens.sum()),
+        int(wirelens.sum()),
+        complete=scanned_bytes >= file_size,
+        scan_seconds=time.perf_counter() - start,
+    )
+    summary["scanned_fraction"] = min(1.0, scanned_bytes / file_size)
+
+    if not summary["complete"] and scanned_bytes > 0:
+        # Extrapolate totals assuming the rest of the file looks like the prefix
+        scale = file_size / scanned_bytes
+        summary["estimated_packet_count"] = int(summary["packet_count"] * scale)
+        summary["estimated_captured_bytes"] = int(summary["captured_bytes"] * scale)
+
+    return summary
+
+
+def _scan_compressed(file_path: Path, deadline: Optional[float]):
+    """
+    Header walk over a gzip / zstd capture, decompressed as it is read.
+    The scanned position is counted in compressed bytes.
+    """
+    timestamps = array("d")
+    caplens = array("q")
+    wirelens = array("q")
+    with open_capture(file_path) as stream:
+        for count, (_, timestamp, caplen, wirelen, _, _) in enumerate(
+            iter_capture_records(stream), 1
+        ):
+            if timestamp is not None:
+                timestamps.append(timestamp)
+            caplens.append(caplen)
+            wirelens.append(wirelen)
+            if deadline is not None and count % 65536 == 0:
+                if time.perf_counter() > deadline:
+                    break
+        scanned_bytes = stream.raw_position
+    return (
+        np.frombuffer(timestamps, dtype=np.float64),
+        np.frombuffer(caplens, dtype=np.int64),
+        np.frombuffer(wirelens, dtype=np.int64),
+        scanned_bytes,
+    )
+
+
+def _scan_pcap_buffer(buffer, magic: bytes, deadline: Optional[float]):
+    """Header walk over a memory-mapped classic pcap file."""
+    endian, resolution = PCAP_MAGIC[magic]
+    unpack = struct.Struct(endian + "IIII").unpack_from
+    seconds = array("q")
+    fractions = array("q")
+    caplens = array("q")
+    wirelens = array("q")
+
+    end = len(buffer)
+    pos = 24
+    count = 0
+    while pos + 16 <= end:
+        ts_sec, ts_frac, caplen, wirelen = unpack(buffer, pos)
+        if pos + 16 + caplen > end:
+            break  # truncated trailing record
+        seconds.append(ts_sec)
+        fractions.append(ts_frac)
+        caplens.append(caplen)
+        wirelens.append(wirelen)
+        pos += 16 + caplen
+
+        count += 1
+        # Checking the clock every record would dominate the loop
+        if deadline is not None and count % 65536 == 0:
+            if time.perf_counter() > deadline:
+                break
+
+    timestamps = np.frombuffer(seconds, dtype=np.int64) + np.frombuffer(
+        fractions, dtype=np.int64
+    ) * resolution
+    return (
+        timestamps,
+        np.frombuffer(caplens, dtype=np.int64),
+        np.frombuffer(wirelens, dtype=np.int64),
+        pos,
+    )
+
+
+def _scan_pcapng_buffer(buffer, deadline: Optional[float]):
+    """Header walk over a memory-mapped pcapng file."""
+    ticks = array("q")
+    iface_ids = array("q")
+    caplens = array("q")
+    wirelens = array("q")
+    timed = array("b")  # 0 for simple packet blocks, which carry no timestamp
+    # Interfaces across all sections, so one lookup table covers the file
+    interfaces = []
+    section_base = 0
+
+    endian = "<"
+    end = len(buffer)
+    pos = 0
+    count = 0
+    while pos + 12 <= end:
+        if buffer[pos : pos + 4] == PCAPNG_SHB:
+            endian = "<" if buffer[pos + 8 : pos + 12] == b"\x4d\x3c\x2b\x1a" else ">"
+            section_base = len(interfaces)
+            block_type = SECTION_HEADER_BLOCK
+        else:
+            block_type = struct.unpack_from(endian + "I", buffer, pos)[0]
+        block_len = struct.unpack_from(endian + "I", buffer, pos + 4)[0]
+        if block_len < 12 or pos + block_len > end:
+            break  # corrupt or truncated trailing block
+
+        if block_type == ENHANCED_PACKET_BLOCK:
+            iface, ts_high, ts_low, caplen, wirelen = struct.unpack_from(
+                endian + "IIIII", buffer, pos + 8
+            )
+            ticks.append((ts_high << 32) | ts_low)
+            iface_ids.append(section_base + iface)
+            caplens.append(caplen)
+            wirelens.append(wirelen)
+            timed.append(1)
+        elif block_type == OBSOLETE_PACKET_BLOCK:
+            iface, _drops, ts_high, ts_low, caplen, wirelen = struct.unpack_from(
+                endian + "HHIIII", buffer, pos + 8
+            )
+            ticks.append((ts_high << 32) | ts_low)
+            iface_ids.append(section_base + iface)
+            caplens.append(caplen)
+            wirelens.append(wirelen)
+            timed.append(1)
+        elif block_type == SIMPLE_PACKET_BLOCK:
+            wirelen = struct.unpack_from(endian + "I", buffer, pos + 8)[0]
+            ticks.append(0)
+            iface_ids.append(section_base)
+            caplens.append(min(wirelen, block_len - 16))
+            wirelens.append(wirelen)
+            timed.append(0)
+        elif block_type == IDB_BLOCK:
+            interfaces.append(
+                _parse_interface_block(buffer[pos + 8 : pos + block_len - 4], endian)
+            )
+
+        pos += block_len
+        count += 1
+        if deadline is not None and count % 65536 == 0:
+            if time.perf_counter() > deadline:
+                break
+
+    if not interfaces:
+        interfaces.append((1, 1e-6, 0))
+    resolutions = np.array([iface[1] for iface in interfaces])
+    offsets = np.array([iface[2] for iface in interfaces], dtype=np.float64)
+
+    iface_idx = np.minimum(np.frombuffer(iface_ids, dtype=np.int64), len(interfaces) - 1)
+    timestamps = (
+        offsets[iface_idx]
+        + np.frombuffer(ticks, dtype=np.int64).astype(np.float64)
+        * resolutions[iface_idx]
+    )
+    timestamps = timestamps[np.frombuffer(timed, dtype=np.int8).astype(bool)]
+    return (
+        timestamps,
+        np.frombuffer(caplens, dtype=np.int64),
+        np.frombuffer(wirelens, dtype=np.int64),
+        pos,
+    )
+
+
+def summarize_record_headers(
+    timestamps: np.ndarray,
+    packet_count: int,
+    captured_bytes: int,
+    wire_bytes: int,
+    complete: bool = True,
+    scan_seconds: float = 0.0,
+) -> Dict[str, Any]:
+    """Builds the first-look summary from header-level columns."""
+    duration = float(timestamps.max() - timestamps.min()) if len(timestamps) else 0.0
+
+    summary = {
+        "complete": complete,
+        "packet_count": packet_count,
+        "captured_bytes": captured_bytes,
+        "wire_bytes": wire_bytes,
+        "start_time": float(timestamps.min()) if len(timestamps) else None,
+        "end_time": float(timestamps.max()) if len(timestamps) else None,
+        "duration": duration,
+        "packet_rate": packet_count / duration if duration > 0 else 0.0,
+        "byte_rate": captured_bytes / duration if duration > 0 else 0.0,
+        "inter_arrival": None,
+        "scan_seconds": scan_seconds,
+    }
+
+    if len(timestamps) > 1:
+        # File order, matching how calculate_average_latency computes latency
+        delays = np.diff(timestamps)
+        summary["inter_arrival"] = {
+            "mean": float(np.mean(delays)),
+            "median": float(np.median(delays)),
+            "std": float(np.std(delays)),
+            "min": float(np.min(delays)),
+            "max": float(np.max(delays)),
+            "p95": float(np.percentile(delays, 95)),
+        }
+
+    return summary
+
+
+# (file offset, timestamp, captured length, wire length, linktype, packet bytes)
+CaptureRecord = Tuple[int, Optional[float], int, int, int, Optional[bytes]]
+
+
+def iter_capture_records(
+    stream: BinaryIO,
+    read_data: bool = False,
+    on_context: Optional[Callable[[int, int], None]] = None,
+) -> Generator[CaptureRecord, None, None]:
+    """
+    Walks the record headers of a pcap or pcapng stream without decoding any
+    protocol layer.
+
+    Packet bytes are skipped unless `read_data` is set. A truncated trailing
+    record (e.g. a capture that is still being written) ends iteration
+    quietly instead of raising.
+
+    Args:
+        stream: Binary file object positioned at the start of the capture
+        read_data: Whether to return the captured packet bytes
+        on_context: Called with (start, end offset) of every block that
+            later records depend on: the pcap global header, pcapng
+            section headers and interface descriptions
+
+    Yields:
+        (offset, timestamp, captured_len, wire_len, linktype, data) tuples.
+        timestamp is None for pcapng simple packet blocks.
+    """
+    magic = stream.read(4)
+    if magic in PCAP_MAGIC:
+        yield from _iter_pcap_records(stream, magic, read_data, on_context)
+    elif magic == PCAPNG_SHB:
+        yield from _iter_pcapng_records(stream, magic, read_data, on_context)
+    else:
+        raise ValueError("Unrecognized capture format (expected pcap or pcapng)")
+
+
+def _skip(stream: BinaryIO, count: int) -> bool:
+    """Advances the stream by `count` bytes; False if the stream ran out."""
+    if count <= 0:
+        return True
+    if stream.seekable():
+        # Seeking past the end succeeds, so read the skipped range's last byte
+        stream.seek(count - 1, 1)
+        return len(stream.read(1)) == 1
+    return len(stream.read(count)) == count
+
+
+def _iter_pcap_records(stream: BinaryIO, magic: bytes, read_data: bool, on_context=None):
+    endian, resolution = PCAP_MAGIC[magic]
+    global_header = stream.read(20)
+    if len(global_header) < 20:
+        return
+    if on_context is not None:
+        on_context(0, 24)
+    linktype = struct.unpack(endian + "I", global_header[16:20])[0] & 0x0FFFFFFF
+    record_header = struct.Struct(endian + "IIII")
+
+    offset = 24
+    while True:
+        header = stream.read(16)
+        if len(header) < 16:
+            return
+        ts_sec, ts_frac, caplen, wirelen = record_header.unpack(header)
+
+        data = None
+        if read_data:
+            data = stream.read(caplen)
+            if len(data) < caplen:
+                return
+        elif not _skip(stream, caplen):
+            return
+
+        yield offset, ts_sec + ts_frac * resolution, caplen, wirelen, linktype, data
+        offset += 16 + caplen
+
+
+def _iter_pcapng_records(stream: BinaryIO, magic: bytes, read_data: bool, on_context=None):
+    endian = "<"
+    interfaces = []  # (linktype, resolution, ts offset) per interface of the section
+    offset = 0
+    block_type_bytes = magic
+
+    while True:
+        if block_type_bytes is None:
+            block_type_bytes = stream.read(4)
+            if len(block_type_bytes) < 4:
+                return
+
+        if block_type_bytes == PCAPNG_SHB:
+            # Section header: byte order magic decides endianness for the section
+            head = stream.read(8)
+            if len(head) < 8:
+                return
+            endian = "<" if head[4:8] == b"\x4d\x3c\x2b\x1a" else ">"
+            interfaces = []
+            block_len = struct.unpack(endian + "I", head[:4])[0]
+            if not _skip(stream, block_len - 12):
+                return
+            if on_context is not None:
+                on_context(offset, offset + block_len)
+            offset += block_len
+            block_type_bytes = None
+            continue
+
+        head = stream.read(4)
+        if len(head) < 4:
+            return
+        block_type = struct.unpack(endian + "I", block_type_bytes)[0]
+        block_len = struct.unpack(endian + "I", head)[0]
+        body_len = block_len - 12
+        if body_len < 0:
+            raise ValueError(f"Corrupt pcapng block at offset {offset}")
+
+        if block_type == ENHANCED_PACKET_BLOCK or block_type == OBSOLETE_PACKET_BLOCK:
+            fixed = stream.read(20)
+            if len(fixed) < 20:
+                return
+            if block_type == ENHANCED_PACKET_BLOCK:
+                iface, ts_high, ts_low, caplen, wirelen = struct.unpack(
+                    endian + "IIIII", fixed
+                )
+            else:
+                iface, _drops, ts_high, ts_low, caplen, wirelen = struct.unpack(
+                    endian + "HHIIII", fixed
+                )
+            linktype, resolution, ts_offset = (
+                interfaces[iface] if iface < len(interfaces) else (1, 1e-6, 0)
+            )
+
+            data = None
+            if read_data:
+                data = stream.read(caplen)
+                if len(data) < caplen:
+                    return
+                remaining = body_len - 20 - caplen
+            else:
+                remaining = body_len - 20
+            if not _skip(stream, remaining + 4):
+                return
+
+            timestamp = ts_offset + ((ts_high << 32) | ts_low) * resolution
+            yield offset, timestamp, caplen, wirelen, linktype, data
+
+        elif block_type == SIMPLE_PACKET_BLOCK:
+            fixed = stream.read(4)
+            if len(fixed) < 4:
+                return
+            wirelen = struct.unpack(endian + "I", fixed)[0]
+            linktype = interfaces[0][0] if interfaces else 1
+            caplen = min(wirelen, body_len - 4)
+
+            data = None
+            if read_data:
+                data = stream.read(caplen)
+                if len(data) < caplen:
+                    return
+                remaining = body_len - 4 - caplen
+            else:
+                remaining = body_len - 4
+            if not _skip(stream, remaining + 4):
+                return
+
+            yield offset, None, caplen, wirelen, linktype, data
+
+        elif block_type == IDB_BLOCK:
+            body = stream.read(body_len + 4)
+            if len(body) < body_len + 4:
+                return
+            interfaces.append(_parse_interface_block(body[:body_len], endian))
+            if on_context is not None:
+                on_context(offset, offset + block_len)
+
+        elif not _skip(stream, body_len + 4):
+            return
+
+        offset += block_len
+        block_type_bytes = None
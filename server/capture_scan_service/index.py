@@ -0,0 +1,201 @@
+import math
+from array import array
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+from artifact_service.crud import Artifact, write_artifact
+from .codecs import CaptureStream, open_capture
+from .crud import iter_capture_records
+
+PACKET_INDEX_ARTIFACT = "packet_index"
+PACKET_INDEX_EVERY = 1000  # Packets per indexed block
+INDEX_TIME_SLACK = 1e-6  # Seconds; index times are floats, packet times exact decimals
+
+
+def build_capture_index(
+    file_path: Path, root: Path, every: int = PACKET_INDEX_EVERY
+) -> Dict[str, Any]:
+    """
+    Writes the sparse packet index of a stored capture as an artifact.
+
+    Every `every` packets one entry records the packet number (1-based,
+    file order, as in packet_metadata), the offset of its record in the
+    (decompressed) capture, its timestamp, and the min / max timestamp of
+    the block it starts. Only record headers are read.
+
+    Returns:
+        Artifact manifest entry
+    """
+    numbers = array("q")
+    offsets = array("q")
+    first_times = array("d")
+    min_times = array("d")
+    max_times = array("d")
+    context = {"header_end": 0, "seekable": True}
+    count = 0
+
+    def on_context(start: int, end: int):
+        if count:
+            # A section / interface defined after packets: a reader starting
+            # mid-file would not know it
+            context["seekable"] = False
+        else:
+            context["header_end"] = end
+
+    with open_capture(file_path) as stream:
+        block_min, block_max = math.inf, -math.inf
+        for offset, timestamp, _, _, _, _ in iter_capture_records(stream, on_context=on_context):
+            if count % every == 0:
+                if count:
+                    min_times.append(block_min)
+                    max_times.append(block_max)
+                block_min, block_max = math.inf, -math.inf
+                numbers.append(count + 1)
+                offsets.append(offset)
+                first_times.append(math.nan if timestamp is None else timestamp)
+            if timestamp is not None:
+                block_min = min(block_min, timestamp)
+                block_max = max(block_max, timestamp)
+            count += 1
+        if count:
+            min_times.append(block_min)
+            max_times.append(block_max)
+        codec = stream.codec
+
+    stat = Path(file_path).stat()
+    return write_artifact(
+        root,
+        PACKET_INDEX_ARTIFACT,
+        {
+            "packet": np.frombuffer(numbers, dtype=np.int64),
+            "offset": np.frombuffer(offsets, dtype=np.int64),
+            "first_timestamp": np.frombuffer(first_times, dtype=np.float64),
+            "min_timestamp": np.frombuffer(min_times, dtype=np.float64),
+            "max_timestamp": np.frombuffer(max_times, dtype=np.float64),
+        },
+        attributes={
+            "every": every,
+            "packet_count": count,
+            "header_end": context["header_end"],
+            "seekable": context["seekable"],
+            "codec": codec,
+            # Captures are stored by filename; a re-upload replaces the file
+            "file_size": stat.st_size,
+            "file_mtime_ns": stat.st_mtime_ns,
+        },
+    )
+
+
+class CaptureIndex:
+    """
+    Read side of a packet index. Lookups are binary searches over the
+    block entries; the timestamp envelopes make them correct for captures
+    whose packets are not in time order.
+    """
+
+    def __init__(self, artifact: Artifact):
+        columns = artifact.slice(0, artifact.rows)
+        self.attributes = artifact.attributes
+        self.packet_count = self.attributes["packet_count"]
+        self.header_end = self.attributes["header_end"]
+        self.packets = columns["packet"]
+        self.offsets = columns["offset"]
+        self.first_times = columns["first_timestamp"]
+        # Latest time seen up to the end of each block / earliest from its start on
+        self.max_through = np.maximum.accumulate(columns["max_timestamp"])
+        self.min_from = np.minimum.accumulate(columns["min_timestamp"][::-1])[::-1]
+
+    def __len__(self) -> int:
+        return len(self.packets)
+
+    def blocks_for_packets(self, first: int, last: int) -> Tuple[int, int]:
+        """Blocks [start, stop) holding packet numbers first..last."""
+        start = max(0, int(np.searchsorted(self.packets, first, side="right")) - 1)
+        stop = int(np.searchsorted(self.packets, last, side="right"))
+        return start, stop
+
+    def blocks_for_time(self, start_time: float, end_time: float) -> Tuple[int, int]:
+        """
+        Blocks [start, stop) that can hold packets timed start_time..end_time:
+        every earlier block ends before start_time, every later one has only
+        packets after end_time.
+        """
+        start = int(np.searchsorted(self.max_through, start_time - INDEX_TIME_SLACK, side="left"))
+        stop = int(np.searchsorted(self.min_from, end_time + INDEX_TIME_SLACK, side="right"))
+        return start, stop
+
+    def span(self, start: int, stop: int) -> Tuple[int, int, Optional[int]]:
+        """
+        Returns:
+            (offset to read from, number of the packet there, number of the
+            first packet past the span or None to read to the end)
+        """
+        stop_packet = int(self.packets[stop]) if stop < len(self) else None
+        if start >= len(self):
+            return 0, self.packet_count + 1, stop_packet
+        return int(self.offsets[start]), int(self.packets[start]), stop_packet
+
+
+def load_capture_index(file_path: Path, root: Path) -> Optional[CaptureIndex]:
+    """
+    The capture's packet index, or None when it is missing, was built for
+    another file of the same name, or cannot be used to seek.
+    """
+    try:
+        artifact = Artifact(root, PACKET_INDEX_ARTIFACT)
+    except FileNotFoundError:
+        return None
+    attributes = artifact.attributes
+    stat = Path(file_path).stat()
+    if (
+        attributes.get("file_size") != stat.st_size
+        or attributes.get("file_mtime_ns") != stat.st_mtime_ns
+        or not attributes.get("seekable")
+    ):
+        return None
+    return CaptureIndex(artifact)
+
+
+def get_capture_index(file_path: Path, root: Path) -> Optional[CaptureIndex]:
+    """load_capture_index, (re)building the index first when it is missing or stale."""
+    index = load_capture_index(file_path, root)
+    if index is None:
+        build_capture_index(file_path, root)
+        index = load_capture_index(file_path, root)
+    return index
+
+
+class _IndexedStream:
+    """A capture's header blocks followed by its records from an indexed offset."""
+
+    def __init__(self, stream: CaptureStream, header: bytes):
+        self.stream = stream
+        self.header = header
+        self.name = stream.name
+
+    def read(self, count: int = -1) -> bytes:
+        if not self.header:
+            return self.stream.read(count)
+        if count is None or count < 0:
+            data, self.header = self.header + self.stream.read(), b""
+            return data
+        data, self.header = self.header[:count], self.header[count:]
+        if len(data) < count:
+            data += self.stream.read(count - len(data))
+        return data
+
+    def close(self):
+        self.stream.close()
+
+
+def open_capture_at(file_path: Path, index: CaptureIndex, offset: int):
+    """
+    Readable capture (header blocks + records from `offset`) that scapy's
+    PcapReader accepts like the whole file.
+    """
+    stream = open_capture(file_path)
+    header = stream.read(index.header_end)
+    stream.skip_to(max(offset, index.header_end))
+    return _IndexedStream(stream, header)
@@ -0,0 +1,288 @@
+import asyncio
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, Optional
+
+from fastapi import HTTPException
+from sqlalchemy import func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from database import AsyncSessionLocal
+from progress_service.hub import ProgressChannel
+from .model import Job
+
+JOB_QUEUE_ENABLED = os.getenv("JOB_QUEUE_ENABLED", "false").lower() in ("1", "true", "yes")
+JOB_VISIBILITY_TIMEOUT = int(os.getenv("JOB_VISIBILITY_TIMEOUT", "300"))  # Seconds a claim lasts without a heartbeat
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+JOB_RETRY_BACKOFF = float(os.getenv("JOB_RETRY_BACKOFF", "30"))  # Seconds before the 1st retry, doubled after
+JOB_FOLLOW_POLL_SECONDS = 2.0  # Status polling of jobs followed on a progress channel
+THROUGHPUT_WINDOWS = (60, 300, 900)  # Seconds
+
+FINISHED_STATUSES = ("succeeded", "failed")
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _utc(value: Optional[datetime]) -> Optional[datetime]:
+    """SQLite hands timestamps back naive; they are stored in UTC."""
+    if value is not None and value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+
+def job_dict(job: Job) -> Dict[str, Any]:
+    return {
+        "id": job.id,
+        "kind": job.kind,
+        "pcapng_id": job.pcapng_id,
+        "status": job.status,
+        "attempts": job.attempts,
+        "max_attempts": job.max_attempts,
+        "available_at": _utc(job.available_at),
+        "locked_by": job.locked_by,
+        "last_error": job.last_error,
+        "created_at": _utc(job.created_at),
+        "started_at": _utc(job.started_at),
+        "finished_at": _utc(job.finished_at),
+    }
+
+
+async def enqueue_job_async(
+    db: AsyncSession,
+    kind: str,
+    payload: Dict[str, Any],
+    pcapng_id: Optional[str] = None,
+    max_attempts: int = JOB_MAX_ATTEMPTS,
+) -> Job:
+    job = Job(
+        kind=kind,
+        payload=payload,
+        pcapng_id=pcapng_id,
+        max_attempts=max_attempts,
+        available_at=_now(),
+        created_at=_now(),
+    )
+    db.add(job)
+    await db.commit()
+    return job
+
+
+async def get_job_async(db: AsyncSession, job_id: str) -> Job:
+    job = await db.get(Job, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    return job
+
+
+async def get_capture_job_async(db: AsyncSession, pcapng_id: str) -> Optional[Job]:
+    """Latest job of a capture, if it has one."""
+    query = (
+        select(Job)
+        .where(Job.pcapng_id == pcapng_id)
+        .order_by(Job.created_at.desc())
+        .limit(1)
+    )
+    return (await db.execute(query)).scalars().first()
+
+
+def claim_job(
+    db: Session,
+    worker_id: str,
+    kinds: Optional[Iterable[str]] = None,
+    visibility_timeout: int = JOB_VISIBILITY_TIMEOUT,
+) -> Optional[Job]:
+    """
+    Claims the longest-waiting available job: a queued one whose start
+    time has come, or a running one whose worker's lease ran out.
+
+    On PostgreSQL the candidate row is locked with
+    `SELECT ... FOR UPDATE SKIP LOCKED`, so concurrent workers each get a
+    different job without waiting on each other. The claim itself is a
+    conditional update on the attempt count, which also keeps databases
+    without row locks (SQLite in development) from handing one job out
+    twice.
+
+    Returns:
+        The claimed job (status running, attempts counting this one), or None
+    """
+    now = _now()
+    query = select(Job).where(
+        Job.status.in_(("queued", "running")), Job.available_at <= now
+    )
+    if kinds is not None:
+        query = query.where(Job.kind.in_(list(kinds)))
+    query = query.order_by(Job.available_at).limit(1).with_for_update(skip_locked=True)
+    job = db.execute(query).scalars().first()
+    if job is None:
+        db.rollback()
+        return None
+    if job.status == "running" and job.attempts >= job.max_attempts:
+        # Its workers keep dying (e.g. out of memory): stop handing it out
+        job.status = "failed"
+        job.locked_by = None
+        job.finished_at = now
+        job.last_error = f"Worker lease expired on all {job.attempts} attempts"
+        db.commit()
+        return None
+
+    claimed = db.execute(
+        update(Job)
+        .where(Job.id == job.id, Job.attempts == job.attempts)
+        .values(
+            status="running",
+            attempts=job.attempts + 1,
+            available_at=now + timedelta(seconds=visibility_timeout),
+            locked_by=worker_id,
+            started_at=now,
+        )
+    ).rowcount
+    db.commit()
+    if not claimed:
+        return None  # Another worker claimed it first
+    db.refresh(job)
+    return job
+
+
+def extend_job_lease(
+    db: Session, job_id: str, worker_id: str, visibility_timeout: int = JOB_VISIBILITY_TIMEOUT
+) -> bool:
+    """Heartbeat: pushes the lease out again. False when the job was claimed by another worker."""
+    extended = db.execute(
+        update(Job)
+        .where(Job.id == job_id, Job.locked_by == worker_id, Job.status == "running")
+        .values(available_at=_now() + timedelta(seconds=visibility_timeout))
+    ).rowcount
+    db.commit()
+    return bool(extended)
+
+
+def finish_job(
+    db: Session, job: Job, worker_id: str, error: Optional[str] = None, retry: bool = True
+) -> Optional[str]:
+    """
+    Records the outcome of the worker's attempt. A failed attempt is
+    queued again after an exponential backoff while attempts remain and
+    `retry` is set (errors in the input itself are not retried).
+
+    Returns:
+        The job's new status, or None when the lease had already passed to
+        another worker (the outcome is then theirs to record)
+    """
+    now = _now()
+    if error is None:
+        values = {"status": "succeeded", "finished_at": now, "last_error": None}
+    elif retry and job.attempts < job.max_attempts:
+        backoff = JOB_RETRY_BACKOFF * 2 ** (job.attempts - 1)
+        values = {
+            "status": "queued",
+            "available_at": now + timedelta(seconds=backoff),
+            "last_error": error,
+        }
+    else:
+        values = {"status": "failed", "finished_at": now, "last_error": error}
+    updated = db.execute(
+        update(Job)
+        .where(Job.id == job.id, Job.locked_by == worker_id, Job.attempts == job.attempts)
+        .values(locked_by=None, **values)
+    ).rowcount
+    db.commit()
+    return values["status"] if updated else None
+
+
+async def get_job_metrics_async(db: AsyncSession) -> Dict[str, Any]:
+    """
+    Queue depth and throughput, from the jobs table so every API process
+    and worker sees the same numbers.
+    """
+    now = _now()
+    counts = dict(
+        (await db.execute(select(Job.status, func.count()).group_by(Job.status))).all()
+    )
+    ready, oldest_ready = (
+        await db.execute(
+            select(func.count(), func.min(Job.available_at)).where(
+                Job.status == "queued", Job.available_at <= now
+            )
+        )
+    ).one()
+    expired_leases = (
+        await db.execute(
+            select(func.count()).where(Job.status == "running", Job.available_at <= now)
+        )
+    ).scalar()
+    retries = (
+        await db.execute(select(func.coalesce(func.sum(Job.attempts - 1), 0)).where(Job.attempts > 1))
+    ).scalar()
+
+    since = now - timedelta(seconds=max(THROUGHPUT_WINDOWS))
+    recent = (
+        await db.execute(
+            select(Job.status, Job.started_at, Job.finished_at).where(Job.finished_at >= since)
+        )
+    ).all()
+    throughput = {}
+    for window in THROUGHPUT_WINDOWS:
+        cutoff = now - timedelta(seconds=window)
+        finished = [row for row in recent if _utc(row.finished_at) >= cutoff]
+        succeeded = sum(1 for row in finished if row.status == "succeeded")
+        throughput[f"{window // 60}m"] = {
+            "succeeded": succeeded,
+            "failed": len(finished) - succeeded,
+            "per_minute": succeeded * 60 / window,
+        }
+    # Duration of the final attempt of recently finished jobs
+    durations = [
+        (_utc(row.finished_at) - _utc(row.started_at)).total_seconds()
+        for row in recent
+        if row.status == "succeeded" and row.started_at is not None
+    ]
+
+    return {
+        "statuses": {status: counts.get(status, 0) for status in ("queued", "running", *FINISHED_STATUSES)},
+        "ready": ready,
+        "oldest_ready_seconds": (now - _utc(oldest_ready)).total_seconds() if oldest_ready else 0.0,
+        "expired_leases": expired_leases,
+        "retries": retries,
+        "throughput": throughput,
+        "mean_run_seconds": sum(durations) / len(durations) if durations else None,
+    }
+
+
+async def follow_job(channel: ProgressChannel, job_id: str):
+    """
+    Mirrors a queued job's status onto a capture's progress channel (as
+    "job" stage events) until it finishes, then completes or fails the
+    channel. The stages inside the job run in a worker process, so only
+    the job's status reaches subscribers of this process.
+    """
+    status = attempts = None
+    while True:
+        try:
+            async with AsyncSessionLocal() as db:
+                job = await db.get(Job, job_id)
+        except Exception as e:
+            print(f"Job {job_id} status unavailable: {e}")
+            job = None
+        if job is not None and (job.status, job.attempts) != (status, attempts):
+            status, attempts = job.status, job.attempts
+            channel.stage("job", status, job_id=job_id, attempts=attempts, error=job.last_error)
+            if status == "succeeded":
+                channel.complete()
+                return
+            if status == "failed":
+                channel.fail(job.last_error or "Job failed")
+                return
+        await asyncio.sleep(JOB_FOLLOW_POLL_SECONDS)
+
+
+_followers = set()  # Running follow_job tasks (the event loop only keeps weak references)
+
+
+def start_following(channel: ProgressChannel, job_id: str):
+    """Runs follow_job in the background of the current event loop."""
+    task = asyncio.get_running_loop().create_task(follow_job(channel, job_id))
+    _followers.add(task)
+    task.add_done_callback(_followers.discard)
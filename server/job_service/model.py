@@ -0,0 +1,39 @@
+import uuid
+from sqlalchemy import JSON, Column, DateTime, Index, Integer, String, Text
+from sqlalchemy.sql import func
+from database import Base
+
+
+class Job(Base):
+    """
+    A unit of background work (e.g. analyzing and storing an uploaded
+    capture), claimed by one worker process at a time.
+
+    `available_at` is when the job can next be claimed: for a queued job
+    its (retry) start time, for a running one the end of the claiming
+    worker's lease. A worker that dies leaves its lease to expire, and the
+    job is claimed again.
+    """
+
+    __tablename__ = "jobs"
+
+    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    kind = Column(String, nullable=False)  # Handler name, see job_service.worker.JOB_HANDLERS
+    payload = Column(JSON, nullable=False)
+    pcapng_id = Column(String, nullable=True, index=True)  # Capture the job works on, if any
+    status = Column(String, nullable=False, default="queued")  # queued / running / succeeded / failed
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False)
+    available_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    locked_by = Column(String, nullable=True)  # Worker holding the lease
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    started_at = Column(DateTime(timezone=True), nullable=True)  # Start of the latest attempt
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+
+    __table_args__ = (
+        # Claim order: ready jobs by availability
+        Index("ix_jobs_status_available", "status", "available_at"),
+        # Throughput metrics over recent completions
+        Index("ix_jobs_finished", "finished_at"),
+    )
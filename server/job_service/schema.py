@@ -0,0 +1,26 @@
+from pydantic import BaseModel
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+class JobResponse(BaseModel):
+    id: str
+    kind: str
+    pcapng_id: Optional[str] = None
+    status: str  # queued / running / succeeded / failed
+    attempts: int
+    max_attempts: int
+    available_at: datetime  # Next claim (queued) or lease end (running)
+    locked_by: Optional[str] = None
+    last_error: Optional[str] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+class JobMetrics(BaseModel):
+    statuses: Dict[str, int]  # Jobs per status
+    ready: int  # Queued jobs that can be claimed now
+    oldest_ready_seconds: float  # How long the oldest ready job has waited
+    expired_leases: int  # Running jobs whose worker stopped heartbeating
+    retries: int  # Attempts beyond the first, over all jobs
+    throughput: Dict[str, Dict[str, Any]]  # Per window (1m / 5m / 15m): succeeded, failed, per_minute
+    mean_run_seconds: Optional[float] = None  # Of jobs that succeeded in the last 15 minutes
@@ -0,0 +1,127 @@
+"""
+Background job worker.
+
+Claims jobs from the jobs table (see job_service.crud.claim_job) and runs
+them one at a time, heartbeating its lease while a job runs. Start as
+many as the machines allow, on any host that reaches the database and
+the shared UPLOAD_DIR, e.g. from the server directory:
+
+    JOB_QUEUE_ENABLED=true UPLOAD_DIR=/mnt/captures python -m job_service.worker
+    python -m job_service.worker --kind analyze_capture --poll 0.5
+
+API processes only enqueue jobs when started with JOB_QUEUE_ENABLED=true.
+"""
+import argparse
+import asyncio
+import os
+import signal
+import socket
+import time
+import uuid
+
+from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
+
+import database
+from routes import ANALYZE_CAPTURE_JOB, process_capture_job
+from .crud import JOB_VISIBILITY_TIMEOUT, claim_job, extend_job_lease, finish_job
+from .model import Job
+
+JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", "1.0"))  # Idle wait between claims
+
+# Job kind -> async handler(payload, attempts)
+JOB_HANDLERS = {
+    ANALYZE_CAPTURE_JOB: process_capture_job,
+}
+
+
+def _with_session(function, *args):
+    db = database.SessionLocal()
+    try:
+        return function(db, *args)
+    finally:
+        db.close()
+
+
+class JobWorker:
+    """One job at a time; processed / failed counts are printed as it goes."""
+
+    def __init__(self, kinds=None, poll_seconds: float = JOB_POLL_SECONDS):
+        self.kinds = list(kinds or JOB_HANDLERS)
+        self.poll_seconds = poll_seconds
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.stopping = False
+        self.stats = {"succeeded": 0, "retried": 0, "failed": 0, "lost": 0}
+        self.started = time.time()
+
+    def stop(self):
+        """Finish the running job, then exit."""
+        self.stopping = True
+
+    async def run(self):
+        print(f"Job worker {self.worker_id} processing {self.kinds}")
+        while not self.stopping:
+            job = await run_in_threadpool(_with_session, claim_job, self.worker_id, self.kinds)
+            if job is None:
+                await asyncio.sleep(self.poll_seconds)
+                continue
+            await self.process(job)
+        await database.async_engine.dispose()  # Pooled connections would keep the process alive
+        print(f"Job worker {self.worker_id} stopped: {self.stats}")
+
+    async def process(self, job: Job):
+        print(f"Job {job.id} ({job.kind}) attempt {job.attempts}/{job.max_attempts}")
+        heartbeat = asyncio.create_task(self._heartbeat(job.id))
+        start = time.time()
+        error, retry = None, True
+        try:
+            await JOB_HANDLERS[job.kind](job.payload, job.attempts)
+        except HTTPException as e:
+            # Client errors (4xx) are in the job's input: retrying cannot help
+            error, retry = str(e.detail), e.status_code >= 500
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+        finally:
+            heartbeat.cancel()
+
+        status = await run_in_threadpool(
+            _with_session, finish_job, job, self.worker_id, error, retry
+        )
+        outcome = {"queued": "retried", None: "lost"}.get(status, status)
+        self.stats[outcome] += 1
+        elapsed = time.time() - self.started
+        print(
+            f"Job {job.id} {outcome} in {time.time() - start:.2f} seconds"
+            + (f": {error}" if error else "")
+            + f" ({self.stats['succeeded'] * 60 / elapsed:.2f} jobs/minute since start)"
+        )
+
+    async def _heartbeat(self, job_id: str):
+        while True:
+            await asyncio.sleep(JOB_VISIBILITY_TIMEOUT / 3)
+            if not await run_in_threadpool(
+                _with_session, extend_job_lease, job_id, self.worker_id
+            ):
+                print(f"Job {job_id}: lease lost to another worker")
+                return
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Background job worker")
+    parser.add_argument(
+        "--kind", action="append", choices=list(JOB_HANDLERS), help="job kinds to run (default: all)"
+    )
+    parser.add_argument("--poll", type=float, default=JOB_POLL_SECONDS, help="seconds between claims when idle")
+    args = parser.parse_args()
+
+    database.Base.metadata.create_all(bind=database.engine, tables=[Job.__table__])
+
+    worker = JobWorker(args.kind, args.poll)
+    # First Ctrl-C / SIGTERM: finish the running job and exit cleanly
+    signal.signal(signal.SIGINT, lambda *_: worker.stop())
+    signal.signal(signal.SIGTERM, lambda *_: worker.stop())
+    asyncio.run(worker.run())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,235 @@
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from analysis_service.congestion_detection.crud import OnlineCongestionDetector
+from analysis_service.network_analysis.crud import (
+    KIND_OTHER,
+    KIND_TCP,
+    congestion_level,
+    flow_key_names,
+    group_flows,
+    retransmission_mask,
+    score_congestion,
+)
+from analysis_service.profile.schema import DEFAULT_PROFILE, AnalysisProfile
+from packet_extract_service.table import PacketTable
+
+LIVE_WINDOW_SECONDS = 10
+MAX_TRACKED_FLOWS = 100_000  # Least recently seen flows are forgotten beyond this
+
+
+class _WindowTotals:
+    """Running sums of the window being filled."""
+
+    def __init__(self, index: int):
+        self.index = index
+        self.packet_count = 0
+        self.byte_count = 0
+        self.delay_sum = 0.0
+        self.delay_count = 0
+        self.jitter_sum = 0.0
+        self.jitter_count = 0
+        self.jitter_spikes = 0
+        self.retransmissions = 0
+        self.bundling = 0
+        self.congestion_events = 0
+        self.change_points: List[Dict[str, Any]] = []
+
+
+class LiveAnalyzer:
+    """
+    Incremental latency, jitter, retransmission and congestion analysis
+    over tumbling capture-time windows.
+
+    Feed decoded packet batches in arrival order with `add()`; each batch is
+    processed with the same vectorized code paths and `profile` thresholds
+    as the offline analyzers, and only O(flows) state is carried between
+    batches: the previous packet's time and delay, the last
+    congestion_window_size - 1 delays, the last time / TCP sequence number
+    per flow and the CUSUM detectors. Finished windows are returned as
+    soon as a later packet closes them.
+    """
+
+    def __init__(
+        self,
+        window_seconds: float = LIVE_WINDOW_SECONDS,
+        max_flows: int = MAX_TRACKED_FLOWS,
+        profile: AnalysisProfile = DEFAULT_PROFILE,
+    ):
+        self.window_seconds = window_seconds
+        self.max_flows = max_flows
+        self.profile = profile
+        self.flows: "OrderedDict[tuple, tuple]" = OrderedDict()  # (kind, key) -> (last time, last seq)
+        self.last_timestamp: Optional[float] = None
+        self.last_delay_ms: Optional[float] = None
+        self.recent_delays = np.zeros(0)
+        self.detector = OnlineCongestionDetector(max_flows)
+        self.window: Optional[_WindowTotals] = None
+        self.next_index = None  # Closed windows are never reopened by late packets
+
+    def add(self, table: PacketTable) -> List[Dict[str, Any]]:
+        """
+        Processes a batch of packets.
+
+        Returns:
+            Results of the windows this batch closed, oldest first
+        """
+        closed = []
+        if len(table) == 0:
+            return closed
+
+        window_ids = np.floor(table["timestamp"] / self.window_seconds).astype(np.int64)
+        floor = self.window.index if self.window is not None else self.next_index
+        if floor is not None:
+            # Late (out of order) packets are counted in the open window
+            window_ids = np.maximum(window_ids, floor)
+        window_ids = np.maximum.accumulate(window_ids)
+
+        boundaries = np.flatnonzero(np.diff(window_ids)) + 1
+        for rows in np.split(np.arange(len(table)), boundaries):
+            index = int(window_ids[rows[0]])
+            if self.window is not None and self.window.index != index:
+                closed.append(self._close_window())
+            if self.window is None:
+                self.window = _WindowTotals(index)
+            self._add_rows(table.take(rows))
+        return closed
+
+    def flush(self) -> Optional[Dict[str, Any]]:
+        """Closes the open window (end of stream). Returns its result, if any."""
+        if self.window is None:
+            return None
+        for event in self.detector.finish():
+            self.window.change_points.append(event)
+        return self._close_window()
+
+    def _add_rows(self, part: PacketTable):
+        window = self.window
+        profile = self.profile
+        timestamps = part["timestamp"]
+
+        # Inter-packet delays, continuing from the previous batch
+        previous = [] if self.last_timestamp is None else [self.last_timestamp]
+        delays_ms = np.diff(np.concatenate((previous, timestamps))) * 1000
+        previous_delay = [] if self.last_delay_ms is None else [self.last_delay_ms]
+        delay_changes = np.abs(np.diff(np.concatenate((previous_delay, delays_ms))))
+
+        # Jitter spikes: as offline, only counted from the stream's second delay on
+        spike_delays = delays_ms if self.last_delay_ms is not None else delays_ms[1:]
+
+        # Congestion events: trailing windows of delays with a high mean
+        window_size = profile.congestion_window_size
+        series = np.concatenate((self.recent_delays, delays_ms))
+        if len(series) >= window_size:
+            windows = np.lib.stride_tricks.sliding_window_view(series, window_size)
+            window.congestion_events += int(
+                np.count_nonzero(windows.sum(axis=1) / window_size > profile.jitter_spike_threshold_ms)
+            )
+        self.recent_delays = series[max(0, len(series) - (window_size - 1)):]
+
+        retransmissions, bundling, flow_names = self._flow_metrics(part)
+
+        for timestamp, flow in zip(timestamps.tolist(), flow_names):
+            window.change_points.extend(self.detector.update(timestamp, flow))
+
+        window.packet_count += len(part)
+        window.byte_count += int(part["size"].sum())
+        window.delay_sum += float(delays_ms.sum())
+        window.delay_count += len(delays_ms)
+        window.jitter_sum += float(delay_changes.sum())
+        window.jitter_count += len(delay_changes)
+        window.jitter_spikes += int(np.count_nonzero(spike_delays > profile.jitter_spike_threshold_ms))
+        window.retransmissions += retransmissions
+        window.bundling += bundling
+
+        self.last_timestamp = float(timestamps[-1])
+        if len(delays_ms):
+            self.last_delay_ms = float(delays_ms[-1])
+
+    def _flow_metrics(self, part: PacketTable):
+        """
+        Retransmissions and bundling delays of a batch, including the first
+        packet of each flow against the flow's state from earlier batches.
+
+        Returns:
+            (retransmissions, bundling delays, flow name per packet for the
+            change-point detector, None for packets without a flow)
+        """
+        flows = group_flows(part)
+        timestamps = part["timestamp"]
+        seqs = part["seq"]
+        is_retransmission = retransmission_mask(part, flows.kind, flows.flow_ids, flows.flow_order)
+
+        # Flow delays inside the batch
+        sorted_flows = flows.flow_ids[flows.flow_order]
+        sorted_times = timestamps[flows.flow_order]
+        same_flow = sorted_flows[1:] == sorted_flows[:-1]
+        flow_delays_ms = np.diff(sorted_times)[same_flow] * 1000
+        threshold_ms = self.profile.bundling_delay_threshold_ms
+        bundling = int(np.count_nonzero(flow_delays_ms > threshold_ms))
+
+        # Batch boundary: first packet of each flow against carried state
+        first_rows = flows.flow_order[flows.flow_starts]
+        last_rows = flows.flow_order[
+            np.concatenate((flows.flow_starts[1:], [len(part)])) - 1
+        ]
+        names = flow_key_names(part, flows.kind, first_rows)
+        kinds = flows.kind[first_rows].tolist()
+        batch_flow_keys = [None] * len(names)
+        for f, (name, kind, first, last) in enumerate(
+            zip(names, kinds, first_rows.tolist(), last_rows.tolist())
+        ):
+            if kind == KIND_OTHER:
+                continue  # Non-IP packets each form their own flow
+            key = (kind, name)
+            batch_flow_keys[f] = key
+            state = self.flows.get(key)
+            if state is not None:
+                last_time, last_seq = state
+                if (timestamps[first] - last_time) * 1000 > threshold_ms:
+                    bundling += 1
+                if kind == KIND_TCP and seqs[first] == last_seq:
+                    is_retransmission[first] = True
+                self.flows.move_to_end(key)
+            self.flows[key] = (float(timestamps[last]), int(seqs[last]))
+        while len(self.flows) > self.max_flows:
+            self.flows.popitem(last=False)
+
+        packet_flows = [batch_flow_keys[f] for f in flows.flow_ids.tolist()]
+        flow_names = [key[1] if key else None for key in packet_flows]
+        return int(np.count_nonzero(is_retransmission)), bundling, flow_names
+
+    def _close_window(self) -> Dict[str, Any]:
+        window = self.window
+        self.window = None
+        self.next_index = window.index + 1
+        start = window.index * self.window_seconds
+
+        jitter_ms = window.jitter_sum / window.jitter_count if window.jitter_count else 0
+        metrics = {
+            "retransmission_rate": (
+                window.retransmissions / window.packet_count if window.packet_count else 0
+            ),
+            "jitter_ms": jitter_ms,
+            "jitter_spikes": window.jitter_spikes,
+            "packet_aggregation_inefficiency": window.bundling,
+            "congestion_events": window.congestion_events,
+        }
+        score = score_congestion(metrics)
+        return {
+            "window_start": datetime.fromtimestamp(start, tz=timezone.utc),
+            "window_end": datetime.fromtimestamp(start + self.window_seconds, tz=timezone.utc),
+            "packet_count": window.packet_count,
+            "byte_count": window.byte_count,
+            "average_latency": (
+                window.delay_sum / window.delay_count / 1000 if window.delay_count else None
+            ),
+            "retransmissions": window.retransmissions,
+            **metrics,
+            "congestion_score": score,
+            "congestion_level": congestion_level(score),
+            "change_points": window.change_points,
+        }
@@ -0,0 +1,182 @@
+import queue
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from scapy.all import conf
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from database import SessionLocal
+from analysis_service.profile.schema import DEFAULT_PROFILE, AnalysisProfile
+from capture_scan_service.crud import iter_capture_records
+from packet_extract_service.table import build_packet_table
+from .analyzer import LIVE_WINDOW_SECONDS, LiveAnalyzer
+from .model import LiveSession, LiveWindow
+from .sources import open_live_source
+
+LIVE_BATCH_PACKETS = 1000  # Packets decoded and analyzed together
+LIVE_BATCH_SECONDS = 1.0  # A partial batch is analyzed after this long without new packets
+LIVE_QUEUE_RECORDS = 10000  # Reader -> analyzer backlog before the reader blocks
+LIVE_WINDOW_PAGE_SIZE = 500
+
+_END_OF_STREAM = object()
+
+
+def create_live_session(db: Session, user_id: str, source: str) -> LiveSession:
+    session = LiveSession(user_id=user_id, source=source, status="running")
+    db.add(session)
+    db.commit()
+    db.refresh(session)
+    return session
+
+
+def store_live_windows(
+    db: Session, session: LiveSession, windows: List[Dict[str, Any]], packet_count: int
+):
+    """Persists closed windows and the session's progress in one transaction."""
+    if windows:
+        db.execute(
+            insert(LiveWindow), [{"session_id": session.id, **window} for window in windows]
+        )
+    session.packet_count += packet_count
+    session.window_count += len(windows)
+    session.updated_at = datetime.now(timezone.utc)
+    db.commit()
+
+
+def finish_live_session(
+    db: Session, session: LiveSession, status: str, error: Optional[str] = None
+):
+    session.status = status
+    session.error = error
+    session.updated_at = datetime.now(timezone.utc)
+    db.commit()
+
+
+def decode_record(timestamp: Optional[float], linktype: int, data: bytes):
+    """Scapy packet for a raw capture record (link type from the capture header)."""
+    packet = conf.l2types.get(linktype, conf.raw_layer)(data)
+    packet.time = timestamp if timestamp is not None else time.time()
+    return packet
+
+
+def _read_records(stream, records: queue.Queue, stop: threading.Event):
+    """Reader thread: pushes (timestamp, linktype, data) until the stream ends."""
+    try:
+        for _, timestamp, _, _, linktype, data in iter_capture_records(stream, read_data=True):
+            records.put((timestamp, linktype, data))
+            if stop.is_set():
+                break
+    except Exception as e:
+        records.put(e)
+    finally:
+        records.put(_END_OF_STREAM)
+
+
+def run_live_ingestion(
+    source: str,
+    user_id: str,
+    window_seconds: float = LIVE_WINDOW_SECONDS,
+    follow: bool = True,
+    idle_timeout: Optional[float] = None,
+    stop: Optional[threading.Event] = None,
+    profile: AnalysisProfile = DEFAULT_PROFILE,
+) -> str:
+    """
+    Ingests a live pcap / pcapng stream (see sources.open_live_source) until
+    it ends or `stop` is set.
+
+    A reader thread parses records off the stream; the calling thread
+    decodes them in batches, feeds a LiveAnalyzer and stores every closed
+    window right away, so memory stays bounded by the batch size and the
+    per-flow state however long the stream runs. `profile` holds the
+    congestion thresholds, as for uploads.
+
+    Returns:
+        The live session id
+    """
+    stop = stop or threading.Event()
+    db = SessionLocal()
+    session = create_live_session(db, user_id, source)
+    session_id = session.id
+    print(f"Live session {session_id} reading {source}")
+
+    stream = None
+    try:
+        stream = open_live_source(source, follow, stop, idle_timeout)
+        records: queue.Queue = queue.Queue(maxsize=LIVE_QUEUE_RECORDS)
+        reader = threading.Thread(
+            target=_read_records, args=(stream, records, stop), daemon=True
+        )
+        reader.start()
+
+        analyzer = LiveAnalyzer(window_seconds, profile=profile)
+        batch = []
+        while True:
+            try:
+                item = records.get(timeout=LIVE_BATCH_SECONDS)
+            except queue.Empty:
+                item = None
+            if isinstance(item, Exception):
+                raise item
+            if isinstance(item, tuple):
+                batch.append(decode_record(*item))
+
+            if batch and (len(batch) >= LIVE_BATCH_PACKETS or not isinstance(item, tuple)):
+                windows = analyzer.add(build_packet_table(batch))
+                store_live_windows(db, session, windows, len(batch))
+                for window in windows:
+                    print(
+                        f"Window {window['window_start'].isoformat()}: "
+                        f"{window['packet_count']} packets, congestion {window['congestion_level']}"
+                    )
+                batch = []
+
+            if item is _END_OF_STREAM or (item is None and stop.is_set()):
+                break
+
+        final_window = analyzer.flush()
+        store_live_windows(db, session, [final_window] if final_window else [], 0)
+        finish_live_session(db, session, "finished")
+        print(
+            f"Live session {session_id} finished: "
+            f"{session.packet_count} packets, {session.window_count} windows"
+        )
+    except Exception as e:
+        db.rollback()
+        finish_live_session(db, session, "failed", str(e))
+        raise
+    finally:
+        stop.set()
+        if stream is not None:
+            stream.close()
+        db.close()
+
+    return session_id
+
+
+async def get_live_sessions_async(db: AsyncSession, user_id: Optional[str] = None):
+    query = select(LiveSession).order_by(LiveSession.started_at.desc())
+    if user_id is not None:
+        query = query.where(LiveSession.user_id == user_id)
+    return (await db.execute(query)).scalars().all()
+
+
+async def get_live_windows_async(
+    db: AsyncSession,
+    session_id: str,
+    after: Optional[datetime] = None,
+    limit: int = LIVE_WINDOW_PAGE_SIZE,
+):
+    """
+    Windows of a session in time order. Poll with `after` set to the last
+    window_start seen to receive only new windows.
+    """
+    query = select(LiveWindow).where(LiveWindow.session_id == session_id)
+    if after is not None:
+        query = query.where(LiveWindow.window_start > after)
+    query = query.order_by(LiveWindow.window_start).limit(limit)
+    return (await db.execute(query)).scalars().all()
@@ -0,0 +1,62 @@
+"""
+Live capture ingestion worker.
+
+Reads a pcap / pcapng stream and stores rolling window analysis in the
+live_sessions / live_windows tables, e.g. from the server directory:
+
+    tcpdump -i eth0 -U -w - 'port 1883' | python -m live_capture_service.ingest - --user-id ops
+    python -m live_capture_service.ingest "cmd:tcpdump -i eth0 -U -w -" --user-id ops
+    python -m live_capture_service.ingest tcp://sensor:9000 --user-id ops
+    python -m live_capture_service.ingest /var/captures/broker.pcap --idle-timeout 30
+    python -m live_capture_service.ingest - --profile '{"jitter_spike_threshold_ms": 20}'
+"""
+import argparse
+import signal
+import threading
+
+from pydantic import ValidationError
+
+import database
+from analysis_service.profile.schema import DEFAULT_PROFILE, AnalysisProfile
+from .analyzer import LIVE_WINDOW_SECONDS
+from .crud import run_live_ingestion
+from .model import LiveSession, LiveWindow
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Live pcap stream ingestion")
+    parser.add_argument("source", help='"-", tcp://host:port, unix:///path, cmd:<command>, FIFO or file path')
+    parser.add_argument("--user-id", default="live")
+    parser.add_argument("--window", type=float, default=LIVE_WINDOW_SECONDS, help="window length in seconds")
+    parser.add_argument("--no-follow", action="store_true", help="read a file once instead of following it")
+    parser.add_argument("--idle-timeout", type=float, default=None, help="stop following a file after this many idle seconds")
+    parser.add_argument("--profile", default=None, help="AnalysisProfile thresholds as JSON (omitted fields keep their defaults)")
+    args = parser.parse_args()
+
+    try:
+        profile = AnalysisProfile.model_validate_json(args.profile) if args.profile else DEFAULT_PROFILE
+    except ValidationError as e:
+        parser.error(f"invalid --profile: {e}")
+
+    database.Base.metadata.create_all(
+        bind=database.engine, tables=[LiveSession.__table__, LiveWindow.__table__]
+    )
+
+    stop = threading.Event()
+    # First Ctrl-C / SIGTERM: finish the open window and exit cleanly
+    signal.signal(signal.SIGINT, lambda *_: stop.set())
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+
+    run_live_ingestion(
+        args.source,
+        args.user_id,
+        window_seconds=args.window,
+        follow=not args.no_follow,
+        idle_timeout=args.idle_timeout,
+        stop=stop,
+        profile=profile,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+import uuid
+from sqlalchemy import (
+    BigInteger,
+    Column,
+    DateTime,
+    Float,
+    ForeignKey,
+    Integer,
+    JSON,
+    PrimaryKeyConstraint,
+    String,
+)
+from sqlalchemy.sql import func
+from database import Base
+
+
+class LiveSession(Base):
+    """One live ingestion run (a pipe, socket or followed file)."""
+
+    __tablename__ = "live_sessions"
+
+    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    user_id = Column(String, nullable=False)
+    source = Column(String, nullable=False)  # As given to the ingester, e.g. "-" or "tcp://host:port"
+    status = Column(String, nullable=False, default="running")  # running / finished / failed
+    started_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now())
+    packet_count = Column(BigInteger, nullable=False, default=0)
+    window_count = Column(Integer, nullable=False, default=0)
+    error = Column(String, nullable=True)
+
+
+class LiveWindow(Base):
+    """
+    Analysis of one tumbling window of a live session. Windows are aligned
+    to the epoch by capture time, so the same window_start always covers the
+    same interval.
+    """
+
+    __tablename__ = "live_windows"
+    __table_args__ = (PrimaryKeyConstraint("session_id", "window_start"),)
+
+    session_id = Column(String, ForeignKey("live_sessions.id"), nullable=False)
+    window_start = Column(DateTime(timezone=True), nullable=False)
+    window_end = Column(DateTime(timezone=True), nullable=False)
+    packet_count = Column(Integer, nullable=False)
+    byte_count = Column(BigInteger, nullable=False)
+    average_latency = Column(Float, nullable=True)  # Mean inter-packet time in seconds
+    jitter_ms = Column(Float, nullable=True)
+    jitter_spikes = Column(Integer, nullable=False)
+    retransmissions = Column(Integer, nullable=False)
+    retransmission_rate = Column(Float, nullable=False)
+    packet_aggregation_inefficiency = Column(Integer, nullable=False)  # Flow delays above the bundling threshold
+    congestion_events = Column(Integer, nullable=False)
+    congestion_score = Column(Float, nullable=False)
+    congestion_level = Column(String, nullable=False)
+    change_points = Column(JSON, nullable=True)  # CUSUM start/end events seen in the window
@@ -0,0 +1,37 @@
+from pydantic import BaseModel
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+class LiveSessionResponse(BaseModel):
+    id: str
+    user_id: str
+    source: str
+    status: str
+    started_at: datetime
+    updated_at: datetime
+    packet_count: int
+    window_count: int
+    error: Optional[str] = None
+
+    class Config:
+        from_attributes = True
+
+class LiveWindowResponse(BaseModel):
+    session_id: str
+    window_start: datetime
+    window_end: datetime
+    packet_count: int
+    byte_count: int
+    average_latency: Optional[float] = None
+    jitter_ms: Optional[float] = None
+    jitter_spikes: int
+    retransmissions: int
+    retransmission_rate: float
+    packet_aggregation_inefficiency: int
+    congestion_events: int
+    congestion_score: float
+    congestion_level: str
+    change_points: Optional[List[Dict[str, Any]]] = None
+
+    class Config:
+        from_attributes = True
@@ -0,0 +1,118 @@
+import os
+import socket
+import stat
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import BinaryIO, Optional
+from urllib.parse import urlparse
+
+FOLLOW_POLL_SECONDS = 0.2  # How often a followed file is checked for new data
+
+
+class FollowFile:
+    """
+    Read side of a capture file that is still being written (`tcpdump -w
+    file`, a replay tool). read(n) waits for the writer instead of
+    returning short, until `stop` is set or the file stays idle for
+    `idle_timeout` seconds, which is then treated as end of stream.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        stop: Optional[threading.Event] = None,
+        idle_timeout: Optional[float] = None,
+    ):
+        self.file = open(path, "rb")
+        self.name = str(path)
+        self.stop = stop or threading.Event()
+        self.idle_timeout = idle_timeout
+
+    def read(self, count: int) -> bytes:
+        chunks = []
+        remaining = count
+        idle_since = time.monotonic()
+        while remaining > 0:
+            chunk = self.file.read(remaining)
+            if chunk:
+                chunks.append(chunk)
+                remaining -= len(chunk)
+                idle_since = time.monotonic()
+                continue
+            if self.stop.is_set():
+                break
+            if self.idle_timeout is not None and time.monotonic() - idle_since > self.idle_timeout:
+                break
+            time.sleep(FOLLOW_POLL_SECONDS)
+        return b"".join(chunks)
+
+    def seekable(self) -> bool:
+        return False  # Skips must read, so they wait for the writer too
+
+    def tell(self) -> int:
+        return self.file.tell()
+
+    def close(self):
+        self.file.close()
+
+
+class CommandStream:
+    """stdout of a capture command such as `tcpdump -i eth0 -U -w -`."""
+
+    def __init__(self, command: str):
+        self.process = subprocess.Popen(command, shell=True, stdout=subprocess.PIPE)
+        self.file = self.process.stdout
+
+    def read(self, count: int) -> bytes:
+        return self.file.read(count)
+
+    def seekable(self) -> bool:
+        return False
+
+    def close(self):
+        self.process.terminate()
+        self.file.close()
+        self.process.wait()
+
+
+def open_live_source(
+    source: str,
+    follow: bool = True,
+    stop: Optional[threading.Event] = None,
+    idle_timeout: Optional[float] = None,
+) -> BinaryIO:
+    """
+    Opens a pcap / pcapng byte stream for live ingestion.
+
+    Sources:
+        "-"                  standard input (`tcpdump -U -w - | ...`)
+        "tcp://host:port"    connects and reads the stream from a TCP socket
+        "unix:///path"       same over a Unix domain socket
+        "cmd:<command>"      runs a capture command and reads its stdout
+        path to a FIFO       read as a pipe
+        path to a file       followed as it grows (unless follow=False)
+    """
+    if source == "-":
+        return sys.stdin.buffer
+
+    if source.startswith("cmd:"):
+        return CommandStream(source[4:])
+
+    url = urlparse(source)
+    if url.scheme == "tcp":
+        connection = socket.create_connection((url.hostname, url.port))
+        return connection.makefile("rb")
+    if url.scheme == "unix":
+        connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        connection.connect(url.path)
+        return connection.makefile("rb")
+
+    path = Path(source)
+    if not path.exists():
+        raise ValueError(f"Live source not found: {source}")
+    if stat.S_ISFIFO(os.stat(path).st_mode) or not follow:
+        return open(path, "rb")
+    return FollowFile(path, stop, idle_timeout)
@@ -1,9 +1,12 @@
 from fastapi import FastAPI
 from routes import router as main_router
 from fastapi.middleware.cors import CORSMiddleware
-import redis.asyncio as redis
+from response_service.compression import CompressionMiddleware
 import database
 from storage_service import model
+from packet_extract_service.migration import migrate_packet_metadata
+from analysis_storage.migration import migrate_analysis_results
+from storage_service.migration import migrate_pcapng_storage
 from routes import router as storage_router
 import os
 
@@ -17,11 +20,13 @@ app.add_middleware(
     allow_headers=["*"],  # ✅ Allow all headers
 )
 
-# Redis Connection
-REDIS_URL = "redis://localhost:6379"
-redis_client = redis.from_url(REDIS_URL, decode_responses=True)
+# br / gzip by Accept-Encoding, including streamed analysis responses
+app.add_middleware(CompressionMiddleware)
 
 # Initialize the database
+migrate_pcapng_storage(database.engine)
+migrate_packet_metadata(database.engine)
+migrate_analysis_results(database.engine)
 model.Base.metadata.create_all(bind=database.engine)
 
 # Include all routes
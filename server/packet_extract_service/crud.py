@@ -2,142 +2,457 @@ from uuid import UUID
 from pathlib import Path
 from sqlalchemy.orm import Session
 from scapy.all import PcapReader
-from scapy.layers.inet import IP, TCP, UDP
+from scapy.plist import PacketList
+from capture_scan_service.codecs import open_capture
+from capture_scan_service.index import CaptureIndex, open_capture_at
+from sqlalchemy import or_, select, text
 from . import model
+from .table import (
+    L3_IPV4,
+    L3_IPV6,
+    L4_ICMP,
+    L4_NONE,
+    L4_TCP,
+    L4_UDP,
+    NO_PORT,
+    PacketTable,
+)
 import time
-from typing import List, Dict, Any, Generator
-from datetime import datetime
+import uuid
+from typing import List, Dict, Any, BinaryIO, Callable, Iterator, Optional, Union
+from datetime import datetime, timezone
+import numpy as np
+import ipaddress
+import json
+import os
 
+# COPY loader defaults
+DEFAULT_COMMIT_EVERY = int(
+    os.getenv("PACKET_COMMIT_EVERY", "500000")
+)  # Rows per COPY statement / transaction
+COPY_CHUNK_ROWS = 50_000  # Rows formatted at a time while streaming CSV
 
-def extract_and_store_packets_optimized(
-    file_path: Path, pcapng_id: UUID, db: Session, batch_size: int = 10000
-):
+PACKET_COPY_COLUMNS = (
+    "pcapng_id",
+    "packet_number",
+    "timestamp",
+    "protocol",
+    "source_ip",
+    "destination_ip",
+    "source_port",
+    "destination_port",
+    "packet_size",
+)
+
+# Protocol names accepted by the packet query API
+PROTOCOL_CODES = {"none": L4_NONE, "icmp": L4_ICMP, "tcp": L4_TCP, "udp": L4_UDP}
+
+PACKET_PAGE_SIZE = 1000
+MAX_PACKET_PAGE_SIZE = 10000
+STREAM_FETCH_ROWS = 500  # Rows fetched per round trip while streaming a page
+READ_PROGRESS_PACKETS = 10000  # Decode progress is reported this often
+
+
+def packet_partition_name(pcapng_id: UUID) -> str:
+    """Name of the packet_metadata partition holding one capture."""
+    return f"{model.Packet.__tablename__}_{uuid.UUID(str(pcapng_id)).hex}"
+
+
+def ensure_packet_partition(db: Session, pcapng_id: UUID):
     """
-    Extracts packets from a PCAPNG file and stores them in the database using optimized
-    streaming processing without loading the entire file into memory.
+    Creates the packet_metadata partition for a capture if it is missing.
 
-    Args:
-        file_path: Path to the PCAPNG file
-        pcapng_id: UUID of the PCAPNG file in the database
-        db: Database session
-        batch_size: Number of packets to process in a single batch
+    No-op on databases without declarative partitioning (e.g. SQLite).
     """
-    start_time = time.time()
-    total_processed = 0
-    batch_count = 0
-
-    # Process packets in batches using a generator
-    for batch in stream_packets(file_path, pcapng_id, batch_size):
-        batch_count += 1
-        if batch:  # Only process non-empty batches
-            create_packet_batch_optimized(db, batch)
-            batch_size = len(batch)
-            total_processed += batch_size
-            print(
-                f"Batch {batch_count} completed: {batch_size} packets, "
-                f"Total: {total_processed}"
+    if db.get_bind().dialect.name != "postgresql":
+        return
+    # pcapng ids are UUIDs; parsing them keeps the DDL free of injected text
+    capture_id = str(uuid.UUID(str(pcapng_id)))
+    db.execute(
+        text(
+            f"CREATE TABLE IF NOT EXISTS {packet_partition_name(capture_id)} "
+            f"PARTITION OF {model.Packet.__tablename__} "
+            f"FOR VALUES IN ('{capture_id}')"
+        )
+    )
+
+
+def delete_capture_packets(db: Session, pcapng_id: UUID):
+    """
+    Removes all stored packets of a capture: DROP of its partition on
+    PostgreSQL, a plain DELETE elsewhere.
+    """
+    if db.get_bind().dialect.name == "postgresql":
+        db.execute(text(f"DROP TABLE IF EXISTS {packet_partition_name(pcapng_id)}"))
+    else:
+        db.execute(
+            model.Packet.__table__.delete().where(
+                model.Packet.pcapng_id == str(pcapng_id)
             )
+        )
+    db.commit()
 
-    elapsed_time = time.time() - start_time
+
+def read_capture(
+    source: Union[Path, BinaryIO],
+    on_progress: Optional[Callable[[int, int], None]] = None,
+    progress_every: int = READ_PROGRESS_PACKETS,
+) -> PacketList:
+    """
+    Decodes a whole capture like scapy's rdpcap, reporting
+    on_progress(packets decoded, bytes read) every `progress_every` packets
+    and once at the end. Bytes are counted in the stored (possibly
+    compressed) file.
+
+    `source` is a file path or an open binary stream, e.g. a FollowFile
+    over a capture that is still being written. gzip and zstd captures are
+    decompressed on the fly.
+    """
+    packets = []
+    start = time.time()
+    stream = open_capture(source)
+    with PcapReader(stream) as pcap_reader:
+        for packet in pcap_reader:
+            packets.append(packet)
+            if on_progress is not None and len(packets) % progress_every == 0:
+                on_progress(len(packets), stream.raw_position)
+        if on_progress is not None:
+            on_progress(len(packets), stream.raw_position)
+    elapsed = time.time() - start
+    print(
+        f"Decoded {len(packets)} packets ({stream.codec or 'uncompressed'}: "
+        f"{stream.raw_position / 1e6:.1f} MB read, {stream.position / 1e6:.1f} MB decoded) "
+        f"in {elapsed:.2f} seconds, {stream.position / 1e6 / max(elapsed, 1e-9):.1f} MB/s"
+    )
+    return PacketList(packets, name=os.path.basename(stream.name))
+
+
+def read_capture_range(
+    file_path: Path,
+    index: Optional[CaptureIndex],
+    start: Optional[float] = None,
+    end: Optional[float] = None,
+    first_packet: Optional[int] = None,
+    last_packet: Optional[int] = None,
+) -> PacketList:
+    """
+    Decodes only the packets of a stored capture with capture time in
+    [start, end] (epoch seconds) and packet number in
+    [first_packet, last_packet] (1-based, file order). Open bounds are
+    unrestricted.
+
+    With the capture's sparse index the reader seeks to the first block
+    that can hold a match and stops after the last one, so only those
+    blocks are decoded; without it the whole capture is walked.
+    """
+    begin = time.time()
+    offset, number, stop_number = None, 1, None
+    if index is not None:
+        first_block, stop_block = 0, len(index)
+        if start is not None or end is not None:
+            first_block, stop_block = index.blocks_for_time(
+                -np.inf if start is None else start, np.inf if end is None else end
+            )
+        if first_packet is not None or last_packet is not None:
+            packet_blocks = index.blocks_for_packets(
+                first_packet or 1, last_packet or index.packet_count
+            )
+            first_block = max(first_block, packet_blocks[0])
+            stop_block = min(stop_block, packet_blocks[1])
+        if first_block >= stop_block:
+            return PacketList([], name=os.path.basename(file_path))
+        offset, number, stop_number = index.span(first_block, stop_block)
+    if last_packet is not None:
+        stop_number = min(stop_number or last_packet + 1, last_packet + 1)
+
+    stream = open_capture(file_path) if offset is None else open_capture_at(file_path, index, offset)
+    packets = []
+    decoded = 0
+    with PcapReader(stream) as pcap_reader:
+        for packet in pcap_reader:
+            if stop_number is not None and number >= stop_number:
+                break
+            decoded += 1
+            # As float seconds, like the table timestamps (and so the event
+            # times) that bounds are taken from: the exact Decimal time of a
+            # packet on a bound can compare just outside its float value
+            timestamp = float(packet.time)
+            in_range = (
+                (first_packet is None or number >= first_packet)
+                and (start is None or timestamp >= start)
+                and (end is None or timestamp <= end)
+            )
+            if in_range:
+                packets.append(packet)
+            number += 1
     print(
-        f"Extracted and stored {total_processed} packets in {elapsed_time:.2f} seconds"
+        f"Decoded {decoded} packets for a {len(packets)} packet range "
+        f"in {time.time() - begin:.2f} seconds"
     )
-    print(f"Processing rate: {total_processed / elapsed_time:.2f} packets/second")
+    return PacketList(packets, name=os.path.basename(file_path))
 
 
-def stream_packets(
-    file_path: Path, pcapng_id: UUID, batch_size: int
-) -> Generator[List[Dict[str, Any]], None, None]:
+def copy_packet_table(
+    db: Session,
+    table: PacketTable,
+    pcapng_id: UUID,
+    commit_every: int = DEFAULT_COMMIT_EVERY,
+) -> Dict[str, Any]:
     """
-    Stream packets from a PCAPNG file without loading everything into memory.
+    Bulk-loads a decoded capture into packet_metadata with
+    `COPY ... FROM STDIN (FORMAT csv)`.
+
+    Rows are formatted from the columnar table in chunks and streamed to
+    the server, so the CSV for the whole capture is never held in memory.
+    Each block of `commit_every` rows is one COPY statement followed by a
+    commit. On other databases (e.g. SQLite in development) the rows are
+    inserted with executemany in blocks of the same size.
 
     Args:
-        file_path: Path to the PCAPNG file
+        db: Database session
+        table: Decoded capture (see packet_extract_service.table)
         pcapng_id: UUID of the PCAPNG file in the database
-        batch_size: Number of packets per batch
+        commit_every: Number of rows per transaction
 
-    Yields:
-        Batches of packet data dictionaries
+    Returns:
+        Dictionary with rows loaded, commits, elapsed seconds and rows/s
     """
-    current_batch = []
-    packet_number = 1
+    if commit_every < 1:
+        raise ValueError("commit_every must be at least 1")
 
-    # Use PcapReader instead of rdpcap to avoid loading entire file
-    with PcapReader(str(file_path)) as pcap_reader:
-        for packet in pcap_reader:
-            if not hasattr(packet, "time"):
-                continue  # Skip packets without timestamps
+    start_time = time.time()
+    total = len(table)
+    commits = 0
+    use_copy = db.get_bind().dialect.name == "postgresql"
+    ensure_packet_partition(db, pcapng_id)
+
+    for block_start in range(0, total, commit_every):
+        block_end = min(block_start + commit_every, total)
+        if use_copy:
+            _copy_rows(db, table, pcapng_id, block_start, block_end)
+        else:
+            db.execute(
+                model.Packet.__table__.insert(),
+                list(_iter_packet_rows(table, pcapng_id, block_start, block_end)),
+            )
+        db.commit()
+        commits += 1
+
+    elapsed_time = time.time() - start_time
+    rows_per_second = total / elapsed_time if elapsed_time > 0 else 0.0
+    method = "copy" if use_copy else "insert"
+    print(
+        f"Loaded {total} packets in {elapsed_time:.2f} seconds "
+        f"({commits} commits, {method})"
+    )
+    print(f"Load rate: {rows_per_second:.2f} rows/second")
 
-            packet_data = extract_packet_data(packet, pcapng_id, packet_number)
-            current_batch.append(packet_data)
-            packet_number += 1
+    return {
+        "rows": total,
+        "commits": commits,
+        "seconds": elapsed_time,
+        "rows_per_second": rows_per_second,
+        "method": method,
+    }
 
-            # When batch is full, yield it
-            if len(current_batch) >= batch_size:
-                yield current_batch
-                current_batch = []
 
-        # Yield any remaining packets
-        if current_batch:
-            yield current_batch
+def _copy_rows(db: Session, table: PacketTable, pcapng_id: UUID, start: int, end: int):
+    """Streams rows [start, end) through one COPY on the session's connection."""
+    columns = ", ".join(PACKET_COPY_COLUMNS)
+    sql = (
+        f"COPY {model.Packet.__tablename__} ({columns}) "
+        "FROM STDIN WITH (FORMAT csv)"
+    )
+    # Raw psycopg2 cursor inside the session's current transaction
+    with db.connection().connection.cursor() as cursor:
+        cursor.copy_expert(
+            sql, _CsvStream(_iter_csv_chunks(table, pcapng_id, start, end))
+        )
 
 
-def extract_packet_data(packet, pcapng_id: UUID, packet_number: int) -> Dict[str, Any]:
+def _row_columns(table: PacketTable, start: int, end: int):
     """
-    Extract relevant data from a packet.
+    Packet-metadata column values for rows [start, end): protocol is the
+    L4 protocol number, addresses are filled in for IPv4/IPv6 packets and
+    ports for TCP/UDP, else None.
+    """
+    l3 = table["l3"][start:end]
+    is_ip = (l3 == L3_IPV4) | (l3 == L3_IPV6)
 
-    Args:
-        packet: Scapy packet object
-        pcapng_id: UUID of the PCAPNG file
-        packet_number: Sequential number of the packet
+    # Host id -> address, with one extra slot for None
+    hosts = np.array(table.hosts + [None], dtype=object)
+    missing = len(hosts) - 1
+    sources = hosts[np.where(is_ip, table["src"][start:end], missing)].tolist()
+    destinations = hosts[np.where(is_ip, table["dst"][start:end], missing)].tolist()
 
-    Returns:
-        Dictionary containing packet data
+    timestamps = [
+        datetime.fromtimestamp(ts, timezone.utc)
+        for ts in table["timestamp"][start:end].tolist()
+    ]
+    numbers = range(start + 1, end + 1)  # packet_number is 1-based, in file order
+    protocols = table["l4"][start:end].tolist()
+    return (
+        numbers,
+        timestamps,
+        protocols,
+        sources,
+        destinations,
+        _optional_ints(table["sport"][start:end]),
+        _optional_ints(table["dport"][start:end]),
+        table["size"][start:end].tolist(),
+    )
+
+
+def _optional_ints(values: np.ndarray) -> List[Optional[int]]:
+    """Port column as Python ints with NO_PORT mapped to None."""
+    return [None if v == NO_PORT else v for v in values.tolist()]
+
+
+def _iter_packet_rows(
+    table: PacketTable, pcapng_id: UUID, start: int, end: int
+) -> Iterator[Dict[str, Any]]:
+    """Rows [start, end) as insert dictionaries (non-COPY fallback)."""
+    for chunk_start in range(start, end, COPY_CHUNK_ROWS):
+        chunk_end = min(chunk_start + COPY_CHUNK_ROWS, end)
+        for row in zip(*_row_columns(table, chunk_start, chunk_end)):
+            yield dict(zip(PACKET_COPY_COLUMNS, (str(pcapng_id),) + row))
+
+
+def _iter_csv_chunks(
+    table: PacketTable, pcapng_id: UUID, start: int, end: int
+) -> Iterator[str]:
     """
-    # Determine protocol layer
-    protocol = "Unknown"
-    source_ip = "Unknown"
-    destination_ip = "Unknown"
+    CSV text for rows [start, end), COPY_CHUNK_ROWS rows at a time.
 
-    if packet.haslayer(IP):
-        protocol = "IP"
-        source_ip = packet[IP].src
-        destination_ip = packet[IP].dst
+    Values are ids, numbers, timestamps and IP addresses, none of which
+    contain commas, quotes or newlines, so no CSV quoting is needed. None
+    is written as an empty unquoted field, which COPY reads as NULL.
+    """
+    pcapng_id = str(pcapng_id)
+    for chunk_start in range(start, end, COPY_CHUNK_ROWS):
+        chunk_end = min(chunk_start + COPY_CHUNK_ROWS, end)
+        yield "".join(
+            f"{pcapng_id},{number},{ts.isoformat()},{protocol},"
+            f"{src or ''},{dst or ''},{'' if sport is None else sport},"
+            f"{'' if dport is None else dport},{size}\n"
+            for number, ts, protocol, src, dst, sport, dport, size in zip(
+                *_row_columns(table, chunk_start, chunk_end)
+            )
+        )
 
-    if packet.haslayer(TCP):
-        protocol = "TCP"
-    elif packet.haslayer(UDP):
-        protocol = "UDP"
 
-    # Extract packet size safely
-    packet_size = len(packet)
+class _CsvStream:
+    """Minimal file-like wrapper so `copy_expert` can pull from a generator."""
 
-    # Convert Unix timestamp to datetime
-    packet_timestamp = datetime.fromtimestamp(float(packet.time))
+    def __init__(self, chunks: Iterator[str]):
+        self.chunks = chunks
+        self.buffer = ""
+        self.position = 0
+
+    def read(self, size: int = -1) -> str:
+        if self.position >= len(self.buffer):
+            self.buffer = next(self.chunks, "")
+            self.position = 0
+        if size < 0:
+            size = len(self.buffer)
+        data = self.buffer[self.position : self.position + size]
+        self.position += len(data)
+        return data
 
-    # Create packet data dictionary
-    return {
-        "pcapng_id": pcapng_id,
-        "packet_number": packet_number,
-        "timestamp": packet_timestamp,
-        "protocol": protocol,
-        "source_ip": source_ip,
-        "destination_ip": destination_ip,
-        "packet_size": packet_size,
-    }
 
+def parse_protocol(protocol: str) -> int:
+    """Protocol filter value: a name from PROTOCOL_CODES or an IANA number."""
+    code = PROTOCOL_CODES.get(protocol.lower())
+    if code is None:
+        try:
+            code = int(protocol)
+        except ValueError:
+            raise ValueError(f"Unknown protocol: {protocol}")
+    return code
 
-def create_packet_batch_optimized(db: Session, packet_data_list: List[Dict[str, Any]]):
+
+def query_packets(
+    pcapng_id: str,
+    after: int = 0,
+    limit: int = PACKET_PAGE_SIZE,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    ip: Optional[str] = None,
+    port: Optional[int] = None,
+    protocol: Optional[str] = None,
+):
     """
-    Creates multiple packet entries in the database in a single optimized transaction.
+    Builds one keyset-paginated page query over a capture's packets.
+
+    Pages are ordered by packet_number and continue after the last number
+    of the previous page, so every page is an index range scan on
+    (pcapng_id, packet_number) inside the capture's partition, whatever
+    the page depth (no OFFSET).
 
     Args:
-        db: Database session
-        packet_data_list: List of packet data dictionaries
+        pcapng_id: Capture to read
+        after: Return packets with packet_number greater than this
+        limit: Page size
+        start, end: Inclusive timestamp range
+        ip: Matches source or destination address
+        port: Matches source or destination port
+        protocol: Protocol name (tcp, udp, icmp, none) or number
     """
-    # Use multi_params for faster insertion
-    db.execute(
-        model.Packet.__table__.insert(),
-        [packet_data for packet_data in packet_data_list],
+    packet = model.Packet
+    query = (
+        select(packet)
+        .where(packet.pcapng_id == pcapng_id, packet.packet_number > after)
+        .order_by(packet.packet_number)
+        .limit(limit)
     )
-    db.commit()
+
+    if start is not None:
+        query = query.where(packet.timestamp >= start)
+    if end is not None:
+        query = query.where(packet.timestamp <= end)
+    if ip is not None:
+        ip = str(ipaddress.ip_address(ip))  # ValueError on malformed input
+        query = query.where(or_(packet.source_ip == ip, packet.destination_ip == ip))
+    if port is not None:
+        query = query.where(
+            or_(packet.source_port == port, packet.destination_port == port)
+        )
+    if protocol is not None:
+        query = query.where(packet.protocol == parse_protocol(protocol))
+
+    return query
+
+
+def iter_packet_page_json(db: Session, query, limit: int) -> Iterator[str]:
+    """
+    Streams one page as a JSON object:
+    {"packets": [...], "count": n, "next_after": last packet_number or null}.
+
+    Rows are fetched in batches through a server-side cursor and encoded
+    as they arrive, so memory and time-to-first-byte do not grow with the
+    page size. `next_after` is null once a page comes back short.
+    """
+    result = db.execute(query.execution_options(yield_per=STREAM_FETCH_ROWS))
+
+    yield '{"packets": ['
+    count = 0
+    last_number = None
+    for packet in result.scalars():
+        row = {
+            "packet_number": packet.packet_number,
+            "timestamp": packet.timestamp.isoformat(),
+            "protocol": packet.protocol,
+            "source_ip": None if packet.source_ip is None else str(packet.source_ip),
+            "destination_ip": (
+                None if packet.destination_ip is None else str(packet.destination_ip)
+            ),
+            "source_port": packet.source_port,
+            "destination_port": packet.destination_port,
+            "packet_size": packet.packet_size,
+        }
+        yield ("," if count else "") + json.dumps(row)
+        count += 1
+        last_number = packet.packet_number
+
+    next_after = last_number if count == limit else None
+    yield f'], "count": {count}, "next_after": {json.dumps(next_after)}}}'
@@ -0,0 +1,121 @@
+import uuid
+from typing import Iterable, List, Tuple
+
+from sqlalchemy import bindparam, inspect, text
+from sqlalchemy.engine import Engine
+from . import model
+from .crud import packet_partition_name
+from .table import L4_ICMP, L4_NONE, L4_TCP, L4_UDP
+
+LEGACY_TABLE = "packet_metadata_legacy"
+
+# Free-text protocol values written by the old schema
+LEGACY_PROTOCOL_CODES = {"TCP": L4_TCP, "UDP": L4_UDP, "ICMP": L4_ICMP}
+
+
+def split_capture_ids(values: Iterable) -> Tuple[List[str], List]:
+    """
+    Legacy capture ids that are canonical UUID strings, and the others.
+    Only the former are put into partition DDL (as ensure_packet_partition
+    does): a malformed id can neither break nor inject into it.
+    """
+    valid, skipped = [], []
+    for value in values:
+        try:
+            canonical = str(uuid.UUID(str(value)))
+        except ValueError:
+            canonical = None
+        (valid if canonical == str(value) else skipped).append(value)
+    return valid, skipped
+
+
+def migrate_packet_metadata(engine: Engine):
+    """
+    Upgrades an existing packet_metadata table to the partitioned, typed
+    schema in `model.Packet`.
+
+    Old table: serial/uuid `id`, text timestamp, free-text protocol and
+    "Unknown" placeholders for addresses. It is renamed, the partitioned
+    table and one partition per capture are created, rows are copied over
+    with type conversions, and the old table is dropped, all in one
+    transaction. Must run before `Base.metadata.create_all`.
+
+    Rows whose capture id is not a UUID (see split_capture_ids) are not
+    migrated: they are left, and reported, in packet_metadata_legacy.
+
+    Does nothing on a fresh database, when the table is already
+    partitioned, or on non-PostgreSQL databases (recreate the SQLite
+    development database instead).
+    """
+    if engine.dialect.name != "postgresql":
+        return
+
+    table_name = model.Packet.__tablename__
+    with engine.begin() as conn:
+        relkind = conn.execute(
+            text(
+                "SELECT c.relkind FROM pg_class c "
+                "JOIN pg_namespace n ON n.oid = c.relnamespace "
+                "WHERE c.relname = :name AND n.nspname = current_schema()"
+            ),
+            {"name": table_name},
+        ).scalar()
+        if relkind != "r":
+            return  # Missing (create_all builds it) or already partitioned
+
+        # Index names are schema-wide, so move the old ones out of the way too
+        for index in inspect(conn).get_indexes(table_name):
+            conn.execute(
+                text(f'ALTER INDEX "{index["name"]}" RENAME TO "{index["name"]}_legacy"')
+            )
+        conn.execute(text(f"ALTER TABLE {table_name} RENAME TO {LEGACY_TABLE}"))
+        conn.execute(
+            text(
+                f"ALTER TABLE {LEGACY_TABLE} "
+                f"RENAME CONSTRAINT {table_name}_pkey TO {LEGACY_TABLE}_pkey"
+            )
+        )
+        model.Packet.__table__.create(conn)
+
+        capture_ids, skipped = split_capture_ids(
+            conn.execute(text(f"SELECT DISTINCT pcapng_id FROM {LEGACY_TABLE}")).scalars()
+        )
+        for capture_id in capture_ids:
+            conn.execute(
+                text(
+                    f"CREATE TABLE {packet_partition_name(capture_id)} "
+                    f"PARTITION OF {table_name} FOR VALUES IN ('{capture_id}')"
+                )
+            )
+
+        protocol_case = " ".join(
+            f"WHEN '{name}' THEN {code}" for name, code in LEGACY_PROTOCOL_CODES.items()
+        )
+        # Old timestamps are naive local-time strings; the session time zone
+        # is used to interpret them
+        migrated = bindparam("capture_ids", capture_ids)
+        conn.execute(
+            text(
+                f"INSERT INTO {table_name} "
+                "(pcapng_id, packet_number, timestamp, protocol, source_ip, "
+                "destination_ip, packet_size) "
+                "SELECT pcapng_id, packet_number, timestamp::timestamptz, "
+                f"CASE protocol {protocol_case} ELSE {L4_NONE} END, "
+                "NULLIF(source_ip, 'Unknown')::inet, "
+                "NULLIF(destination_ip, 'Unknown')::inet, packet_size "
+                f"FROM {LEGACY_TABLE} "
+                "WHERE pcapng_id::text = ANY(:capture_ids) "
+                "ON CONFLICT DO NOTHING"
+            ).bindparams(migrated)
+        )
+        if not skipped:
+            conn.execute(text(f"DROP TABLE {LEGACY_TABLE}"))
+            return
+        conn.execute(
+            text(f"DELETE FROM {LEGACY_TABLE} WHERE pcapng_id::text = ANY(:capture_ids)")
+            .bindparams(migrated)
+        )
+        print(
+            f"Kept the packets of {len(skipped)} captures with non-UUID ids in "
+            f"{LEGACY_TABLE}: {skipped!r}"
+        )
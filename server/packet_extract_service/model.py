@@ -1,16 +1,43 @@
-import uuid 
-from sqlalchemy import Column, Integer, String, ForeignKey
-from sqlalchemy.sql import func
-from database import Base 
+from sqlalchemy import (
+    Column,
+    DateTime,
+    ForeignKey,
+    Index,
+    Integer,
+    PrimaryKeyConstraint,
+    SmallInteger,
+    String,
+)
+from sqlalchemy.dialects.postgresql import INET
+from database import Base
+
+# IP address column: native inet on PostgreSQL, text elsewhere (SQLite in development)
+IPAddress = String().with_variant(INET(), "postgresql")
+
 
 class Packet(Base):
+    """
+    Per-packet metadata, LIST-partitioned by capture on PostgreSQL.
+
+    Each capture gets its own partition (see crud.ensure_packet_partition),
+    so per-capture scans only read that partition and deleting a capture
+    is a DROP TABLE instead of a bulk DELETE.
+    """
+
     __tablename__ = "packet_metadata"
-    
-    id = Column(Integer, primary_key=True, default=lambda: str(uuid.uuid4()))
+    __table_args__ = (
+        PrimaryKeyConstraint("pcapng_id", "packet_number"),
+        # Timestamps grow with packet_number, so a BRIN index stays tiny
+        Index("ix_packet_metadata_timestamp_brin", "timestamp", postgresql_using="brin"),
+        {"postgresql_partition_by": "LIST (pcapng_id)"},
+    )
+
     pcapng_id = Column(String, ForeignKey("pcapng_storage.id"), nullable=False)  # Links to uploaded file
-    packet_number = Column(Integer, nullable=False)
-    timestamp = Column(String, nullable=False)
-    protocol = Column(String, nullable=False)  # Protocol type (e.g., TCP, UDP)
-    source_ip = Column(String, nullable=False)  # Source IP address
-    destination_ip = Column(String, nullable=False)  # Destination IP address
-    packet_size = Column(Integer, nullable=False)
\ No newline at end of file
+    packet_number = Column(Integer, nullable=False)  # 1-based, in file order
+    timestamp = Column(DateTime(timezone=True), nullable=False)
+    protocol = Column(SmallInteger, nullable=False)  # IANA protocol number (6 TCP, 17 UDP, 1 ICMP), 0 if none
+    source_ip = Column(IPAddress, nullable=True)  # IPv4/IPv6 source, NULL for non-IP packets
+    destination_ip = Column(IPAddress, nullable=True)
+    source_port = Column(Integer, nullable=True)  # TCP/UDP ports, NULL otherwise
+    destination_port = Column(Integer, nullable=True)
+    packet_size = Column(Integer, nullable=False)
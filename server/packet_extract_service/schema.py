@@ -1,20 +1,22 @@
 from pydantic import BaseModel
 from uuid import UUID
 from datetime import datetime
+from typing import Optional
 
 class PacketBase(BaseModel):
     pcapng_id: UUID
     packet_number: int
     timestamp: datetime
-    protocol: str
-    source_ip: str
-    destination_ip: str
+    protocol: int  # IANA protocol number, 0 if none
+    source_ip: Optional[str] = None
+    destination_ip: Optional[str] = None
+    source_port: Optional[int] = None
+    destination_port: Optional[int] = None
     packet_size: int
 
 class PacketCreate(PacketBase):
     pass
 
 class PacketResponse(PacketBase):
-    id: str
     class Config:
         from_attributes = True
@@ -0,0 +1,244 @@
+from typing import Any, Dict, Iterable, List, Union
+
+import numpy as np
+
+# Network layer codes
+L3_NONE = 0
+L3_IPV4 = 1
+L3_IPV6 = 2
+L3_ARP = 3
+
+# Transport layer codes (IANA protocol numbers where one exists)
+L4_NONE = 0
+L4_ICMP = 1
+L4_TCP = 6
+L4_UDP = 17
+
+NO_PORT = -1
+NO_SEQ = -1
+NO_HOST = -1
+NO_IP_FIELD = -1  # ip_proto / ip_len of packets without an IPv4 layer
+
+# Highest layer codes, as classified by the pattern detection
+TOP_OTHER, TOP_TCP, TOP_HTTP, TOP_TLS, TOP_UDP, TOP_DNS, TOP_ICMP, TOP_ARP = range(8)
+TOP_LAYER_NAMES = ["Other", "TCP", "HTTP", "TLS/SSL", "UDP", "DNS", "ICMP", "ARP"]
+
+_L3_CODES = {"IP": L3_IPV4, "IPv6": L3_IPV6, "ARP": L3_ARP}
+_LAYER_NAMES = set(_L3_CODES) | {"TCP", "UDP", "ICMP"}
+_APP_LAYER_NAMES = {"HTTP", "TLS", "SSL", "DNS"}
+
+
+class PacketTable:
+    """
+    Columnar view of a decoded capture: one NumPy array per field, one row
+    per packet in file order.
+
+    Addresses are interned into `hosts` and stored as integer ids so flow
+    grouping and set-membership tests run on integer arrays.
+
+    Columns:
+        timestamp  float64  packet time in seconds
+        size       int64    captured length (len(pkt))
+        l3         int8     L3_* code of the first network layer
+        l4         int8     L4_* code of the first transport layer
+        src, dst   int32    host ids (IP/IPv6 addresses, ARP psrc/pdst)
+        sport      int32    source port, NO_PORT if absent
+        dport      int32    destination port, NO_PORT if absent
+        seq        int64    TCP sequence number, NO_SEQ if absent
+        ip_proto   int16    IPv4 protocol field, NO_IP_FIELD if absent
+        ip_len     int32    IPv4 total length field, NO_IP_FIELD if absent
+        top_layer  int8     TOP_* code of the highest recognized layer
+    """
+
+    def __init__(self, columns: Dict[str, np.ndarray], hosts: List[str]):
+        self.columns = columns
+        self.hosts = hosts
+
+    def __len__(self) -> int:
+        return len(self.columns["timestamp"])
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self.columns[name]
+
+    def take(self, rows) -> "PacketTable":
+        """Table of the selected rows (index array, mask or slice), sharing `hosts`."""
+        return PacketTable(
+            {name: column[rows] for name, column in self.columns.items()}, self.hosts
+        )
+
+    def host_names(self, host_ids: Iterable[int]) -> List[str]:
+        """Maps host ids back to address strings."""
+        hosts = self.hosts
+        return [hosts[h] if h != NO_HOST else None for h in host_ids]
+
+
+def build_packet_table(packets: Iterable[Any]) -> PacketTable:
+    """
+    Decodes Scapy packets into a PacketTable in a single pass.
+
+    Each packet's layer chain is walked once and the first occurrence of
+    each layer of interest is recorded, which matches what `pkt.haslayer()`
+    and `pkt["IP"]`, `pkt["TCP"]` etc. see in the per-packet analyzers;
+    application layers are matched by class or display name, like
+    `pkt.haslayer("DNS")`.
+    """
+    timestamps = []
+    sizes = []
+    l3_codes = []
+    l4_codes = []
+    srcs = []
+    dsts = []
+    sports = []
+    dports = []
+    seqs = []
+    ip_protos = []
+    ip_lens = []
+    top_layers = []
+
+    host_ids: Dict[str, int] = {}
+    hosts: List[str] = []
+
+    def intern(address) -> int:
+        host_id = host_ids.get(address)
+        if host_id is None:
+            host_id = host_ids[address] = len(hosts)
+            hosts.append(address)
+        return host_id
+
+    for pkt in packets:
+        if not hasattr(pkt, "time"):
+            continue  # Skip packets without timestamps
+
+        # First occurrence of each layer of interest, like pkt["IP"] etc.
+        found = {}
+        apps = set()
+        layer = pkt
+        while layer:
+            name = type(layer).__name__
+            if name in _LAYER_NAMES:
+                if name not in found:
+                    found[name] = layer
+            elif name in _APP_LAYER_NAMES:
+                apps.add(name)
+            elif layer._name in _APP_LAYER_NAMES:
+                apps.add(layer._name)
+            layer = layer.payload
+
+        src = dst = NO_HOST
+        l3_code = L3_NONE
+        for name in ("IP", "IPv6", "ARP"):  # precedence used by the analyzers
+            if name in found:
+                l3_code = _L3_CODES[name]
+                if l3_code == L3_ARP:
+                    src, dst = intern(found[name].psrc), intern(found[name].pdst)
+                else:
+                    src, dst = intern(found[name].src), intern(found[name].dst)
+                break
+
+        sport = dport = NO_PORT
+        seq = NO_SEQ
+        l4_code = L4_NONE
+        if "TCP" in found:
+            l4_code = L4_TCP
+            tcp = found["TCP"]
+            sport, dport, seq = tcp.sport, tcp.dport, tcp.seq
+        elif "UDP" in found:
+            l4_code = L4_UDP
+            sport, dport = found["UDP"].sport, found["UDP"].dport
+        elif "ICMP" in found:
+            l4_code = L4_ICMP
+
+        ip_proto = ip_len = NO_IP_FIELD
+        if "IP" in found:
+            ip_proto, ip_len = found["IP"].proto, found["IP"].len
+
+        if l4_code == L4_TCP:
+            if "HTTP" in apps:
+                top_layer = TOP_HTTP
+            elif "TLS" in apps or "SSL" in apps:
+                top_layer = TOP_TLS
+            else:
+                top_layer = TOP_TCP
+        elif l4_code == L4_UDP:
+            top_layer = TOP_DNS if "DNS" in apps else TOP_UDP
+        elif l4_code == L4_ICMP:
+            top_layer = TOP_ICMP
+        elif "ARP" in found:
+            top_layer = TOP_ARP
+        else:
+            top_layer = TOP_OTHER
+
+        timestamps.append(float(pkt.time))
+        sizes.append(len(pkt))
+        l3_codes.append(l3_code)
+        l4_codes.append(l4_code)
+        srcs.append(src)
+        dsts.append(dst)
+        sports.append(sport)
+        dports.append(dport)
+        seqs.append(seq)
+        ip_protos.append(ip_proto)
+        ip_lens.append(ip_len)
+        top_layers.append(top_layer)
+
+    columns = {
+        "timestamp": np.array(timestamps, dtype=np.float64),
+        "size": np.array(sizes, dtype=np.int64),
+        "l3": np.array(l3_codes, dtype=np.int8),
+        "l4": np.array(l4_codes, dtype=np.int8),
+        "src": np.array(srcs, dtype=np.int32),
+        "dst": np.array(dsts, dtype=np.int32),
+        "sport": np.array(sports, dtype=np.int32),
+        "dport": np.array(dports, dtype=np.int32),
+        "seq": np.array(seqs, dtype=np.int64),
+        "ip_proto": np.array(ip_protos, dtype=np.int16),
+        "ip_len": np.array(ip_lens, dtype=np.int32),
+        "top_layer": np.array(top_layers, dtype=np.int8),
+    }
+    return PacketTable(columns, hosts)
+
+
+def as_packet_table(packets: Union[PacketTable, Iterable[Any]]) -> PacketTable:
+    """Returns `packets` unchanged if already columnar, else decodes it."""
+    if isinstance(packets, PacketTable):
+        return packets
+    return build_packet_table(packets)
+
+
+def group_rows(*keys: np.ndarray):
+    """
+    Groups rows by one or more integer key columns.
+
+    Groups are numbered in order of first appearance, so iterating groups
+    reproduces the insertion order of a dict keyed the same way.
+
+    Returns:
+        (group_ids, order, starts): group id per row, a stable ordering that
+        puts each group's rows together in file order, and the offset of
+        each group within that ordering.
+    """
+    n = len(keys[0])
+    if n == 0:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty, empty
+
+    order = np.lexsort(keys[::-1])  # stable, so file order is kept within groups
+    sorted_keys = [k[order] for k in keys]
+    boundary = np.zeros(n, dtype=bool)
+    boundary[0] = True
+    for k in sorted_keys:
+        boundary[1:] |= k[1:] != k[:-1]
+    sorted_group = np.cumsum(boundary) - 1
+
+    # Renumber groups by first appearance
+    first_row = order[boundary]
+    rank = np.empty(len(first_row), dtype=np.int64)
+    rank[np.argsort(first_row, kind="stable")] = np.arange(len(first_row))
+
+    group_ids = np.empty(n, dtype=np.int64)
+    group_ids[order] = rank[sorted_group]
+
+    order = np.lexsort((np.arange(n), group_ids))
+    counts = np.bincount(group_ids)
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    return group_ids, order, starts
@@ -0,0 +1,149 @@
+import asyncio
+import threading
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from response_service.encoding import dumps
+
+PROGRESS_RETENTION_SECONDS = 600  # Finished channels stay replayable this long
+HEARTBEAT_SECONDS = 15  # Idle subscribers get a keep-alive at this interval
+
+# Event types that end a channel
+FINAL_EVENTS = ("complete", "failed")
+
+
+class ProgressChannel:
+    """
+    Ordered event log of one capture's processing, plus live subscribers.
+
+    Publishing is thread-safe (analyzers run in the threadpool); subscribers
+    are asyncio consumers and receive the full history first, so a client
+    that connects late, or reconnects with Last-Event-ID, misses nothing.
+    """
+
+    def __init__(self, key: str):
+        self.key = key
+        self.events: List[Dict[str, Any]] = []
+        self.finished_at: Optional[float] = None
+        self.subscribers = set()  # (event loop, asyncio.Queue)
+        self.lock = threading.Lock()
+
+    def publish(self, event: str, data: Dict[str, Any]):
+        with self.lock:
+            if self.finished_at is not None:
+                return
+            message = {"id": len(self.events), "event": event, "data": data}
+            self.events.append(message)
+            if event in FINAL_EVENTS:
+                self.finished_at = time.monotonic()
+            subscribers = list(self.subscribers)
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(queue.put_nowait, message)
+            except RuntimeError:
+                pass  # Subscriber's loop already closed
+
+    def stage(self, stage: str, status: str, **details):
+        """Stage progress: status is started / progress / finished."""
+        self.publish("progress", {"stage": stage, "status": status, **details})
+
+    def result(self, analyzer: str, result: Any):
+        self.publish("result", {"analyzer": analyzer, "result": result})
+
+    def complete(self, **details):
+        self.publish("complete", {"pcapng_id": self.key, **details})
+
+    def fail(self, error: str):
+        self.publish("failed", {"pcapng_id": self.key, "error": error})
+
+    async def subscribe(self, after: Optional[int] = None) -> AsyncIterator[Optional[dict]]:
+        """
+        Yields events with id > `after` until a final event, and None as a
+        heartbeat whenever nothing happened for HEARTBEAT_SECONDS.
+        """
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+        next_id = 0 if after is None else after + 1
+
+        with self.lock:
+            backlog = self.events[next_id:]
+            finished = self.finished_at is not None
+            if not finished:
+                self.subscribers.add((loop, queue))
+        try:
+            for message in backlog:
+                next_id = message["id"] + 1
+                yield message
+            if finished:
+                return
+            while True:
+                try:
+                    message = await asyncio.wait_for(queue.get(), HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield None
+                    continue
+                if message["id"] < next_id:
+                    continue
+                next_id = message["id"] + 1
+                yield message
+                if message["event"] in FINAL_EVENTS:
+                    return
+        finally:
+            with self.lock:
+                self.subscribers.discard((loop, queue))
+
+
+class ProgressHub:
+    """
+    Progress channels keyed by pcapng_id. In-process: a subscriber must
+    reach the worker that runs the upload (single worker, or sticky routing).
+    """
+
+    def __init__(self, retention: float = PROGRESS_RETENTION_SECONDS):
+        self.retention = retention
+        self.channels: Dict[str, ProgressChannel] = {}
+        self.lock = threading.Lock()
+
+    def open(self, key: str) -> ProgressChannel:
+        with self.lock:
+            self._expire()
+            channel = self.channels.get(key)
+            if channel is None:
+                channel = self.channels[key] = ProgressChannel(key)
+            return channel
+
+    def get(self, key: str) -> Optional[ProgressChannel]:
+        with self.lock:
+            self._expire()
+            return self.channels.get(key)
+
+    def _expire(self):
+        cutoff = time.monotonic() - self.retention
+        for key in [
+            key for key, channel in self.channels.items()
+            if channel.finished_at is not None and channel.finished_at < cutoff
+        ]:
+            del self.channels[key]
+
+
+def format_sse(message: Optional[dict]) -> bytes:
+    """One server-sent event; None becomes a comment line (heartbeat)."""
+    if message is None:
+        return b": keep-alive\n\n"
+    return (
+        f"id: {message['id']}\nevent: {message['event']}\ndata: ".encode()
+        + dumps(message["data"])
+        + b"\n\n"
+    )
+
+
+async def iter_sse(channel: ProgressChannel, after: Optional[int] = None) -> AsyncIterator[bytes]:
+    async for message in channel.subscribe(after):
+        yield format_sse(message)
+
+
+_hub = ProgressHub()
+
+
+def get_progress_hub() -> ProgressHub:
+    return _hub
@@ -0,0 +1,175 @@
+import hashlib
+import os
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+from fastapi import HTTPException
+
+from analysis_service.pipeline.products import CaptureProducts
+from analysis_service.pipeline.registry import (
+    ANALYZERS,
+    AnalysisOptions,
+    analyzer_params,
+    analyzer_products,
+    run_analyzers,
+)
+from cache_service.cache import get_cache
+from cache_service.result_cache import capture_digest
+from cache_service.table_cache import get_table_cache, table_cache_key
+from capture_scan_service.index import get_capture_index
+from packet_extract_service.crud import read_capture_range
+from packet_extract_service.table import build_packet_table
+from response_service.encoding import dumps
+from .schema import ReanalyzeRequest
+
+REANALYSIS_CACHE = "reanalysis"
+REANALYSIS_CACHE_TTL_SECONDS = int(os.getenv("REANALYSIS_CACHE_TTL_SECONDS", "3600"))
+
+
+class _RangeInput:
+    """
+    A capture window, decoded on first use. The columnar table comes from
+    the decoded table cache when the capture (or this window) is in it, so
+    analyzers that run on the table never touch the capture file; Scapy
+    packets are only decoded, through the packet index, when an analyzer
+    needs them or no table is cached.
+    """
+
+    def __init__(self, file_path: Path, root: Path, pcapng_id: str, options: ReanalyzeRequest):
+        self.file_path = file_path
+        self.root = root
+        self.start = options.start
+        self.end = options.end
+        self.capture_key = table_cache_key(pcapng_id, file_path)
+        self.window_key = table_cache_key(pcapng_id, file_path, options.start, options.end)
+        self._packets = None
+        self._table = None
+
+    @property
+    def packets(self):
+        if self._packets is None:
+            index = get_capture_index(self.file_path, self.root)
+            self._packets = read_capture_range(self.file_path, index, self.start, self.end)
+        return self._packets
+
+    @property
+    def table(self):
+        if self._table is None:
+            cache = get_table_cache()
+            begin = time.time()
+            if self.window_key == self.capture_key:
+                self._table = cache.get(self.capture_key)
+            else:
+                self._table = cache.get_window(self.capture_key, self.start, self.end)
+                if self._table is None:
+                    self._table = cache.get(self.window_key)
+            if self._table is not None:
+                print(f"Loaded {len(self._table)} cached packet rows in {time.time() - begin:.3f} seconds")
+            else:
+                self._table = build_packet_table(self.packets)
+                cache.put(self.window_key, self._table)
+        return self._table
+
+
+def reanalysis_cache_key(
+    pcapng_id: str, file_path: Path, options: ReanalyzeRequest, analyzer: str
+) -> str:
+    """
+    Cache key of one analyzer over one range: the capture (by id and by
+    file size / mtime, so a replaced file misses), the range, the analyzer
+    and a hash of only the parameters and profile fields that analyzer
+    reads, so a threshold change misses only for the analyzers it affects.
+    """
+    stat = Path(file_path).stat()
+    params_hash = hashlib.sha1(dumps(analyzer_params(analyzer, options))).hexdigest()[:16]
+    return (
+        f"{pcapng_id}:{stat.st_size}:{stat.st_mtime_ns}:"
+        f"{options.start!r}:{options.end!r}:{analyzer}:{params_hash}"
+    )
+
+
+def reanalyze_capture(
+    file_path: Path, root: Path, pcapng_id: str, options: ReanalyzeRequest
+) -> Dict[str, Any]:
+    """
+    Runs a subset of the analyzers over the packets of a stored capture
+    with capture time in [options.start, options.end] (CPU-bound, call from
+    a worker thread).
+
+    Each analyzer's result is cached per (range, analyzer, parameters,
+    profile fields it reads). Analyzers that miss run on the decoded
+    table from the table cache when there is one; the capture itself is
+    only decoded, and then only the index blocks covering the range, for
+    the Scapy-based analyzers or when no table is cached.
+
+    Returns:
+        Dictionary shaped as ReanalyzeResponse
+    """
+    analyzers: List[str] = options.analyzers or list(ANALYZERS)
+    unknown = sorted(set(analyzers) - set(ANALYZERS))
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown analyzers {unknown}; expected some of {list(ANALYZERS)}",
+        )
+    if options.start is not None and options.end is not None and options.end < options.start:
+        raise HTTPException(status_code=400, detail="end must not be before start.")
+
+    cache = get_cache()
+    keys = {name: reanalysis_cache_key(pcapng_id, file_path, options, name) for name in analyzers}
+    results: Dict[str, Any] = {}
+    cached: List[str] = []
+    packet_count = None
+    for name in analyzers:
+        entry = cache.get(REANALYSIS_CACHE, keys[name])
+        if entry is not None:
+            results[name] = entry["result"]
+            packet_count = entry["packet_count"]
+            cached.append(name)
+
+    missing = [name for name in analyzers if name not in results]
+    if missing:
+        data = _RangeInput(file_path, root, pcapng_id, options)
+        products = CaptureProducts({"packets": lambda: data.packets, "table": lambda: data.table})
+        # The table when any analyzer reads it (it may come from the cache),
+        # the Scapy packets only when all of them are Scapy-based
+        on_table = bool(analyzer_products(missing) - {"packets"})
+        packet_count = len(products.get("table" if on_table else "packets"))
+        if not packet_count:
+            raise HTTPException(status_code=404, detail="No packets in the requested range.")
+        # No artifact_dir: per-packet output of a range is returned inline
+        run_options = AnalysisOptions(
+            file_path,
+            options.detail,
+            options.top_k,
+            options.profile,
+            capture_sha256=capture_digest(file_path, root),
+            start=options.start,
+            end=options.end,
+        )
+        try:
+            computed = run_analyzers(
+                {name: ANALYZERS[name] for name in missing}, products, run_options
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        for name, result in computed.items():
+            if isinstance(result, dict):
+                result.pop("artifacts", None)
+            results[name] = result
+            cache.set(
+                REANALYSIS_CACHE,
+                keys[name],
+                {"packet_count": packet_count, "result": result},
+                REANALYSIS_CACHE_TTL_SECONDS,
+            )
+
+    return {
+        "pcapng_id": pcapng_id,
+        "start": options.start,
+        "end": options.end,
+        "packet_count": packet_count,
+        "results": {name: results[name] for name in analyzers},
+        "cached": cached,
+    }
@@ -0,0 +1,21 @@
+from pydantic import BaseModel, Field
+from typing import Any, Dict, List, Optional
+from analysis_storage.schema import DetailLevel
+from analysis_service.heavy_hitters.crud import DEFAULT_TOP_K
+from analysis_service.profile.schema import DEFAULT_PROFILE, AnalysisProfile
+
+class ReanalyzeRequest(BaseModel):
+    start: Optional[float] = None  # Capture time, epoch seconds (as in the analysis event times)
+    end: Optional[float] = None  # Open bounds reach the capture's start / end
+    analyzers: Optional[List[str]] = None  # Keys of the upload analysis; all when omitted
+    detail: DetailLevel = DetailLevel.FLOWS
+    top_k: int = Field(DEFAULT_TOP_K, ge=1)
+    profile: AnalysisProfile = DEFAULT_PROFILE
+
+class ReanalyzeResponse(BaseModel):
+    pcapng_id: str
+    start: Optional[float] = None
+    end: Optional[float] = None
+    packet_count: int  # Packets of the capture inside [start, end]
+    results: Dict[str, Any]
+    cached: List[str]  # Analyzers answered from the cache, without decoding
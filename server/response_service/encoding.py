@@ -0,0 +1,121 @@
+from decimal import Decimal
+from pathlib import Path
+from typing import Any, Iterator
+
+import numpy as np
+import orjson
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel
+
+# NumPy arrays / scalars are serialized natively; int and tuple dict keys are stringified
+ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+STREAM_CHUNK_BYTES = 64 * 1024  # Body bytes handed to the server per write
+STREAM_LIST_ITEMS = 1000  # Lists longer than this are encoded batch by batch
+
+
+def _default(value: Any):
+    """Types orjson does not handle itself."""
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()  # Non-contiguous or object arrays
+    if isinstance(value, BaseModel):
+        return value.model_dump()
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, Path):
+        return str(value)
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+def dumps(value: Any) -> bytes:
+    """
+    Serializes analysis output to JSON bytes, without the per-node
+    jsonable_encoder pass. NaN and infinity become null.
+    """
+    return orjson.dumps(value, default=_default, option=ORJSON_OPTIONS)
+
+
+def dumps_str(value: Any) -> str:
+    """dumps() for APIs that expect text (SQLAlchemy json_serializer)."""
+    return dumps(value).decode()
+
+
+def loads(payload) -> Any:
+    return orjson.loads(payload)
+
+
+def iter_json(value: Any, chunk_bytes: int = STREAM_CHUNK_BYTES) -> Iterator[bytes]:
+    """
+    Encodes `value` incrementally, yielding chunks of about `chunk_bytes`.
+
+    Dicts are walked key by key and long lists / arrays (per-packet records)
+    are encoded STREAM_LIST_ITEMS at a time, so the first chunk is ready
+    long before the whole document has been serialized and no full copy
+    of the body is ever held in memory.
+    """
+    buffer = bytearray()
+    for piece in _iter_pieces(value):
+        buffer += piece
+        if len(buffer) >= chunk_bytes:
+            yield bytes(buffer)
+            buffer.clear()
+    if buffer:
+        yield bytes(buffer)
+
+
+def _iter_pieces(value: Any) -> Iterator[bytes]:
+    if isinstance(value, dict):
+        yield b"{"
+        for index, (key, item) in enumerate(value.items()):
+            if index:
+                yield b","
+            yield dumps(key if isinstance(key, str) else str(key))
+            yield b":"
+            yield from _iter_pieces(item)
+        yield b"}"
+    elif isinstance(value, (list, tuple, np.ndarray)) and len(value) > STREAM_LIST_ITEMS:
+        yield b"["
+        for start in range(0, len(value), STREAM_LIST_ITEMS):
+            if start:
+                yield b","
+            # Encode a batch as one array and drop its brackets
+            yield dumps(value[start:start + STREAM_LIST_ITEMS])[1:-1]
+        yield b"]"
+    else:
+        yield dumps(value)
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSON response rendered with orjson (NumPy aware). Returning it from a
+    route skips FastAPI's jsonable_encoder pass over the content.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+class StreamingJSONResponse(StreamingResponse):
+    """
+    Chunked JSON response for large documents (per-packet detail). The
+    encoder runs in the threadpool while earlier chunks are being sent.
+    """
+
+    def __init__(self, content: Any, status_code: int = 200, headers=None):
+        super().__init__(
+            iter_json(content),
+            status_code=status_code,
+            headers=headers,
+            media_type="application/json",
+        )
+
+
+def json_response(content: Any, stream: bool = False):
+    """FastJSONResponse, or StreamingJSONResponse for per-packet sized content."""
+    if stream:
+        return StreamingJSONResponse(content)
+    return FastJSONResponse(content)
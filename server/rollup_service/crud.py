@@ -0,0 +1,269 @@
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, Optional, Union
+
+import numpy as np
+from scapy.all import PacketList
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from analysis_service.network_analysis.crud import retransmission_mask
+from packet_extract_service.table import (
+    L4_ICMP,
+    L4_TCP,
+    L4_UDP,
+    PacketTable,
+    as_packet_table,
+)
+from .model import TrafficRollup
+
+ROLLUP_RESOLUTIONS = (1, 10, 60)  # Bucket widths in seconds
+DELAY_PERCENTILE = 95
+MAX_CHART_POINTS = 1500  # Auto-picked resolution keeps charts under this many buckets
+
+# Byte columns per transport protocol; everything else is other_bytes
+PROTOCOL_BYTE_COLUMNS = {
+    L4_TCP: "tcp_bytes",
+    L4_UDP: "udp_bytes",
+    L4_ICMP: "icmp_bytes",
+}
+
+COUNT_COLUMNS = (
+    "packet_count",
+    "byte_count",
+    *PROTOCOL_BYTE_COLUMNS.values(),
+    "other_bytes",
+    "retransmissions",
+)
+
+# Rollup columns behind each dashboard chart
+CHART_SERIES = {
+    "traffic": ("packet_count", "byte_count"),
+    "latency": ("delay_mean_ms", "delay_p95_ms"),
+    "jitter": ("jitter_ms",),
+    "protocols": ("tcp_bytes", "udp_bytes", "icmp_bytes", "other_bytes"),
+    "retransmissions": ("retransmissions", "packet_count"),
+}
+
+
+def compute_rollups(
+    packets: Union[PacketList, PacketTable],
+    resolutions: Iterable[int] = ROLLUP_RESOLUTIONS,
+    delays_ms: Optional[np.ndarray] = None,
+    is_retransmission: Optional[np.ndarray] = None,
+) -> Dict[int, Dict[str, np.ndarray]]:
+    """
+    Time-bucketed traffic summaries of a capture at each resolution.
+
+    Per-packet series (inter-packet delay, delay change, retransmission
+    flag, bytes per protocol) are computed once; each resolution is then
+    a bincount over its bucket ids, plus one sort for the delay
+    percentile. Delays follow the congestion analysis: difference to the
+    previous packet in file order, attributed to the later packet.
+    `delays_ms` (np.diff of the timestamps * 1000) and `is_retransmission`
+    (retransmission_mask()) can be passed when already computed.
+
+    Returns:
+        resolution -> column arrays, one entry per non-empty bucket, keyed
+        like the TrafficRollup columns ("bucket" holds the bucket index,
+        bucket_start = bucket * resolution seconds since the epoch)
+    """
+    table = as_packet_table(packets)
+    packet_count = len(table)
+    timestamps = table["timestamp"]
+    sizes = table["size"]
+    l4 = table["l4"]
+
+    file_delays_ms = delays_ms if delays_ms is not None else np.diff(timestamps) * 1000
+    delays_ms = np.full(packet_count, np.nan)
+    delays_ms[1:] = file_delays_ms
+    jitter_ms = np.full(packet_count, np.nan)
+    jitter_ms[2:] = np.abs(np.diff(delays_ms[1:]))
+    if is_retransmission is None:
+        is_retransmission = retransmission_mask(table)
+    protocol_bytes = {
+        column: np.where(l4 == code, sizes, 0)
+        for code, column in PROTOCOL_BYTE_COLUMNS.items()
+    }
+    delay_rows = np.flatnonzero(~np.isnan(delays_ms))
+    jitter_rows = np.flatnonzero(~np.isnan(jitter_ms))
+
+    rollups = {}
+    for resolution in resolutions:
+        buckets, bucket_ids = np.unique(
+            np.floor(timestamps / resolution).astype(np.int64), return_inverse=True
+        )
+        size = len(buckets)
+        columns = {
+            "bucket": buckets,
+            "packet_count": np.bincount(bucket_ids, minlength=size),
+            "byte_count": np.bincount(bucket_ids, weights=sizes, minlength=size),
+        }
+        for column, values in protocol_bytes.items():
+            columns[column] = np.bincount(bucket_ids, weights=values, minlength=size)
+        columns["other_bytes"] = columns["byte_count"] - sum(
+            columns[column] for column in protocol_bytes
+        )
+        columns["delay_mean_ms"] = _group_mean(
+            bucket_ids[delay_rows], delays_ms[delay_rows], size
+        )
+        columns["delay_p95_ms"] = _group_percentile(
+            bucket_ids[delay_rows], delays_ms[delay_rows], DELAY_PERCENTILE, size
+        )
+        columns["jitter_ms"] = _group_mean(
+            bucket_ids[jitter_rows], jitter_ms[jitter_rows], size
+        )
+        columns["retransmissions"] = np.bincount(
+            bucket_ids, weights=is_retransmission, minlength=size
+        )
+        for column in COUNT_COLUMNS:  # Weighted bincounts come back as float
+            columns[column] = np.rint(columns[column]).astype(np.int64)
+        rollups[resolution] = columns
+
+    return rollups
+
+
+def _group_mean(group_ids: np.ndarray, values: np.ndarray, size: int) -> np.ndarray:
+    """Mean of `values` per group, NaN for groups without values."""
+    counts = np.bincount(group_ids, minlength=size)
+    sums = np.bincount(group_ids, weights=values, minlength=size)
+    means = np.full(size, np.nan)
+    np.divide(sums, counts, out=means, where=counts > 0)
+    return means
+
+
+def _group_percentile(
+    group_ids: np.ndarray, values: np.ndarray, q: float, size: int
+) -> np.ndarray:
+    """
+    np.percentile (linear interpolation) of `values` per group, from a
+    single sort by (group, value). NaN for groups without values.
+    """
+    result = np.full(size, np.nan)
+    if len(values) == 0:
+        return result
+
+    sorted_values = values[np.lexsort((values, group_ids))]
+    counts = np.bincount(group_ids, minlength=size)
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    present = counts > 0
+
+    position = starts[present] + (counts[present] - 1) * (q / 100)
+    lower = np.floor(position).astype(np.int64)
+    upper = np.ceil(position).astype(np.int64)
+    result[present] = sorted_values[lower] + (
+        sorted_values[upper] - sorted_values[lower]
+    ) * (position - lower)
+    return result
+
+
+def _rollup_rows(pcapng_id: str, rollups: Dict[int, Dict[str, np.ndarray]]):
+    for resolution, columns in rollups.items():
+        names = [name for name in columns if name != "bucket"]
+        values = [columns[name].tolist() for name in names]
+        for bucket, *row in zip(columns["bucket"].tolist(), *values):
+            record = {
+                "pcapng_id": pcapng_id,
+                "resolution": resolution,
+                "bucket_start": datetime.fromtimestamp(bucket * resolution, tz=timezone.utc),
+            }
+            for name, value in zip(names, row):
+                record[name] = None if value != value else value  # NaN -> NULL
+            yield record
+
+
+def store_rollups(
+    db: Session, pcapng_id: str, rollups: Dict[int, Dict[str, np.ndarray]]
+) -> int:
+    """Replaces the stored rollups of a capture. Returns the number of rows."""
+    start = time.time()
+    rows = list(_rollup_rows(str(pcapng_id), rollups))
+    db.execute(delete(TrafficRollup).where(TrafficRollup.pcapng_id == str(pcapng_id)))
+    if rows:
+        db.execute(insert(TrafficRollup), rows)
+    db.commit()
+    print(f"Stored {len(rows)} rollup rows in {time.time() - start:.2f} seconds")
+    return len(rows)
+
+
+def _time_range(query, start: Optional[datetime], end: Optional[datetime]):
+    if start is not None:
+        query = query.where(TrafficRollup.bucket_start >= start)
+    if end is not None:
+        query = query.where(TrafficRollup.bucket_start < end)
+    return query
+
+
+async def _pick_resolution(
+    db: AsyncSession, pcapng_id: str, start: Optional[datetime], end: Optional[datetime]
+) -> Optional[int]:
+    """Finest resolution with at most MAX_CHART_POINTS buckets in range."""
+    query = _time_range(
+        select(TrafficRollup.resolution, func.count())
+        .where(TrafficRollup.pcapng_id == pcapng_id)
+        .group_by(TrafficRollup.resolution),
+        start,
+        end,
+    )
+    counts = dict((await db.execute(query)).all())
+    if not counts:
+        return None
+    for resolution in sorted(counts):
+        if counts[resolution] <= MAX_CHART_POINTS:
+            return resolution
+    return max(counts)
+
+
+async def get_chart_async(
+    db: AsyncSession,
+    pcapng_id: str,
+    chart: str,
+    resolution: Optional[int] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+) -> Optional[Dict[str, Any]]:
+    """
+    Columnar series for one dashboard chart, read from the rollups only.
+
+    Without `resolution` the finest one that fits MAX_CHART_POINTS is used.
+
+    Returns:
+        {"chart", "resolution", "bucket_start": [...], <series>: [...]},
+        or None if the capture has no rollups in range
+
+    Raises:
+        ValueError: On an unknown chart or resolution
+    """
+    if chart not in CHART_SERIES:
+        raise ValueError(f"Unknown chart: {chart}")
+    if resolution is not None and resolution not in ROLLUP_RESOLUTIONS:
+        raise ValueError(f"Resolution must be one of {list(ROLLUP_RESOLUTIONS)}")
+
+    pcapng_id = str(pcapng_id)
+    if resolution is None:
+        resolution = await _pick_resolution(db, pcapng_id, start, end)
+        if resolution is None:
+            return None
+
+    series = CHART_SERIES[chart]
+    query = _time_range(
+        select(
+            TrafficRollup.bucket_start,
+            *(getattr(TrafficRollup, column) for column in series),
+        ).where(
+            TrafficRollup.pcapng_id == pcapng_id,
+            TrafficRollup.resolution == resolution,
+        ),
+        start,
+        end,
+    ).order_by(TrafficRollup.bucket_start)
+    rows = (await db.execute(query)).all()
+    if not rows:
+        return None
+
+    columns = list(zip(*rows))
+    result = {"chart": chart, "resolution": resolution, "bucket_start": list(columns[0])}
+    for column, values in zip(series, columns[1:]):
+        result[column] = list(values)
+    return result
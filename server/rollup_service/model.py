@@ -0,0 +1,43 @@
+from sqlalchemy import (
+    BigInteger,
+    Column,
+    DateTime,
+    Float,
+    ForeignKey,
+    Integer,
+    PrimaryKeyConstraint,
+    SmallInteger,
+    String,
+)
+from database import Base
+
+
+class TrafficRollup(Base):
+    """
+    Time-bucketed traffic summary of a capture, one row per
+    (capture, resolution, bucket). Chart endpoints read only this table.
+
+    Buckets are aligned to the epoch (bucket_start is a multiple of the
+    resolution), so 1 s / 10 s / 60 s rows of the same capture line up.
+    Delay columns are single precision and NULL for buckets without a
+    delay sample (the capture's first packet).
+    """
+
+    __tablename__ = "traffic_rollups"
+    __table_args__ = (
+        PrimaryKeyConstraint("pcapng_id", "resolution", "bucket_start"),
+    )
+
+    pcapng_id = Column(String, ForeignKey("pcapng_storage.id"), nullable=False)  # Links to uploaded file
+    resolution = Column(SmallInteger, nullable=False)  # Bucket width in seconds
+    bucket_start = Column(DateTime(timezone=True), nullable=False)
+    packet_count = Column(Integer, nullable=False)
+    byte_count = Column(BigInteger, nullable=False)
+    tcp_bytes = Column(BigInteger, nullable=False)
+    udp_bytes = Column(BigInteger, nullable=False)
+    icmp_bytes = Column(BigInteger, nullable=False)
+    other_bytes = Column(BigInteger, nullable=False)
+    delay_mean_ms = Column(Float(precision=24), nullable=True)  # Inter-packet delay, file order
+    delay_p95_ms = Column(Float(precision=24), nullable=True)
+    jitter_ms = Column(Float(precision=24), nullable=True)  # Mean |change| between consecutive delays
+    retransmissions = Column(Integer, nullable=False)
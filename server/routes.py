@@ -6,140 +6,798 @@ from fastapi import (
     HTTPException,
     BackgroundTasks,
     Form,
+    Header,
+    Query,
+    Request,
 )
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from scapy.all import rdpcap
-import shutil
+import anyio
 from pathlib import Path
-from database import get_db
-from analysis_service.delay_categorization.crud import analyze_packet_delays
+from database import AsyncSessionLocal, SessionLocal, get_async_db, get_db
 from storage_service import crud, schema
 from scapy.all import PcapReader
-from analysis_service.tcp_analysis.analysis import analyze_tcp_window_size
-from analysis_service.network_analysis.crud import analyze_network_congestion
-from analysis_service.pattern_detection.crud import advanced_pattern_detection
-from analysis_service.pattern_anomalies.crud import detect_network_patterns
-from latency_analysis_service.crud import calculate_average_latency
-from packet_extract_service.crud import extract_and_store_packets_optimized
-from analysis_storage.schema import AnalysisResults
-from analysis_storage.crud import create_analysis_result, get_analysis_by_pcapng
-from storage_service.crud import get_latest_pcapng_files
+from analysis_service.heavy_hitters.crud import DEFAULT_TOP_K
+from analysis_service.network_analysis.crud import read_packet_flow
+from analysis_service.pipeline.products import CaptureProducts
+from analysis_service.pipeline.registry import (
+    ANALYZERS,
+    ROLLUP_ANALYZER,
+    AnalysisOptions,
+    run_analyzers,
+)
+from analysis_service.profile.schema import DEFAULT_PROFILE, AnalysisProfile
+from packet_extract_service.crud import (
+    MAX_PACKET_PAGE_SIZE,
+    PACKET_PAGE_SIZE,
+    copy_packet_table,
+    delete_capture_packets,
+    iter_packet_page_json,
+    query_packets,
+    read_capture,
+)
+from analysis_storage.schema import AnalysisResults, DetailLevel
+from analysis_storage.crud import (
+    delete_analysis_results_async,
+    create_analysis_result_async,
+    get_analysis_by_pcapng_async,
+)
+from storage_service.crud import get_latest_pcapng_files_async
+from capture_scan_service.crud import scan_capture_headers
+from capture_scan_service.index import build_capture_index
+from cache_service.cache import get_cache
+from cache_service.result_cache import capture_digest, get_result_cache
+from cache_service.table_cache import get_table_cache, table_cache_key
+from artifact_service.crud import UPLOAD_DIR, artifact_root
+from response_service.encoding import FastJSONResponse, json_response
+from rollup_service.crud import get_chart_async, store_rollups
+from live_capture_service.crud import (
+    LIVE_WINDOW_PAGE_SIZE,
+    get_live_sessions_async,
+    get_live_windows_async,
+)
+from live_capture_service.schema import LiveSessionResponse, LiveWindowResponse
+from upload_service.crud import (
+    abort_upload,
+    complete_upload,
+    create_upload_session_async,
+    get_upload_session_async,
+    set_upload_capture_async,
+    upload_session_dict,
+    write_upload_range,
+)
+from upload_service.schema import UploadComplete, UploadSessionCreate, UploadSessionResponse
+from progress_service.hub import ProgressChannel, get_progress_hub, iter_sse
+from reanalysis_service.crud import reanalyze_capture
+from reanalysis_service.schema import ReanalyzeRequest, ReanalyzeResponse
+from job_service.crud import (
+    FINISHED_STATUSES,
+    JOB_QUEUE_ENABLED,
+    enqueue_job_async,
+    get_capture_job_async,
+    get_job_async,
+    get_job_metrics_async,
+    job_dict,
+    start_following,
+)
+from job_service.schema import JobMetrics, JobResponse
 import time
+from datetime import datetime
+from typing import Optional
 
 router = APIRouter(prefix="/storage", tags=["Storage"])
 
-UPLOAD_DIR = Path("uploaded_pcapng_files")
-UPLOAD_DIR.mkdir(exist_ok=True)
+UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
+
+ANALYZE_CAPTURE_JOB = "analyze_capture"
+
+# Wall-clock cap for the header-only "first look" scan (seconds)
+FIRST_LOOK_TIME_BUDGET = 2.0
+
+UPLOAD_READ_BYTES = 1024 * 1024  # Read size while saving a single-request upload
 
 
 @router.post("/upload/")
 async def upload_pcapng(
     file: UploadFile = File(...),
     user_id: str = Form(...),
-    db: Session = Depends(get_db),
+    detail: DetailLevel = Form(DetailLevel.FLOWS),
+    top_k: int = Form(DEFAULT_TOP_K, ge=1),
+    background: bool = Form(False),
+    profile: Optional[str] = Form(None),
+    db: AsyncSession = Depends(get_async_db),
     background_tasks: BackgroundTasks = BackgroundTasks(),
 ):
-    """Uploads a PCAPNG file, extracts packets, runs analysis, and stores results."""
+    """Uploads a PCAPNG file, extracts packets, runs analysis, and stores results.
+
+    `detail` controls how much per-flow / per-packet output is computed and
+    stored; per-packet records are only built for detail=packets. `top_k`
+    bounds the per-flow, per-host and per-port tables in the analysis.
+    `profile` is an AnalysisProfile as JSON (analyzer thresholds; fields
+    left out keep their defaults).
+
+    Stage progress and each analyzer's result are published on
+    GET /storage/{pcapng_id}/progress as they happen. With background=true
+    the upload answers 202 right after the first look and decoding,
+    analysis and storage continue behind it; follow the progress stream
+    for the results. With JOB_QUEUE_ENABLED they run as a durable job in a
+    worker process (see job_service.worker) instead of this one.
+
+    Database calls are async; file I/O, decoding and analysis run in the
+    threadpool so an upload never blocks other requests on the event loop.
+    """
+    try:
+        analysis_profile = (
+            AnalysisProfile.model_validate_json(profile) if profile else DEFAULT_PROFILE
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid profile: {e}")
+
     file_path = UPLOAD_DIR / file.filename
-    with file_path.open("wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
+    await _save_upload(file, file_path)
 
     # Store file metadata in DB
     file_data = schema.PcapngFileCreate(user_id=user_id, filename=file.filename)
-    stored_file = crud.create_pcapng_file(db, file_data)
+    stored_file = await crud.create_pcapng_file_async(db, file_data)
+    return await process_saved_capture(
+        file_path,
+        stored_file["id"],
+        detail,
+        top_k,
+        analysis_profile,
+        background,
+        background_tasks,
+    )
+
+
+async def process_saved_capture(
+    file_path: Path,
+    pcapng_id: str,
+    detail: DetailLevel,
+    top_k: int,
+    profile: AnalysisProfile,
+    background: bool,
+    background_tasks: BackgroundTasks,
+    packets=None,
+):
+    """
+    First look, analysis and storage of a capture saved under UPLOAD_DIR
+    (see upload_pcapng). `packets` skips decoding when the capture was
+    already decoded while it was being received.
+    """
+    progress = get_progress_hub().open(pcapng_id)
+    progress.stage("upload", "finished", bytes=file_path.stat().st_size)
+
+    # Header-only scan first: timing stats without decoding any layer
+    try:
+        first_look = await run_in_threadpool(
+            scan_capture_headers, file_path, FIRST_LOOK_TIME_BUDGET
+        )
+    except ValueError as e:
+        progress.fail(str(e))
+        raise HTTPException(status_code=400, detail=str(e))
+    progress.publish("first_look", first_look)
+
+    if background:
+        response = {
+            "message": "PCAPNG file uploaded, analysis running",
+            "pcapng_id": pcapng_id,
+            "first_look": first_look,
+            "progress_url": f"{router.prefix}/{pcapng_id}/progress",
+        }
+        if JOB_QUEUE_ENABLED:
+            async with AsyncSessionLocal() as db:
+                job = await enqueue_job_async(
+                    db,
+                    ANALYZE_CAPTURE_JOB,
+                    {
+                        "pcapng_id": pcapng_id,
+                        "filename": file_path.name,
+                        "detail": DetailLevel(detail).value,
+                        "top_k": top_k,
+                        "profile": profile.model_dump(),
+                    },
+                    pcapng_id,
+                )
+            start_following(progress, job.id)
+            response["job_id"] = job.id
+            response["job_url"] = f"{router.prefix}/jobs/{job.id}"
+        else:
+            background_tasks.add_task(
+                process_capture, file_path, pcapng_id, detail, top_k, profile, progress, packets
+            )
+        return FastJSONResponse(response, status_code=202)
 
     try:
-        packets = rdpcap(str(file_path))  # Extract packets using Scapy
+        packet_table, analysis, rollups = await analyze_capture(
+            file_path, pcapng_id, detail, top_k, profile, progress, packets
+        )
+    except HTTPException as e:
+        progress.fail(e.detail)
+        raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error reading PCAPNG file: {e}")
+        progress.fail(str(e))
+        raise
+
+    # Stored by a background task, so the response does not wait for the DB
+    analysis_results = build_analysis_row(pcapng_id, analysis)
+    background_tasks.add_task(
+        store_capture_results, file_path, analysis_results, packet_table, rollups, progress
+    )
+
+    return json_response(
+        {
+            "message": "PCAPNG file uploaded successfully",
+            "pcapng_id": pcapng_id,
+            "first_look": first_look,
+            "analysis_results": analysis,
+        },
+        stream=detail.includes(DetailLevel.PACKETS),
+    )
+
+
+async def _save_upload(file: UploadFile, file_path: Path):
+    async with await anyio.open_file(file_path, "wb") as buffer:
+        while chunk := await file.read(UPLOAD_READ_BYTES):
+            await buffer.write(chunk)
+
+
+@router.post("/uploads/", status_code=201, response_model=UploadSessionResponse)
+async def create_upload(
+    data: UploadSessionCreate, db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Starts a chunked, resumable upload. Send the capture with
+    PUT /storage/uploads/{upload_id}?offset=N in order (about `chunk_size`
+    bytes each), then POST /storage/uploads/{upload_id}/complete (or DELETE
+    /storage/uploads/{upload_id} to abort).
+    """
+    session = await create_upload_session_async(db, data, UPLOAD_DIR)
+    return upload_session_dict(session)
+
+
+@router.get("/uploads/{upload_id}", response_model=UploadSessionResponse)
+async def get_upload(upload_id: str, db: AsyncSession = Depends(get_async_db)):
+    """Upload status; `received_bytes` is the offset to resume from."""
+    return upload_session_dict(await get_upload_session_async(db, upload_id))
+
+
+@router.put("/uploads/{upload_id}", response_model=UploadSessionResponse)
+async def put_upload_chunk(
+    upload_id: str,
+    request: Request,
+    offset: int = Query(..., ge=0),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    Appends the raw request body at `offset`. Re-sending bytes the server
+    already has is harmless; a gap is refused with 409. The received prefix
+    is decoded in the background while later chunks arrive.
+    """
+    session = await get_upload_session_async(db, upload_id)
+    session = await write_upload_range(db, session, offset, request.stream(), UPLOAD_DIR)
+    return upload_session_dict(session)
+
+
+@router.delete("/uploads/{upload_id}", response_model=UploadSessionResponse)
+async def delete_upload(upload_id: str, db: AsyncSession = Depends(get_async_db)):
+    """Aborts an upload that is still receiving and deletes its received bytes."""
+    session = await get_upload_session_async(db, upload_id)
+    session = await abort_upload(db, session, UPLOAD_DIR)
+    return upload_session_dict(session)
+
+
+@router.post("/uploads/{upload_id}/complete")
+async def complete_chunked_upload(
+    upload_id: str,
+    options: UploadComplete,
+    db: AsyncSession = Depends(get_async_db),
+    background_tasks: BackgroundTasks = BackgroundTasks(),
+):
+    """
+    Verifies the received bytes (against `sha256` when given), stores the
+    capture and analyzes it exactly like POST /storage/upload/.
+    """
+    session = await get_upload_session_async(db, upload_id)
+    file_path = UPLOAD_DIR / session.filename
+    packets = await complete_upload(db, session, options.sha256, UPLOAD_DIR, file_path)
+
+    file_data = schema.PcapngFileCreate(user_id=session.user_id, filename=session.filename)
+    stored_file = await crud.create_pcapng_file_async(db, file_data)
+    await set_upload_capture_async(db, session, stored_file["id"])
+    return await process_saved_capture(
+        file_path,
+        stored_file["id"],
+        options.detail,
+        options.top_k,
+        options.profile,
+        options.background,
+        background_tasks,
+        packets,
+    )
+
+
+async def analyze_capture(
+    file_path: Path,
+    pcapng_id: str,
+    detail: DetailLevel,
+    top_k: int,
+    profile: AnalysisProfile,
+    progress: ProgressChannel,
+    packets=None,
+):
+    """
+    Decodes a saved capture (unless `packets` is given) and runs the
+    analyzers in the threadpool.
+    """
+    if packets is None:
+        total_bytes = file_path.stat().st_size
+        progress.stage("decode", "started", total_bytes=total_bytes)
+
+        def on_decode(decoded: int, bytes_read: int):
+            progress.stage(
+                "decode", "progress", packets=decoded, bytes=bytes_read, total_bytes=total_bytes
+            )
+
+        try:
+            packets = await run_in_threadpool(read_capture, file_path, on_decode)  # Extract packets using Scapy
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Error reading PCAPNG file: {e}")
+    progress.stage("decode", "finished", packets=len(packets))
+
+    return await run_in_threadpool(
+        run_capture_analysis, file_path, packets, pcapng_id, detail, top_k, progress, profile
+    )
+
+
+def build_analysis_row(pcapng_id: str, analysis: dict) -> AnalysisResults:
+    """Stored row of an analysis (built by the analyzers, so not re-validated)."""
+    return AnalysisResults.model_construct(
+        pcapng_id=pcapng_id,
+        average_latency=analysis["avg_latency"],
+        pattern_analysis=analysis["pattern_analysis"],
+        mqtt_analysis=analysis["mqtt_analysis"],
+        congestion_analysis=analysis["congestion_analysis"],
+        tcp_window_analysis=analysis["tcp_window_analysis"],
+        delay_analysis=analysis["delay_categorization"],
+        artifacts=analysis.pop("artifacts"),
+    )
+
+
+def run_capture_analysis(
+    file_path: Path,
+    packets,
+    pcapng_id: str,
+    detail: DetailLevel,
+    top_k: int,
+    progress: Optional[ProgressChannel] = None,
+    profile: AnalysisProfile = DEFAULT_PROFILE,
+):
+    """
+    Runs every analyzer over a decoded capture (CPU-bound, call from a
+    worker thread), sharing the intermediate products (packet table,
+    deltas, flows) between them. Each analyzer's result is published on
+    `progress` as soon as it is ready; `profile` holds the analyzers'
+    thresholds.
+
+    Returns:
+        (packet_table, analysis results keyed as in the upload response
+        plus "artifacts" for the stored row, time-bucketed rollups)
+    """
+    products = CaptureProducts({"packets": lambda: packets})
+    root = artifact_root(UPLOAD_DIR, pcapng_id)
+    options = AnalysisOptions(
+        file_path, detail, top_k, profile, root, capture_sha256=capture_digest(file_path, root)
+    )
+    artifacts = {}
+
+    def publish(key: str, result):
+        if key not in ANALYZERS:
+            return
+        if key == "congestion_analysis":
+            # Per-packet output lives in artifact files, only referenced from the row
+            artifacts[key] = result.pop("artifacts", None)
+        if progress is not None:
+            progress.result(key, result)
 
     # Run analysis functions
     try:
-        start = time.time()
-        avg_latency = calculate_average_latency(file_path, packets)
-        end = time.time()
-        print("latency")
-        print(end - start)
-        start = time.time()
-        pattern_analysis = advanced_pattern_detection(file_path, packets)
-        end = time.time()
-        print("pattern_analysis")
-        print(end - start)
-        start = time.time()
-        mqtt_analysis = detect_network_patterns(file_path, packets)
-        end = time.time()
-        print("mqtt")
-        print(end - start)
-        start = time.time()
-        congestion_analysis = analyze_network_congestion(file_path, packets)
-        end = time.time()
-        print("conjestion")
-        print(end - start)
-        start = time.time()
-        tcp_window_analysis = analyze_tcp_window_size(file_path, packets)
-        end = time.time()
-        print("tcp")
-        print(end - start)
-        start = time.time()
-        delay_categorization = analyze_packet_delays(file_path, packets)
-        end = time.time()
-        print("delay_categorization")
-        print(end - start)
+        analysis = run_analyzers(
+            {**ANALYZERS, "rollups": ROLLUP_ANALYZER}, products, options, progress, publish
+        )
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
-    # Store analysis results in DB
-    analysis_results = AnalysisResults(
-        pcapng_id=stored_file["id"],
-        average_latency=avg_latency,
-        pattern_analysis=pattern_analysis,
-        mqtt_analysis=mqtt_analysis,
-        congestion_analysis=congestion_analysis,
-        tcp_window_analysis=tcp_window_analysis,
-        delay_analysis=delay_categorization,
-    )
+    rollups = analysis.pop("rollups")
+    analysis["artifacts"] = artifacts["congestion_analysis"]
+    return products.get("table"), analysis, rollups
 
-    background_tasks.add_task(create_analysis_result, db, analysis_results)
 
-    # Background Task: Store extracted packets in DB
-    background_tasks.add_task(
-        extract_and_store_packets_optimized,
+async def process_capture(
+    file_path: Path,
+    pcapng_id: str,
+    detail: DetailLevel,
+    top_k: int,
+    profile: AnalysisProfile,
+    progress: ProgressChannel,
+    packets=None,
+):
+    """Background upload: decode, analyze and store, reporting on `progress`."""
+    try:
+        packet_table, analysis, rollups = await analyze_capture(
+            file_path, pcapng_id, detail, top_k, profile, progress, packets
+        )
+        await store_capture_results(
+            file_path, build_analysis_row(pcapng_id, analysis), packet_table, rollups, progress
+        )
+    except HTTPException as e:
+        progress.fail(e.detail)
+    except Exception as e:
+        progress.fail(str(e))
+        raise
+
+
+async def process_capture_job(payload: dict, attempts: int):
+    """
+    Handler of ANALYZE_CAPTURE_JOB jobs (see job_service.worker): decodes,
+    analyzes and stores a capture like process_capture, raising on failure
+    so the job is retried. A retry first removes what an interrupted
+    attempt may have stored.
+    """
+    pcapng_id = payload["pcapng_id"]
+    file_path = UPLOAD_DIR / payload["filename"]
+    if attempts > 1:
+        async with AsyncSessionLocal() as db:
+            await delete_analysis_results_async(db, pcapng_id)
+        await run_in_threadpool(clear_capture_packets, pcapng_id)
+
+    # Nobody subscribes in a worker process; the API follows the job's status
+    progress = ProgressChannel(pcapng_id)
+    packet_table, analysis, rollups = await analyze_capture(
         file_path,
-        stored_file["id"],
-        db,
-        3000,
+        pcapng_id,
+        DetailLevel(payload["detail"]),
+        payload["top_k"],
+        AnalysisProfile.model_validate(payload["profile"]),
+        progress,
+    )
+    await store_capture_results(
+        file_path, build_analysis_row(pcapng_id, analysis), packet_table, rollups, progress
     )
 
-    return {
-        "message": "PCAPNG file uploaded successfully",
-        "pcapng_id": stored_file["id"],
-        "analysis_results": {
-            "avg_latency": avg_latency,
-            "pattern_analysis": pattern_analysis,
-            "mqtt_analysis": mqtt_analysis,
-            "congestion_analysis": congestion_analysis,
-            "tcp_window_analysis": tcp_window_analysis,
-            "delay_categorization": delay_categorization,
-        },
-    }
+
+async def store_capture_results(
+    file_path: Path,
+    analysis_results: AnalysisResults,
+    packet_table,
+    rollups,
+    progress: ProgressChannel,
+):
+    """
+    Stores the analysis row, packets, rollups, the capture's packet index
+    and its decoded table (for re-analysis), then completes the progress
+    stream.
+    """
+    pcapng_id = analysis_results.pcapng_id
+    try:
+        progress.stage("store", "started")
+        await store_analysis_result(analysis_results)
+        packet_load = await run_in_threadpool(store_packets, packet_table, pcapng_id)
+        await run_in_threadpool(store_capture_rollups, rollups, pcapng_id)
+        await run_in_threadpool(store_capture_index, file_path, pcapng_id)
+        await run_in_threadpool(store_capture_table, file_path, packet_table, pcapng_id)
+    except Exception as e:
+        progress.fail(f"Error storing results: {e}")
+        raise
+    # Packet load throughput (COPY on PostgreSQL), as reported by copy_packet_table
+    progress.stage(
+        "store",
+        "finished",
+        packets=packet_load["rows"],
+        load_method=packet_load["method"],
+        load_seconds=packet_load["seconds"],
+        load_rows_per_second=packet_load["rows_per_second"],
+    )
+    progress.complete()
+
+
+async def store_analysis_result(analysis_results: AnalysisResults):
+    # Own session: the request-scoped one is closed before background tasks run
+    async with AsyncSessionLocal() as db:
+        await create_analysis_result_async(db, analysis_results)
+
+
+def store_packets(packet_table, pcapng_id: str) -> dict:
+    """Loads the capture's packet_metadata rows; returns copy_packet_table's load statistics."""
+    db = SessionLocal()
+    try:
+        return copy_packet_table(db, packet_table, pcapng_id)
+    finally:
+        db.close()
+
+
+def clear_capture_packets(pcapng_id: str):
+    db = SessionLocal()
+    try:
+        delete_capture_packets(db, pcapng_id)
+    finally:
+        db.close()
+
+
+def store_capture_rollups(rollups, pcapng_id: str):
+    db = SessionLocal()
+    try:
+        store_rollups(db, pcapng_id, rollups)
+    finally:
+        db.close()
+
+
+def store_capture_index(file_path: Path, pcapng_id: str):
+    start = time.time()
+    manifest = build_capture_index(file_path, artifact_root(UPLOAD_DIR, pcapng_id))
+    print(f"Indexed {manifest['rows']} packet blocks in {time.time() - start:.2f} seconds")
+
+
+def store_capture_table(file_path: Path, packet_table, pcapng_id: str):
+    start = time.time()
+    get_table_cache().put(table_cache_key(pcapng_id, file_path), packet_table)
+    print(f"Cached the decoded table in {time.time() - start:.2f} seconds")
+
+
+@router.get("/first-look/{pcapng_id}")
+async def get_first_look(pcapng_id: str, db: AsyncSession = Depends(get_async_db)):
+    """Record-header-only statistics (rates, duration, inter-arrival) for a stored capture."""
+    stored_file = await crud.get_pcapng_file_async(db, pcapng_id)
+    file_path = UPLOAD_DIR / stored_file.filename
+    if not file_path.exists():
+        raise HTTPException(status_code=404, detail="Capture file is no longer stored.")
+    try:
+        return await run_in_threadpool(
+            scan_capture_headers, file_path, FIRST_LOOK_TIME_BUDGET
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/{pcapng_id}/progress")
+async def stream_progress(
+    pcapng_id: str,
+    last_event_id: Optional[int] = Header(None),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    Server-sent events of an upload's processing: `progress` (stage
+    started / progress / finished with bytes and packet counts),
+    `first_look`, one `result` per analyzer as soon as it finishes, and a
+    final `complete` or `failed`. Events already published are replayed,
+    from after Last-Event-ID when the browser reconnects.
+    """
+    channel = get_progress_hub().get(pcapng_id)
+    if channel is None:
+        await crud.get_pcapng_file_async(db, pcapng_id)
+        job = await get_capture_job_async(db, pcapng_id)
+        if job is not None and job.status not in FINISHED_STATUSES:
+            # Queued by another API process: follow the job from here
+            channel = get_progress_hub().open(pcapng_id)
+            start_following(channel, job.id)
+        else:
+            # Processed before this worker started, or expired: already complete
+            channel = ProgressChannel(pcapng_id)
+            channel.complete()
+    return StreamingResponse(
+        iter_sse(channel, last_event_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.post("/{pcapng_id}/reanalyze", response_model=ReanalyzeResponse)
+async def reanalyze_capture_range(
+    pcapng_id: str,
+    options: ReanalyzeRequest,
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    Re-runs analyzers over the [start, end] capture-time window of a stored
+    capture, e.g. to zoom into a congestion event with other parameters.
+
+    Only the packet-index blocks covering the window are decoded, and
+    results are cached per (range, analyzer, parameters); the stored
+    analysis is left unchanged.
+    """
+    stored_file = await crud.get_pcapng_file_async(db, pcapng_id)
+    file_path = UPLOAD_DIR / stored_file.filename
+    if not file_path.exists():
+        raise HTTPException(status_code=404, detail="Capture file is no longer stored.")
+    result = await run_in_threadpool(
+        reanalyze_capture, file_path, artifact_root(UPLOAD_DIR, pcapng_id), pcapng_id, options
+    )
+    return json_response(result, stream=DetailLevel(options.detail).includes(DetailLevel.PACKETS))
+
+
+@router.get("/{pcapng_id}/packets")
+def get_packets(
+    pcapng_id: str,
+    after: int = Query(0, ge=0),
+    limit: int = Query(PACKET_PAGE_SIZE, ge=1, le=MAX_PACKET_PAGE_SIZE),
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    ip: Optional[str] = None,
+    port: Optional[int] = Query(None, ge=0, le=65535),
+    protocol: Optional[str] = None,
+    db: Session = Depends(get_db),
+):
+    """
+    Streams one page of a capture's stored packets, filtered by time range,
+    IP, port and protocol. Pass the returned `next_after` as `after` to
+    fetch the next page.
+    """
+    crud.get_pcapng_file(db, pcapng_id)
+    try:
+        query = query_packets(
+            pcapng_id, after, limit, start, end, ip, port, protocol
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    def stream_page():
+        # Own session: the request-scoped one is closed before the body streams
+        page_db = SessionLocal()
+        try:
+            yield from iter_packet_page_json(page_db, query, limit)
+        finally:
+            page_db.close()
+
+    return StreamingResponse(stream_page(), media_type="application/json")
+
+
+@router.delete("/{pcapng_id}/packets")
+def delete_packets(pcapng_id: str, db: Session = Depends(get_db)):
+    """Deletes the stored per-packet rows of a capture (drops its partition)."""
+    crud.get_pcapng_file(db, pcapng_id)
+    delete_capture_packets(db, pcapng_id)
+    return {"message": "Packets deleted", "pcapng_id": pcapng_id}
+
+
+@router.get("/{pcapng_id}/charts/{chart}")
+async def get_chart(
+    pcapng_id: str,
+    chart: str,
+    resolution: Optional[int] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    Time series for a dashboard chart (traffic, latency, jitter, protocols,
+    retransmissions), read from the capture's precomputed rollups.
+
+    `resolution` is the bucket width in seconds (1, 10 or 60); by default
+    the finest one that keeps the chart to a plottable number of points.
+    """
+    try:
+        series = await get_chart_async(db, pcapng_id, chart, resolution, start, end)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if series is None:
+        raise HTTPException(status_code=404, detail="No rollups found for this capture.")
+    return json_response(series)
 
 
 @router.get("/analysis/{pcapng_id}")
-def get_analysis_results(pcapng_id: str, db: Session = Depends(get_db)):
-    """Fetches analysis results for a specific PCAPNG file."""
-    results = get_analysis_by_pcapng(db, pcapng_id)
+async def get_analysis_results(
+    pcapng_id: str,
+    detail: DetailLevel = DetailLevel.FLOWS,
+    fields: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    Fetches analysis results for a specific PCAPNG file at the given detail level.
+
+    `fields` limits the response to comma-separated columns or dotted JSON
+    paths, e.g. `congestion_analysis.congestion_score,delay_analysis.summary`.
+    """
+    try:
+        results = await get_analysis_by_pcapng_async(db, pcapng_id, detail, fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     if not results:
         raise HTTPException(status_code=404, detail="No analysis results found.")
-    return results
+    return json_response(results, stream=DetailLevel(detail).includes(DetailLevel.PACKETS))
 
 
-@router.get("/", response_model=list[schema.PcapngFileResponse])
-async def list_pcapng_files(db: Session = Depends(get_db)):
-    """Lists all uploaded PCAPNG files."""
-    return crud.get_pcapng_files(db)
+@router.get("/analysis/{pcapng_id}/artifacts/packet_flow")
+def get_packet_flow_artifact(
+    pcapng_id: str,
+    start: int = Query(0, ge=0),
+    stop: Optional[int] = Query(None, ge=0),
+    flag: Optional[str] = None,
+):
+    """
+    Slices per-packet congestion records out of the capture's memory-mapped
+    packet_flow artifact. `flag` (retransmission, bulk_upload, broker,
+    device_to_broker) restricts the rows to matching packets first.
+    """
+    try:
+        records = read_packet_flow(
+            artifact_root(UPLOAD_DIR, pcapng_id), start, stop, flag
+        )
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="No packet_flow artifact stored.")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return json_response(records, stream=True)
+
+
+@router.get("/", response_model=schema.PcapngFilePage)
+async def list_pcapng_files(
+    user_id: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(crud.CAPTURE_PAGE_SIZE, ge=1, le=crud.MAX_CAPTURE_PAGE_SIZE),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    Lists uploaded PCAPNG files, newest first, optionally for one user.
+    Pass the returned `next_cursor` as `cursor` to fetch the next page.
+    """
+    try:
+        return await crud.get_pcapng_file_page_async(db, user_id, cursor, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/jobs/metrics", response_model=JobMetrics)
+async def get_job_metrics(db: AsyncSession = Depends(get_async_db)):
+    """Job queue depth, retries, expired leases and throughput over the last 1 / 5 / 15 minutes."""
+    return await get_job_metrics_async(db)
+
+
+@router.get("/jobs/{job_id}", response_model=JobResponse)
+async def get_job(job_id: str, db: AsyncSession = Depends(get_async_db)):
+    """Status of a background job, e.g. the analysis of an upload made with background=true."""
+    return job_dict(await get_job_async(db, job_id))
+
+
+@router.get("/cache/stats")
+def get_cache_stats():
+    """Hit/miss counters of the analysis, latest-capture, decoded table and result caches."""
+    return {
+        **get_cache().get_stats(),
+        "tables": get_table_cache().get_stats(),
+        "results": get_result_cache().get_stats(),
+    }
+
+
+@router.get("/live/sessions", response_model=list[LiveSessionResponse])
+async def list_live_sessions(
+    user_id: Optional[str] = None, db: AsyncSession = Depends(get_async_db)
+):
+    """Live ingestion sessions (see live_capture_service.ingest), newest first."""
+    return await get_live_sessions_async(db, user_id)
+
+
+@router.get(
+    "/live/sessions/{session_id}/windows", response_model=list[LiveWindowResponse]
+)
+async def get_live_windows(
+    session_id: str,
+    after: Optional[datetime] = None,
+    limit: int = Query(LIVE_WINDOW_PAGE_SIZE, ge=1, le=LIVE_WINDOW_PAGE_SIZE),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    Rolling window results of a live session in time order. Poll with
+    `after` set to the last `window_start` received.
+    """
+    return await get_live_windows_async(db, session_id, after, limit)
 
 
 @router.get("/latest/{user_id}")
-def get_latest_pcapng(user_id: str, db: Session = Depends(get_db)):
+async def get_latest_pcapng(user_id: str, db: AsyncSession = Depends(get_async_db)):
     """Fetches the latest uploaded PCAPNG file for a specific user."""
-    return get_latest_pcapng_files(user_id, db)
+    # Full stored row, per-packet sections included
+    return json_response(
+        await get_latest_pcapng_files_async(user_id, db), stream=True
+    )
@@ -1,42 +1,162 @@
+import base64
+import json
+from typing import Optional
 from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from . import model, schema
 from datetime import datetime
 from .model import PcapngFile
 from analysis_storage.model import AnalysisResultsDB
+from analysis_storage.crud import LATEST_CACHE, analysis_to_dict
+from cache_service.cache import cache_get_async, cache_invalidate_async, get_cache
 
-def create_pcapng_file(db: Session, file_data: schema.PcapngFileCreate):
-    new_file = model.PcapngFile(
+CAPTURE_PAGE_SIZE = 100
+MAX_CAPTURE_PAGE_SIZE = 1000
+
+def _new_pcapng_file(file_data: schema.PcapngFileCreate) -> PcapngFile:
+    return model.PcapngFile(
         filename=file_data.filename,
         upload_timestamp=datetime.utcnow(),
         user_id=file_data.user_id,
     )
-    db.add(new_file)
-    db.commit()
-    db.refresh(new_file)
-    
+
+def _pcapng_file_dict(new_file: PcapngFile) -> dict:
     return {
         "id": str(new_file.id),  # ✅ Convert UUID to string
         "user_id": new_file.user_id,
         "filename": new_file.filename,
-        "upload_timestamp": new_file.upload_timestamp, 
+        "upload_timestamp": new_file.upload_timestamp,
     }
 
-def get_pcapng_files(db: Session):
-    return db.query(PcapngFile).all()
+def create_pcapng_file(db: Session, file_data: schema.PcapngFileCreate):
+    new_file = _new_pcapng_file(file_data)
+    db.add(new_file)
+    db.commit()
+    db.refresh(new_file)
+    get_cache().invalidate(LATEST_CACHE, new_file.user_id)  # The user's newest capture changed
+    return _pcapng_file_dict(new_file)
+
+async def create_pcapng_file_async(db: AsyncSession, file_data: schema.PcapngFileCreate):
+    new_file = _new_pcapng_file(file_data)
+    db.add(new_file)
+    await db.commit()
+    await db.refresh(new_file)
+    await cache_invalidate_async(LATEST_CACHE, new_file.user_id)  # The user's newest capture changed
+    return _pcapng_file_dict(new_file)
+
+def get_pcapng_file(db: Session, pcapng_id: str):
+    pcapng_file = db.query(PcapngFile).filter(PcapngFile.id == pcapng_id).first()
+    if not pcapng_file:
+        raise HTTPException(status_code=404, detail="PCAPNG file not found.")
+    return pcapng_file
+
+async def get_pcapng_file_async(db: AsyncSession, pcapng_id: str):
+    pcapng_file = await db.get(PcapngFile, pcapng_id)
+    if not pcapng_file:
+        raise HTTPException(status_code=404, detail="PCAPNG file not found.")
+    return pcapng_file
 
-def get_latest_pcapng_files(user_id: str, db: Session): 
-    latest_pcapng = (
-        db.query(PcapngFile)
-        .filter(PcapngFile.user_id == user_id)
-        .order_by(PcapngFile.upload_timestamp.desc())
-        .first()
+def encode_capture_cursor(pcapng_file: PcapngFile) -> str:
+    """Opaque keyset cursor: the (upload_timestamp, id) of the last listed file."""
+    key = [pcapng_file.upload_timestamp.isoformat(), pcapng_file.id]
+    return base64.urlsafe_b64encode(json.dumps(key).encode()).decode()
+
+def decode_capture_cursor(cursor: str):
+    try:
+        timestamp, file_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(timestamp), str(file_id)
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+def _file_page_select(user_id: Optional[str], cursor: Optional[str], limit: int):
+    """
+    Newest-first page of captures. Keyset on (upload_timestamp, id), served
+    by ix_pcapng_storage_user_uploaded / ix_pcapng_storage_uploaded, so deep
+    pages cost the same as the first one. One extra row is fetched to tell
+    whether another page follows.
+    """
+    query = select(PcapngFile)
+    if user_id is not None:
+        query = query.where(PcapngFile.user_id == user_id)
+    if cursor is not None:
+        timestamp, file_id = decode_capture_cursor(cursor)
+        query = query.where(
+            tuple_(PcapngFile.upload_timestamp, PcapngFile.id) < tuple_(timestamp, file_id)
+        )
+    return query.order_by(
+        PcapngFile.upload_timestamp.desc(), PcapngFile.id.desc()
+    ).limit(limit + 1)
+
+def _file_page(files, limit: int) -> dict:
+    files = list(files)
+    next_cursor = encode_capture_cursor(files[limit - 1]) if len(files) > limit else None
+    return {"files": files[:limit], "next_cursor": next_cursor}
+
+def get_pcapng_file_page(
+    db: Session,
+    user_id: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = CAPTURE_PAGE_SIZE,
+):
+    """
+    One page of uploaded captures, newest first, optionally for one user.
+
+    Raises:
+        ValueError: On a malformed cursor
+    """
+    files = db.execute(_file_page_select(user_id, cursor, limit)).scalars()
+    return _file_page(files, limit)
+
+async def get_pcapng_file_page_async(
+    db: AsyncSession,
+    user_id: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = CAPTURE_PAGE_SIZE,
+):
+    files = (await db.execute(_file_page_select(user_id, cursor, limit))).scalars()
+    return _file_page(files, limit)
+
+def _latest_select(user_id: str):
+    """
+    The user's newest capture with its analysis (if any) in one round trip:
+    an index-only walk of ix_pcapng_storage_user_uploaded for the file,
+    then an ix_analysis_results_pcapng_id lookup for the outer join.
+    """
+    return (
+        select(PcapngFile.id, AnalysisResultsDB)
+        .outerjoin(AnalysisResultsDB, AnalysisResultsDB.pcapng_id == PcapngFile.id)
+        .where(PcapngFile.user_id == user_id)
+        .order_by(PcapngFile.upload_timestamp.desc(), PcapngFile.id.desc())
+        .limit(1)
     )
 
-    if not latest_pcapng:
+def _latest_result(user_id: str, row) -> dict:
+    if row is None:
         raise HTTPException(status_code=404, detail="No PCAPNG files found for this user.")
-
-    latest_analysis = db.query(AnalysisResultsDB).filter(AnalysisResultsDB.pcapng_id == latest_pcapng.id).first()
-    if not latest_analysis:
+    _, latest_analysis = row
+    if latest_analysis is None:
         raise HTTPException(status_code=404, detail="No analysis results found for this PCAPNG file.")
-    return latest_analysis
\ No newline at end of file
+
+    result = analysis_to_dict(latest_analysis)
+    get_cache().set(LATEST_CACHE, user_id, result)
+    return result
+
+def get_latest_pcapng_files(user_id: str, db: Session):
+    # Read-through cache, invalidated by new uploads and new analysis results
+    cached = get_cache().get(LATEST_CACHE, user_id)
+    if cached is not None:
+        return cached
+
+    return _latest_result(user_id, db.execute(_latest_select(user_id)).first())
+
+async def get_latest_pcapng_files_async(user_id: str, db: AsyncSession):
+    cached = await cache_get_async(LATEST_CACHE, user_id)
+    if cached is not None:
+        return cached
+
+    row = (await db.execute(_latest_select(user_id))).first()
+    # Converting the row and filling the cache encode the whole analysis
+    return await run_in_threadpool(_latest_result, user_id, row)
@@ -0,0 +1,17 @@
+from sqlalchemy import inspect
+from sqlalchemy.engine import Engine
+from .model import PcapngFile
+
+
+def migrate_pcapng_storage(engine: Engine):
+    """
+    Adds the listing indexes to a pcapng_storage table created before they
+    existed (`create_all` skips existing tables). Safe to run on every start.
+    """
+    table = PcapngFile.__table__
+    if not inspect(engine).has_table(table.name):
+        return  # Fresh database: create_all builds the indexes
+
+    with engine.begin() as conn:
+        for index in table.indexes:
+            index.create(conn, checkfirst=True)
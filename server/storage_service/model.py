@@ -1,5 +1,5 @@
 import uuid
-from sqlalchemy import Column, String, Integer, Boolean, DateTime
+from sqlalchemy import Column, String, Integer, Boolean, DateTime, Index
 from sqlalchemy.sql import func
 from database import Base  # ✅ Using relative import
 
@@ -9,4 +9,11 @@ class PcapngFile(Base):
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
     filename = Column(String, nullable=False)
     upload_timestamp = Column(DateTime(timezone=True), server_default=func.now())
-    user_id = Column(String, nullable=False)
\ No newline at end of file
+    user_id = Column(String, nullable=False)
+
+    __table_args__ = (
+        # Keyset listing / latest per user: (user_id, upload_timestamp, id) order
+        Index("ix_pcapng_storage_user_uploaded", "user_id", "upload_timestamp", "id"),
+        # Keyset listing across all users
+        Index("ix_pcapng_storage_uploaded", "upload_timestamp", "id"),
+    )
@@ -14,3 +14,7 @@ class PcapngFileResponse(BaseModel):
 
     class Config:
         from_attributes = True
+
+class PcapngFilePage(BaseModel):
+    files: list[PcapngFileResponse]
+    next_cursor: Optional[str] = None  # Pass back as `cursor` for the next page; null on the last page
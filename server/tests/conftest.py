@@ -0,0 +1,58 @@
+import os
+import sys
+from pathlib import Path
+
+import pytest
+from scapy.all import ARP, ICMP, IP, TCP, UDP, Ether, Raw
+
+# The server's packages import each other as top-level modules (run from server/)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+# database.py builds its engines at import; the tests never open a connection
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+
+def mixed_capture():
+    """
+    A small capture exercising every branch of the analysis: TCP and UDP
+    flows sharing addresses and ports, retransmissions, MQTT broker
+    traffic, a bulk upload, jitter spikes (one on the very first delay),
+    bundling delays, a congestion run, ICMP, ARP and non-IP frames.
+    """
+    frames = []
+    clock = [1_700_000_000.0]
+
+    def add(packet, gap):
+        clock[0] += gap
+        frames.append((Ether(src="02:00:00:00:00:02", dst="02:00:00:00:00:01") / packet, clock[0]))
+
+    device, broker, host_a, host_b = "10.0.0.2", "10.0.0.1", "10.0.0.3", "10.0.0.4"
+    add(IP(src=device, dst=broker) / TCP(sport=50000, dport=1883, seq=1), 0)
+    add(IP(src=device, dst=broker) / UDP(sport=50000, dport=1883) / Raw(b"x" * 20), 0.08)
+    add(IP(src=device, dst=broker) / TCP(sport=50000, dport=1883, seq=2), 0.002)
+    add(IP(src=device, dst=broker) / TCP(sport=50000, dport=1883, seq=2), 0.03)
+    add(IP(src=broker, dst=device) / TCP(sport=1883, dport=50000, seq=9), 0.001)
+    add(IP(src=broker, dst=device) / UDP(sport=1883, dport=50000), 0.001)
+    for n in range(20):  # Bulk upload, interleaved with UDP of the same tuple
+        add(IP(src=host_a, dst=host_b) / TCP(sport=4000, dport=5000, seq=100 + n), 0.005)
+        if n % 4 == 0:
+            add(IP(src=host_a, dst=host_b) / UDP(sport=4000, dport=5000) / Raw(b"y" * n), 0.001)
+    add(IP(src=host_a, dst=host_b) / TCP(sport=4000, dport=5000, seq=119), 0.002)
+    add(IP(src=host_a, dst=host_b) / ICMP(), 0.01)
+    add(ARP(psrc=host_a, pdst=host_b), 0.01)
+    add(Raw(b"\x00" * 30), 0.01)
+    for n in range(14):  # Sustained high delays: spikes and congestion windows
+        add(IP(src=device, dst=broker) / UDP(sport=50000, dport=1883), 0.06 + 0.002 * n)
+    add(IP(src=host_b, dst=host_a) / UDP(sport=5000, dport=4000), 0.04)
+    add(IP(src=host_b, dst=host_a) / TCP(sport=5000, dport=4000, seq=7), 0.001)
+
+    packets = []
+    for frame, timestamp in frames:
+        packet = Ether(bytes(frame))
+        packet.time = timestamp
+        packets.append(packet)
+    return packets
+
+
+@pytest.fixture(scope="session")
+def mixed_packets():
+    return mixed_capture()
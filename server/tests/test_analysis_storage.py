@@ -0,0 +1,34 @@
+"""
+Stored artifact manifests hold absolute server paths, which must never
+reach API responses.
+"""
+import pytest
+
+from analysis_storage.crud import analysis_to_dict, parse_fields
+from analysis_storage.model import AnalysisResultsDB
+
+
+def test_analysis_dict_hides_artifact_paths():
+    row = AnalysisResultsDB(
+        id=1,
+        pcapng_id="capture",
+        artifacts={
+            "packet_flow": {
+                "path": "/srv/uploads/capture.artifacts/packet_flow",
+                "rows": 3,
+                "columns": {"size": "int32", "flags": "uint8"},
+            }
+        },
+    )
+
+    result = analysis_to_dict(row)
+
+    assert result["artifacts"] == {"packet_flow": {"rows": 3, "columns": ["size", "flags"]}}
+    assert "/srv/uploads" not in repr(result)
+
+
+def test_artifacts_cannot_be_projected():
+    with pytest.raises(ValueError):
+        parse_fields("artifacts")
+    with pytest.raises(ValueError):
+        parse_fields("artifacts.packet_flow.path")
@@ -0,0 +1,20 @@
+from cache_service import cache
+from cache_service.cache import create_cache
+
+
+def test_unshared_fallback_is_in_process(monkeypatch):
+    monkeypatch.setattr(cache, "REDIS_URL", "redis://127.0.0.1:1")
+    local = create_cache(shared=False)
+
+    local.set("latest", "user", {"id": 1})
+    assert local.backend.name == "memory"
+    assert local.get("latest", "user") == {"id": 1}
+
+
+def test_shared_fallback_is_disabled(monkeypatch):
+    monkeypatch.setattr(cache, "REDIS_URL", "redis://127.0.0.1:1")
+    disabled = create_cache(shared=True)
+
+    disabled.set("latest", "user", {"id": 1})
+    assert disabled.backend.name == "disabled"
+    assert disabled.get("latest", "user") is None
@@ -0,0 +1,38 @@
+import io
+
+import pytest
+from scapy.all import wrpcap, wrpcapng
+
+from capture_scan_service.crud import iter_capture_records
+
+
+def capture_bytes(path, packets, writer):
+    writer(str(path), packets)
+    return path.read_bytes()
+
+
+class UnseekableStream(io.RawIOBase):
+    def __init__(self, data: bytes):
+        self.inner = io.BytesIO(data)
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        data = self.inner.read(len(buffer))
+        buffer[: len(data)] = data
+        return len(data)
+
+
+@pytest.mark.parametrize("writer", [wrpcap, wrpcapng])
+@pytest.mark.parametrize("seekable", [True, False])
+def test_truncated_trailing_record_is_not_yielded(tmp_path, mixed_packets, writer, seekable):
+    data = capture_bytes(tmp_path / "capture", mixed_packets, writer)
+    truncated = data[:-3]  # Ends inside the last packet's bytes
+    stream = io.BytesIO(truncated) if seekable else io.BufferedReader(UnseekableStream(truncated))
+
+    records = list(iter_capture_records(stream))
+    assert len(records) == len(mixed_packets) - 1
+
+    complete = list(iter_capture_records(io.BytesIO(data)))
+    assert len(complete) == len(mixed_packets)
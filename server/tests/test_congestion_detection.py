@@ -0,0 +1,49 @@
+from analysis_service.congestion_detection.crud import OnlineCongestionDetector
+from live_capture_service.analyzer import LiveAnalyzer
+
+
+def congested_flow(detector, flow, start=0.0):
+    """Feeds a steady flow then a run of long gaps; returns the events and the end time."""
+    events, timestamp = [], start
+    for _ in range(30):
+        timestamp += 0.01
+        events += detector.update(timestamp, flow)
+    for _ in range(10):
+        timestamp += 0.5
+        events += detector.update(timestamp, flow)
+    return events, timestamp
+
+
+def test_flow_state_is_bounded():
+    detector = OnlineCongestionDetector(max_flows=3)
+    for n in range(100):
+        detector.update(float(n), f"flow {n}")
+        detector.update(n + 0.5, f"flow {n}")
+
+    assert list(detector.flow_last_timestamp) == ["flow 97", "flow 98", "flow 99"]
+    assert list(detector.flow_detectors) == ["flow 97", "flow 98", "flow 99"]
+
+
+def test_recently_seen_flows_are_kept():
+    detector = OnlineCongestionDetector(max_flows=2)
+    detector.update(0.0, "a")
+    detector.update(1.0, "b")
+    detector.update(2.0, "a")
+    detector.update(3.0, "c")
+
+    assert list(detector.flow_last_timestamp) == ["a", "c"]
+
+
+def test_forgotten_flow_closes_its_open_event():
+    detector = OnlineCongestionDetector(max_flows=2)
+    events, timestamp = congested_flow(detector, "a")
+    assert ("start", "a") in [(e["event"], e.get("flow")) for e in events]
+
+    closed = detector.update(timestamp + 1, "b") + detector.update(timestamp + 2, "c")
+    ends = [e for e in closed if e["event"] == "end" and e["scope"] == "flow"]
+    assert [(e["flow"], e["end_time"]) for e in ends] == [("a", timestamp)]
+    assert "a" not in detector.flow_detectors
+
+
+def test_live_analyzer_bounds_its_detector():
+    assert LiveAnalyzer(max_flows=7).detector.max_flows == 7
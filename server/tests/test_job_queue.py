@@ -0,0 +1,112 @@
+"""
+Job queue semantics on SQLite: claims, lease expiry, retries and the
+worker's handling of failed attempts.
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import database
+from job_service import worker as job_worker
+from job_service.crud import _now, claim_job, finish_job
+from job_service.model import Job
+
+TEST_JOB = "test_job"
+
+
+@pytest.fixture
+def sessions(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'jobs.db'}")
+    Job.__table__.create(engine)
+    factory = sessionmaker(bind=engine, autoflush=False)
+    monkeypatch.setattr(database, "SessionLocal", factory)
+    yield factory
+    engine.dispose()
+
+
+def enqueue(sessions, max_attempts=3) -> str:
+    with sessions() as db:
+        job = Job(
+            kind=TEST_JOB,
+            payload={},
+            max_attempts=max_attempts,
+            available_at=_now(),
+        )
+        db.add(job)
+        db.commit()
+        return job.id
+
+
+def claim(sessions, worker_id, visibility_timeout=300):
+    with sessions() as db:
+        return claim_job(db, worker_id, visibility_timeout=visibility_timeout)
+
+
+def load(sessions, job_id) -> Job:
+    with sessions() as db:
+        return db.get(Job, job_id)
+
+
+def test_job_is_claimed_once(sessions):
+    job_id = enqueue(sessions)
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        claims = list(pool.map(lambda n: claim(sessions, f"worker {n}"), range(8)))
+
+    claimed = [job for job in claims if job is not None]
+    assert [job.id for job in claimed] == [job_id]
+    assert claimed[0].attempts == 1
+    assert claim(sessions, "late worker") is None
+
+
+def test_expired_lease_is_reclaimed(sessions):
+    job_id = enqueue(sessions)
+    first = claim(sessions, "dead worker", visibility_timeout=0)
+
+    second = claim(sessions, "worker")
+    assert (second.id, second.attempts, second.locked_by) == (job_id, 2, "worker")
+
+    # The first worker's late outcome is not recorded
+    with sessions() as db:
+        assert finish_job(db, first, "dead worker") is None
+        assert finish_job(db, second, "worker") == "succeeded"
+    assert load(sessions, job_id).status == "succeeded"
+
+
+def test_lease_expired_on_final_attempt_fails_the_job(sessions):
+    job_id = enqueue(sessions, max_attempts=1)
+    claim(sessions, "dead worker", visibility_timeout=0)
+
+    assert claim(sessions, "worker") is None
+    job = load(sessions, job_id)
+    assert (job.status, job.attempts, job.locked_by) == ("failed", 1, None)
+    assert "lease expired" in job.last_error
+
+
+def test_failed_attempt_is_retried_with_backoff(sessions):
+    job_id = enqueue(sessions)
+    job = claim(sessions, "worker")
+
+    with sessions() as db:
+        assert finish_job(db, job, "worker", "boom") == "queued"
+    assert claim(sessions, "worker") is None  # Backing off
+    assert load(sessions, job_id).last_error == "boom"
+
+
+@pytest.mark.parametrize("status_code, outcome", [(400, "failed"), (503, "queued")])
+def test_worker_retries_only_server_errors(sessions, monkeypatch, status_code, outcome):
+    async def handler(payload, attempts):
+        raise HTTPException(status_code=status_code, detail="bad capture")
+
+    monkeypatch.setitem(job_worker.JOB_HANDLERS, TEST_JOB, handler)
+    job_id = enqueue(sessions)
+    worker = job_worker.JobWorker([TEST_JOB])
+
+    asyncio.run(worker.process(claim(sessions, worker.worker_id)))
+
+    job = load(sessions, job_id)
+    assert (job.status, job.attempts, job.last_error) == (outcome, 1, "bad capture")
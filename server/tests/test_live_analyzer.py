@@ -0,0 +1,57 @@
+"""
+Live windows must agree with the offline congestion analysis of the same
+packets, however the stream is cut into batches.
+"""
+import pytest
+
+from analysis_service.network_analysis.crud import analyze_network_congestion
+from analysis_service.profile.schema import DEFAULT_PROFILE, AnalysisProfile
+from live_capture_service.analyzer import LiveAnalyzer
+from packet_extract_service.table import build_packet_table
+
+# Counters the live windows share with the offline congestion_metrics
+SHARED_METRICS = ("jitter_spikes", "packet_aggregation_inefficiency", "congestion_events")
+
+PROFILES = [
+    DEFAULT_PROFILE,
+    AnalysisProfile(
+        jitter_spike_threshold_ms=30,
+        bundling_delay_threshold_ms=10,
+        congestion_window_size=4,
+    ),
+]
+
+
+def live_totals(table, batch_size, profile):
+    # The capture lasts a few seconds: one hour-long window holds all of it
+    analyzer = LiveAnalyzer(window_seconds=3600, profile=profile)
+    windows = []
+    for start in range(0, len(table), batch_size):
+        windows += analyzer.add(table.take(slice(start, start + batch_size)))
+    windows.append(analyzer.flush())
+    assert len(windows) == 1
+    return windows[0]
+
+
+@pytest.mark.parametrize("profile", PROFILES)
+@pytest.mark.parametrize("batch_size", [1, 2, 7, 1000])
+def test_live_window_matches_offline(mixed_packets, profile, batch_size):
+    table = build_packet_table(mixed_packets)
+    offline = analyze_network_congestion(None, table, "summary", profile=profile)
+    window = live_totals(table, batch_size, profile)
+
+    for name in SHARED_METRICS:
+        assert window[name] == offline["congestion_metrics"][name], name
+    assert window["retransmission_rate"] == pytest.approx(
+        offline["congestion_metrics"]["retransmission_rate"]
+    )
+    assert window["jitter_ms"] == pytest.approx(offline["congestion_metrics"]["jitter_ms"])
+
+
+def test_profile_thresholds_apply(mixed_packets):
+    table = build_packet_table(mixed_packets)
+    default = live_totals(table, 1000, DEFAULT_PROFILE)
+    strict = live_totals(table, 1000, PROFILES[1])
+
+    assert strict["jitter_spikes"] > default["jitter_spikes"]
+    assert strict["packet_aggregation_inefficiency"] > default["packet_aggregation_inefficiency"]
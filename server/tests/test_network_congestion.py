@@ -0,0 +1,281 @@
+"""
+Output equality of the vectorized analyze_network_congestion against the
+per-packet loop it replaced, on small synthetic captures.
+"""
+import math
+
+import pytest
+
+from analysis_service.network_analysis.crud import analyze_network_congestion
+from packet_extract_service.table import build_packet_table
+
+BROKER_PORTS = {1883, 8883, 8884, 8885, 8886, 5671, 5672}
+JITTER_SPIKE_THRESHOLD_MS = 50
+BUNDLING_DELAY_THRESHOLD_MS = 25
+CONGESTION_WINDOW_SIZE = 10
+BULK_UPLOAD_THRESHOLD = 15
+BULK_UPLOAD_TIME_WINDOW = 1.0
+
+# Sections added after the loop was replaced, with no counterpart to compare
+NEW_SECTIONS = ("ip_communication_other", "heavy_hitters")
+
+
+def reference_network_congestion(packets):
+    """
+    The per-packet loop analyze_network_congestion used to run, at the
+    "packets" detail level. The one deliberate change is the UDP flow key
+    ("UDP: " prefix): the loop keyed TCP and UDP flows of the same
+    addresses and ports identically and merged them.
+    """
+    packet_count = len(packets)
+    retransmission_count = 0
+    jitter_values = []
+    jitter_spikes = []
+    bundling_delays = []
+    congestion_events = []
+    ip_communication = {}
+    packet_flow = []
+    retransmissions = []
+
+    prev_timestamp = None
+    flow_timestamps = {}
+    last_seq_nums = {}
+    bulk_upload_flows = set()
+    known_brokers = set()
+    packet_counts_by_flow = {}
+    delay_window = []
+
+    for pkt in packets:
+        if pkt.haslayer("TCP") or pkt.haslayer("UDP"):
+            layer = "TCP" if pkt.haslayer("TCP") else "UDP"
+            if pkt[layer].sport in BROKER_PORTS:
+                known_brokers.add(pkt["IP"].src)
+            if pkt[layer].dport in BROKER_PORTS:
+                known_brokers.add(pkt["IP"].dst)
+
+    for i, pkt in enumerate(packets):
+        flow_info = {"packet_id": i, "size": len(pkt)}
+        current_timestamp = float(pkt.time)
+        flow_info["timestamp"] = current_timestamp
+
+        if pkt.haslayer("IP"):
+            flow_info["src_ip"] = pkt["IP"].src
+            flow_info["dst_ip"] = pkt["IP"].dst
+            if pkt.haslayer("TCP"):
+                flow_info["protocol"] = "TCP"
+                flow_info["src_port"] = pkt["TCP"].sport
+                flow_info["dst_port"] = pkt["TCP"].dport
+                flow_info["flow"] = (
+                    f"{pkt['IP'].src}:{pkt['TCP'].sport}-{pkt['IP'].dst}:{pkt['TCP'].dport}"
+                )
+                flow_key = flow_info["flow"]
+                seq_num = pkt["TCP"].seq
+                if flow_key in last_seq_nums and seq_num == last_seq_nums[flow_key]:
+                    retransmission_count += 1
+                    flow_info["retransmission"] = True
+                last_seq_nums[flow_key] = seq_num
+            elif pkt.haslayer("UDP"):
+                flow_info["protocol"] = "UDP"
+                flow_info["src_port"] = pkt["UDP"].sport
+                flow_info["dst_port"] = pkt["UDP"].dport
+                flow_info["flow"] = (
+                    f"UDP: {pkt['IP'].src}:{pkt['UDP'].sport}-{pkt['IP'].dst}:{pkt['UDP'].dport}"
+                )
+            else:
+                flow_info["protocol"] = "IP"
+                flow_info["flow"] = f"{pkt['IP'].src}-{pkt['IP'].dst}"
+        elif pkt.haslayer("ARP"):
+            flow_info["protocol"] = "ARP"
+            flow_info["src_ip"] = pkt["ARP"].psrc
+            flow_info["dst_ip"] = pkt["ARP"].pdst
+            flow_info["flow"] = f"ARP: {pkt['ARP'].psrc}-{pkt['ARP'].pdst}"
+        else:
+            flow_info["protocol"] = "Other"
+            flow_info["flow"] = f"Unknown flow (packet {i})"
+
+        if prev_timestamp is not None:
+            packet_delay_ms = (current_timestamp - prev_timestamp) * 1000
+            flow_info["delay_from_previous_ms"] = packet_delay_ms
+            jitter_values.append(packet_delay_ms)
+            if len(jitter_values) > 1 and packet_delay_ms > JITTER_SPIKE_THRESHOLD_MS:
+                jitter_spikes.append(
+                    {"packet_id": i, "delay_ms": packet_delay_ms, "timestamp": current_timestamp}
+                )
+            delay_window.append(packet_delay_ms)
+            if len(delay_window) > CONGESTION_WINDOW_SIZE:
+                delay_window.pop(0)
+            if (
+                len(delay_window) == CONGESTION_WINDOW_SIZE
+                and sum(delay_window) / len(delay_window) > JITTER_SPIKE_THRESHOLD_MS
+            ):
+                congestion_events.append(i)
+
+        flow_key = flow_info["flow"]
+        counts = packet_counts_by_flow.setdefault(
+            flow_key, {"count": 0, "first_timestamp": current_timestamp}
+        )
+        counts["count"] += 1
+        if (
+            counts["count"] >= BULK_UPLOAD_THRESHOLD
+            and current_timestamp - counts["first_timestamp"] <= BULK_UPLOAD_TIME_WINDOW
+        ):
+            bulk_upload_flows.add(flow_key)
+        if flow_key in flow_timestamps:
+            flow_delay_ms = (current_timestamp - flow_timestamps[flow_key]) * 1000
+            flow_info["flow_delay_ms"] = flow_delay_ms
+            if flow_delay_ms > BUNDLING_DELAY_THRESHOLD_MS:
+                bundling_delays.append(flow_delay_ms)
+        flow_timestamps[flow_key] = current_timestamp
+        prev_timestamp = current_timestamp
+
+        retransmission = flow_info.get("retransmission", False)
+        flow_info["packet_type"] = {
+            "transmission": not retransmission,
+            "retransmission": retransmission,
+            "bulk_upload": flow_key in bulk_upload_flows,
+            "broker": False,
+            "device_to_broker": False,
+        }
+        if "src_ip" in flow_info:
+            if flow_info["src_ip"] in known_brokers:
+                flow_info["packet_type"]["broker"] = True
+                if flow_info["dst_ip"] not in known_brokers:
+                    flow_info["packet_type"]["device_to_broker"] = True
+            elif flow_info["dst_ip"] in known_brokers:
+                flow_info["packet_type"]["broker"] = True
+                flow_info["packet_type"]["device_to_broker"] = True
+
+        packet_flow.append(flow_info)
+        if retransmission:
+            retransmissions.append(flow_info)
+
+        if flow_key not in ip_communication:
+            ip_communication[flow_key] = {
+                "src_ip": flow_info.get("src_ip", "Unknown"),
+                "dst_ip": flow_info.get("dst_ip", "Unknown"),
+                "src_port": flow_info.get("src_port", None),
+                "dst_port": flow_info.get("dst_port", None),
+                "protocol": flow_info["protocol"],
+                "packet_count": 0,
+                "bytes": 0,
+                "avg_delay_ms": 0,
+                "total_delay_ms": 0,
+            }
+        stats = ip_communication[flow_key]
+        stats["packet_count"] += 1
+        stats["bytes"] += len(pkt)
+        if "flow_delay_ms" in flow_info:
+            stats["total_delay_ms"] += flow_info["flow_delay_ms"]
+            stats["avg_delay_ms"] = stats["total_delay_ms"] / (stats["packet_count"] - 1)
+
+    jitter = 0
+    if len(jitter_values) > 1:
+        diffs = [abs(b - a) for a, b in zip(jitter_values, jitter_values[1:])]
+        jitter = sum(diffs) / len(diffs)
+
+    congestion_metrics = {
+        "retransmission_rate": retransmission_count / packet_count if packet_count else 0,
+        "jitter_ms": jitter,
+        "jitter_spikes": len(jitter_spikes),
+        "packet_aggregation_inefficiency": len(bundling_delays),
+        "congestion_events": len(congestion_events),
+    }
+    congestion_score = min(
+        100,
+        (congestion_metrics["retransmission_rate"] * 50)
+        + (min(1, congestion_metrics["jitter_ms"] / 100) * 25)
+        + (min(1, congestion_metrics["jitter_spikes"] / 10) * 15)
+        + (min(1, congestion_metrics["packet_aggregation_inefficiency"] / 20) * 10),
+    )
+    congestion_level = "Low"
+    if congestion_score > 30:
+        congestion_level = "Moderate"
+    if congestion_score > 60:
+        congestion_level = "High"
+    if congestion_score > 80:
+        congestion_level = "Severe"
+
+    return {
+        "congestion_metrics": congestion_metrics,
+        "congestion_score": congestion_score,
+        "congestion_level": congestion_level,
+        "detailed_metrics": {
+            "jitter_analysis": {"mean_jitter_ms": jitter, "jitter_spikes": jitter_spikes},
+            "tcp_analysis": {"retransmissions": retransmissions},
+        },
+        "ip_communication": ip_communication,
+        "packet_flow": packet_flow,
+    }
+
+
+def assert_same(actual, expected, path="result"):
+    if isinstance(expected, dict):
+        assert isinstance(actual, dict), path
+        assert sorted(actual) == sorted(expected), path
+        for key in expected:
+            assert_same(actual[key], expected[key], f"{path}.{key}")
+    elif isinstance(expected, list):
+        assert isinstance(actual, list) and len(actual) == len(expected), path
+        for i, (a, e) in enumerate(zip(actual, expected)):
+            assert_same(a, e, f"{path}[{i}]")
+    elif isinstance(expected, float) or isinstance(actual, float):
+        assert math.isclose(actual, expected, rel_tol=1e-9, abs_tol=1e-9), path
+    else:
+        assert actual == expected, path
+
+
+@pytest.fixture(scope="module")
+def packets(mixed_packets):
+    return mixed_packets
+
+
+@pytest.fixture(scope="module")
+def reference(packets):
+    return reference_network_congestion(packets)
+
+
+@pytest.mark.parametrize("source", ["packets", "table"])
+def test_packets_detail_matches_loop(packets, reference, source):
+    data = packets if source == "packets" else build_packet_table(packets)
+    result = analyze_network_congestion(None, data, "packets", top_k=1000)
+
+    for section in NEW_SECTIONS:
+        result.pop(section)
+    result["detailed_metrics"].pop("change_points")
+    assert_same(result, reference)
+
+
+def test_flows_detail_matches_loop(packets, reference):
+    result = analyze_network_congestion(None, packets, "flows", top_k=1000)
+
+    assert "packet_flow" not in result
+    assert_same(result["ip_communication"], reference["ip_communication"])
+    assert_same(
+        result["detailed_metrics"]["jitter_analysis"],
+        reference["detailed_metrics"]["jitter_analysis"],
+    )
+    assert_same(
+        result["detailed_metrics"]["tcp_analysis"]["retransmissions"],
+        [
+            {"packet_id": r["packet_id"], "flow": r["flow"], "timestamp": r["timestamp"]}
+            for r in reference["detailed_metrics"]["tcp_analysis"]["retransmissions"]
+        ],
+    )
+
+
+def test_summary_detail_matches_loop(packets, reference):
+    result = analyze_network_congestion(None, packets, "summary")
+
+    assert_same(result["congestion_metrics"], reference["congestion_metrics"])
+    assert result["congestion_score"] == pytest.approx(reference["congestion_score"])
+    assert result["congestion_level"] == reference["congestion_level"]
+
+
+def test_tcp_and_udp_flows_of_one_tuple_stay_apart(packets):
+    flows = analyze_network_congestion(None, packets, "flows", top_k=1000)["ip_communication"]
+
+    tcp = flows["10.0.0.3:4000-10.0.0.4:5000"]
+    udp = flows["UDP: 10.0.0.3:4000-10.0.0.4:5000"]
+    assert (tcp["protocol"], tcp["packet_count"]) == ("TCP", 21)
+    assert (udp["protocol"], udp["packet_count"]) == ("UDP", 5)
+    assert flows["UDP: 10.0.0.2:50000-10.0.0.1:1883"]["packet_count"] == 15
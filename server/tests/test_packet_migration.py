@@ -0,0 +1,13 @@
+from packet_extract_service.migration import split_capture_ids
+
+CAPTURE = "0b5eaace-efe9-4ce2-8ce2-674543506dfb"
+
+
+def test_only_canonical_uuids_reach_the_partition_ddl():
+    injected = "x'); DROP TABLE pcapng_files; --"
+    valid, skipped = split_capture_ids(
+        [CAPTURE, injected, CAPTURE.upper(), "{" + CAPTURE + "}", "", None]
+    )
+
+    assert valid == [CAPTURE]
+    assert skipped == [injected, CAPTURE.upper(), "{" + CAPTURE + "}", "", None]
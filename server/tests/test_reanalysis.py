@@ -0,0 +1,73 @@
+"""
+Range reanalysis of a stored capture: the window's packets only, and
+per-analyzer caching.
+"""
+import pytest
+from scapy.all import rdpcap, wrpcap
+
+from analysis_service.network_analysis.crud import analyze_network_congestion
+from cache_service import cache, result_cache, table_cache
+from cache_service.cache import LRUCache, ReadThroughCache
+from cache_service.result_cache import DiskCache
+from cache_service.table_cache import PacketTableCache
+from reanalysis_service import crud
+from reanalysis_service.crud import reanalyze_capture
+from reanalysis_service.schema import ReanalyzeRequest
+
+ANALYZERS = ["congestion_analysis", "mqtt_analysis"]
+
+
+@pytest.fixture
+def capture(tmp_path, mixed_packets, monkeypatch):
+    monkeypatch.setattr(cache, "_cache", ReadThroughCache(LRUCache()))
+    monkeypatch.setattr(table_cache, "_table_cache", PacketTableCache(tmp_path / "tables"))
+    monkeypatch.setattr(
+        result_cache, "_result_cache", ReadThroughCache(DiskCache(tmp_path / "results"))
+    )
+    path = tmp_path / "capture.pcap"
+    wrpcap(str(path), mixed_packets)
+    return path, tmp_path / "capture.artifacts"
+
+
+def reanalyze(capture, **request):
+    path, root = capture
+    return reanalyze_capture(path, root, "capture", ReanalyzeRequest(analyzers=ANALYZERS, **request))
+
+
+def test_window_analyzes_only_its_packets(capture):
+    packets = rdpcap(str(capture[0]))
+    times = [float(packet.time) for packet in packets]
+    start, end = times[10], times[40]
+    window = [packet for packet in packets if start <= float(packet.time) <= end]
+
+    response = reanalyze(capture, start=start, end=end)
+
+    assert response["packet_count"] == len(window) == 31
+    expected = analyze_network_congestion(None, window, "flows")
+    congestion = response["results"]["congestion_analysis"]
+    assert congestion["congestion_metrics"] == pytest.approx(expected["congestion_metrics"])
+    assert congestion["ip_communication"].keys() == expected["ip_communication"].keys()
+
+
+def test_repeated_window_is_answered_from_the_cache(capture, monkeypatch):
+    first = reanalyze(capture, start=None, end=None)
+    assert first["cached"] == []
+
+    def no_decoding(*args):
+        raise AssertionError("cached windows must not decode the capture")
+
+    monkeypatch.setattr(crud, "_RangeInput", no_decoding)
+    again = reanalyze(capture, start=None, end=None)
+
+    assert again["cached"] == ANALYZERS
+    assert again["results"] == first["results"]
+    assert again["packet_count"] == first["packet_count"]
+
+
+def test_profile_change_misses_only_for_the_analyzers_reading_it(capture):
+    reanalyze(capture)
+    profile = {"jitter_spike_threshold_ms": 10}
+
+    response = reanalyze(capture, profile=profile)
+
+    assert response["cached"] == ["mqtt_analysis"]
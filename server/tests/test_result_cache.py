@@ -0,0 +1,101 @@
+"""
+The persistent analysis result cache: keys, on-disk LRU and its use by
+run_analyzers.
+"""
+import os
+
+import pytest
+
+from analysis_service.pipeline.products import CaptureProducts
+from analysis_service.pipeline.registry import (
+    ANALYZERS,
+    AnalysisOptions,
+    result_key,
+    run_analyzers,
+)
+from analysis_service.profile.schema import DEFAULT_PROFILE
+from analysis_storage.schema import DetailLevel
+from cache_service import result_cache
+from cache_service.cache import ReadThroughCache
+from cache_service.result_cache import RESULT_CACHE, DiskCache
+
+
+@pytest.fixture
+def disk_cache(tmp_path, monkeypatch):
+    cache = ReadThroughCache(DiskCache(tmp_path / "results"), ttl=60)
+    monkeypatch.setattr(result_cache, "_result_cache", cache)
+    return cache
+
+
+def run_congestion(packets, tmp_path, artifact_dir=None):
+    options = AnalysisOptions(
+        tmp_path / "capture.pcap",
+        DetailLevel.PACKETS,
+        artifact_dir=artifact_dir,
+        capture_sha256="0" * 64,
+    )
+    products = CaptureProducts({"packets": lambda: packets})
+    analyzers = {"congestion_analysis": ANALYZERS["congestion_analysis"]}
+    return run_analyzers(analyzers, products, options)["congestion_analysis"]
+
+
+def test_inline_result_is_not_reused_for_artifact_runs(mixed_packets, tmp_path, disk_cache):
+    inline = run_congestion(mixed_packets, tmp_path)
+    assert isinstance(inline["packet_flow"], list)
+    assert disk_cache.get_stats()["namespaces"][RESULT_CACHE]["sets"] == 1
+
+    stored = run_congestion(mixed_packets, tmp_path, tmp_path / "artifacts")
+    assert stored["packet_flow"] == {"artifact": "packet_flow", "rows": len(mixed_packets)}
+    assert stored["artifacts"]["packet_flow"]["rows"] == len(mixed_packets)
+
+    again = run_congestion(mixed_packets, tmp_path)
+    assert again["packet_flow"] == inline["packet_flow"]
+    assert disk_cache.get_stats()["namespaces"][RESULT_CACHE]["hits"] == 1
+
+
+def test_disk_cache_evicts_least_recently_used(tmp_path):
+    cache = DiskCache(tmp_path, max_bytes=25)
+    cache.set("a", b"a" * 10, 0)
+    cache.set("b", b"b" * 10, 0)
+    # Deterministic recency: "a" used after "b"
+    os.utime(cache._path("b"), ns=(1_000_000_000, 1_000_000_000))
+    os.utime(cache._path("a"), ns=(2_000_000_000, 2_000_000_000))
+
+    cache.set("c", b"c" * 10, 0)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == b"a" * 10
+    assert cache.get("c") == b"c" * 10
+    assert (cache.evictions, cache.size) == (1, 20)
+
+
+def test_disk_cache_skips_oversized_values(tmp_path):
+    cache = DiskCache(tmp_path, max_bytes=25)
+    cache.set("a", b"a" * 10, 0)
+    cache.set("big", b"x" * 26, 0)
+
+    assert cache.get("big") is None
+    assert cache.get("a") == b"a" * 10
+
+
+def analysis_options(**changes):
+    base = AnalysisOptions("capture.pcap", capture_sha256="0" * 64)
+    return base._replace(**changes)
+
+
+def test_result_key_covers_only_what_the_analyzer_reads():
+    congestion = ANALYZERS["congestion_analysis"]
+
+    def key(**changes):
+        return result_key("congestion_analysis", congestion, analysis_options(**changes))
+
+    unread = DEFAULT_PROFILE.model_copy(update={"packet_loss_gap_factor": 9.0})
+    read = DEFAULT_PROFILE.model_copy(update={"jitter_spike_threshold_ms": 10})
+    assert key(profile=unread) == key()
+    assert key(file_path="renamed.pcap") == key()
+    assert key(profile=read) != key()
+    assert key(top_k=3) != key()
+    assert key(detail=DetailLevel.PACKETS) != key()
+    assert key(start=1.0) != key()
+    assert key(capture_sha256="1" * 64) != key()
+    assert result_key("congestion_analysis", congestion, analysis_options(capture_sha256=None)) is None
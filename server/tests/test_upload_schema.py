@@ -0,0 +1,23 @@
+import pytest
+from pydantic import ValidationError
+
+from upload_service.schema import UploadSessionCreate
+
+
+@pytest.mark.parametrize(
+    "filename, stored",
+    [
+        ("capture.pcapng", "capture.pcapng"),
+        ("../../capture.pcapng", "capture.pcapng"),
+        ("/etc/capture.pcapng", "capture.pcapng"),
+        ("..\\..\\capture.pcapng", "capture.pcapng"),
+    ],
+)
+def test_filename_is_reduced_to_its_name(filename, stored):
+    assert UploadSessionCreate(user_id="u", filename=filename, size=1).filename == stored
+
+
+@pytest.mark.parametrize("filename", ["", "/", ".", "..", "../..", ".result_cache"])
+def test_dot_and_empty_filenames_are_rejected(filename):
+    with pytest.raises(ValidationError):
+        UploadSessionCreate(user_id="u", filename=filename, size=1)
@@ -0,0 +1,63 @@
+"""
+Per-upload state (hasher, prefix decoder) must not outlive its upload.
+"""
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from upload_service import crud
+from upload_service.model import UploadSession
+
+
+@pytest.fixture(autouse=True)
+def states():
+    crud._states.clear()
+    yield crud._states
+    crud._states.clear()
+
+
+class Decoder:
+    cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+def test_idle_states_are_evicted(states):
+    idle, busy, recent = crud._state("idle"), crud._state("busy"), crud._state("recent")
+    idle.decoder = Decoder()
+    now = recent.last_used + crud.UPLOAD_STATE_IDLE_SECONDS + 1
+    recent.last_used = now - 1
+    busy.last_used = idle.last_used
+
+    async def evict_while_locked():
+        async with busy.lock:
+            crud._evict_idle_states(now)
+
+    asyncio.run(evict_while_locked())
+
+    assert sorted(states) == ["busy", "recent"]
+    assert idle.decoder.cancelled
+
+    crud._evict_idle_states(now)
+    assert sorted(states) == ["recent"]
+
+
+def test_state_use_postpones_eviction(states):
+    state = crud._state("upload")
+    first_use = state.last_used
+    state.last_used -= crud.UPLOAD_STATE_IDLE_SECONDS
+    crud._state("upload")
+
+    crud._evict_idle_states(first_use + 1)
+    assert list(states) == ["upload"]
+
+
+def test_requests_for_finished_uploads_leave_no_state(states):
+    crud._state("upload")
+    with pytest.raises(HTTPException) as error:
+        crud._check_receiving(UploadSession(id="upload", status="aborted"))
+
+    assert error.value.status_code == 409
+    assert not states
@@ -0,0 +1,299 @@
+import asyncio
+import hashlib
+import os
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import AsyncIterator, Dict, Optional
+
+import anyio
+from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
+from scapy.plist import PacketList
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import func
+
+from . import schema
+from .decoder import PrefixDecoder
+from .model import UploadSession
+
+UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024  # Suggested bytes per PUT
+HASH_READ_BYTES = 1024 * 1024  # Read size when re-hashing a stored prefix
+UPLOAD_STATE_IDLE_SECONDS = 3600  # Idle uploads drop their state (rebuilt from disk on resume)
+
+
+@dataclass
+class _UploadState:
+    """Per-upload state kept by the worker that receives the chunks."""
+
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+    hasher: "hashlib._Hash" = field(default_factory=hashlib.sha256)
+    hashed_bytes: int = 0
+    decoder: Optional[PrefixDecoder] = None
+    last_used: float = field(default_factory=time.monotonic)
+
+
+_states: Dict[str, _UploadState] = {}
+
+
+def _state(upload_id: str) -> _UploadState:
+    _evict_idle_states()
+    state = _states.get(upload_id)
+    if state is None:
+        state = _states[upload_id] = _UploadState()
+    state.last_used = time.monotonic()
+    return state
+
+
+def _drop_state(upload_id: str):
+    state = _states.pop(upload_id, None)
+    if state is not None and state.decoder is not None:
+        state.decoder.cancel()
+
+
+def _check_receiving(session: UploadSession):
+    """Raises 409 for a finished upload, dropping the state the request created."""
+    if session.status != "receiving":
+        _drop_state(session.id)
+        raise HTTPException(status_code=409, detail=f"Upload is already {session.status}.")
+
+
+def _evict_idle_states(now: Optional[float] = None):
+    """
+    Drops the state of uploads unused for UPLOAD_STATE_IDLE_SECONDS, so
+    abandoned uploads do not keep their hasher and decoded prefix in
+    memory. A resumed upload re-hashes its stored prefix from disk.
+    """
+    now = time.monotonic() if now is None else now
+    for upload_id, state in list(_states.items()):
+        if now - state.last_used > UPLOAD_STATE_IDLE_SECONDS and not state.lock.locked():
+            _drop_state(upload_id)
+
+
+def partial_path(upload_dir: Path, upload_id: str) -> Path:
+    """Where the received prefix of an upload is written."""
+    return upload_dir / "partial" / upload_id
+
+
+def upload_session_dict(session: UploadSession) -> dict:
+    state = _states.get(session.id)
+    decoder = state.decoder if state is not None else None
+    return {
+        "id": session.id,
+        "user_id": session.user_id,
+        "filename": session.filename,
+        "total_size": session.total_size,
+        "received_bytes": session.received_bytes,
+        "status": session.status,
+        "chunk_size": UPLOAD_CHUNK_SIZE,
+        "decoded_packets": decoder.packet_count if decoder is not None else None,
+        "sha256": session.sha256,
+        "pcapng_id": session.pcapng_id,
+        "created_at": session.created_at,
+        "updated_at": session.updated_at,
+    }
+
+
+async def create_upload_session_async(
+    db: AsyncSession, data: schema.UploadSessionCreate, upload_dir: Path
+) -> UploadSession:
+    session = UploadSession(
+        user_id=data.user_id, filename=data.filename, total_size=data.size
+    )
+    db.add(session)
+    await db.commit()
+    await db.refresh(session)
+
+    path = partial_path(upload_dir, session.id)
+    await anyio.Path(path.parent).mkdir(parents=True, exist_ok=True)
+    await anyio.Path(path).touch()
+    return session
+
+
+async def get_upload_session_async(db: AsyncSession, upload_id: str) -> UploadSession:
+    session = await db.get(UploadSession, upload_id)
+    if not session:
+        raise HTTPException(status_code=404, detail="Upload not found.")
+    return session
+
+
+def _hash_range(hasher, path: Path, start: int, end: int):
+    """Feeds bytes [start, end) of a file to `hasher`."""
+    with open(path, "rb") as f:
+        f.seek(start)
+        remaining = end - start
+        while remaining > 0:
+            data = f.read(min(HASH_READ_BYTES, remaining))
+            if not data:
+                raise ValueError("Stored upload is shorter than recorded.")
+            hasher.update(data)
+            remaining -= len(data)
+
+
+async def _catch_up_hash(state: _UploadState, path: Path, received_bytes: int):
+    """
+    Brings the running hash up to `received_bytes`. Only does work after a
+    restart, or when earlier chunks were received by another worker.
+    """
+    if state.hashed_bytes > received_bytes:
+        state.hasher, state.hashed_bytes = hashlib.sha256(), 0
+    if state.hashed_bytes < received_bytes:
+        await run_in_threadpool(
+            _hash_range, state.hasher, path, state.hashed_bytes, received_bytes
+        )
+        state.hashed_bytes = received_bytes
+
+
+async def write_upload_range(
+    db: AsyncSession,
+    session: UploadSession,
+    offset: int,
+    body: AsyncIterator[bytes],
+    upload_dir: Path,
+) -> UploadSession:
+    """
+    Appends a chunk that starts at `offset` to an upload.
+
+    The chunk must start at or before received_bytes; bytes the server
+    already has (a retried chunk) are skipped. Everything written before a
+    dropped connection is kept and counted, so the client resumes from the
+    new received_bytes instead of resending the whole chunk.
+
+    Raises:
+        HTTPException 409 if the chunk leaves a gap or the upload is
+        complete, 413 if it runs past the declared size
+    """
+    state = _state(session.id)
+    path = partial_path(upload_dir, session.id)
+    async with state.lock:
+        await db.refresh(session)
+        _check_receiving(session)
+        received = session.received_bytes
+        if offset > received:
+            raise HTTPException(
+                status_code=409,
+                detail=f"Chunk starts at {offset} but only {received} bytes are stored.",
+            )
+        await _catch_up_hash(state, path, received)
+
+        # Decode the prefix while the rest arrives (again after a stall)
+        if state.decoder is None or not state.decoder.is_alive():
+            state.decoder = PrefixDecoder(path)
+
+        skip = received - offset
+        written = 0
+        try:
+            async with await anyio.open_file(path, "r+b") as f:
+                await f.seek(received)
+                async for chunk in body:
+                    if skip:
+                        dropped = min(skip, len(chunk))
+                        chunk, skip = chunk[dropped:], skip - dropped
+                    if not chunk:
+                        continue
+                    if received + written + len(chunk) > session.total_size:
+                        raise HTTPException(
+                            status_code=413,
+                            detail=f"Chunk runs past the declared size of {session.total_size} bytes.",
+                        )
+                    await f.write(chunk)
+                    state.hasher.update(chunk)
+                    state.hashed_bytes += len(chunk)
+                    written += len(chunk)
+        finally:
+            if written:
+                # Conditional on the offset we appended at: another worker
+                # may not have moved the upload on in the meantime
+                result = await db.execute(
+                    update(UploadSession)
+                    .where(
+                        UploadSession.id == session.id,
+                        UploadSession.received_bytes == received,
+                    )
+                    .values(received_bytes=received + written, updated_at=func.now())
+                )
+                await db.commit()
+                if result.rowcount != 1:
+                    state.hasher, state.hashed_bytes = hashlib.sha256(), 0  # Re-hash from disk
+                    raise HTTPException(status_code=409, detail="Upload was written concurrently.")
+        await db.refresh(session)
+    return session
+
+
+async def complete_upload(
+    db: AsyncSession,
+    session: UploadSession,
+    sha256: Optional[str],
+    upload_dir: Path,
+    final_path: Path,
+) -> Optional[PacketList]:
+    """
+    Checks that all bytes arrived and match `sha256` (if given), then moves
+    the capture to `final_path`.
+
+    Returns:
+        The capture as decoded while it was being uploaded, or None if it
+        has to be decoded from disk
+    """
+    state = _state(session.id)
+    path = partial_path(upload_dir, session.id)
+    async with state.lock:
+        await db.refresh(session)
+        _check_receiving(session)
+        if session.received_bytes != session.total_size:
+            raise HTTPException(
+                status_code=409,
+                detail=f"Only {session.received_bytes} of {session.total_size} bytes received.",
+            )
+
+        await _catch_up_hash(state, path, session.received_bytes)
+        digest = state.hasher.hexdigest()
+        if sha256 is not None and sha256.lower() != digest:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Checksum mismatch: received bytes hash to {digest}.",
+            )
+
+        packets = None
+        if state.decoder is not None:
+            packets = await run_in_threadpool(state.decoder.finish, session.total_size)
+        await run_in_threadpool(os.replace, path, final_path)
+
+        session.sha256 = digest
+        session.status = "complete"
+        session.updated_at = func.now()
+        await db.commit()
+        await db.refresh(session)
+    _drop_state(session.id)
+    return packets
+
+
+async def abort_upload(
+    db: AsyncSession, session: UploadSession, upload_dir: Path
+) -> UploadSession:
+    """
+    Abandons an upload: deletes the received prefix and drops its state.
+
+    Raises:
+        HTTPException 409 if the upload is no longer receiving
+    """
+    state = _state(session.id)
+    async with state.lock:
+        await db.refresh(session)
+        _check_receiving(session)
+        if state.decoder is not None:
+            state.decoder.cancel()
+        await anyio.Path(partial_path(upload_dir, session.id)).unlink(missing_ok=True)
+
+        session.status = "aborted"
+        session.updated_at = func.now()
+        await db.commit()
+        await db.refresh(session)
+    _drop_state(session.id)
+    return session
+
+
+async def set_upload_capture_async(db: AsyncSession, session: UploadSession, pcapng_id: str):
+    session.pcapng_id = pcapng_id
+    await db.commit()
@@ -0,0 +1,65 @@
+import threading
+from pathlib import Path
+from typing import Optional
+
+from scapy.plist import PacketList
+
+from live_capture_service.sources import FollowFile
+from packet_extract_service.crud import read_capture
+
+PREFIX_IDLE_SECONDS = 300  # A decoder gives up after this long without new chunks
+
+
+class PrefixDecoder:
+    """
+    Decodes an upload's capture on a worker thread while later chunks are
+    still arriving: the partial file is followed as it grows, so by the
+    time the last chunk lands most packets are already decoded.
+
+    The decoder stops on its own after PREFIX_IDLE_SECONDS without new
+    data; a stalled upload that resumes later gets a fresh decoder.
+    """
+
+    def __init__(self, path: Path, idle_timeout: float = PREFIX_IDLE_SECONDS):
+        self.stop = threading.Event()
+        self.stream = FollowFile(path, self.stop, idle_timeout)
+        self.packet_count = 0
+        self.bytes_read = 0
+        self.packets: Optional[PacketList] = None
+        self.error: Optional[Exception] = None
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def _on_progress(self, packets: int, bytes_read: int):
+        self.packet_count = packets
+        self.bytes_read = bytes_read
+
+    def _run(self):
+        try:
+            self.packets = read_capture(self.stream, self._on_progress, progress_every=1000)
+        except Exception as e:
+            self.error = e
+        finally:
+            self.stream.close()
+            if not self.stop.is_set():
+                self.packets = None  # Idle timeout: a partial decode is of no use
+
+    def is_alive(self) -> bool:
+        return self.thread.is_alive()
+
+    def finish(self, total_size: int) -> Optional[PacketList]:
+        """
+        Blocking: lets the decoder drain the now complete file.
+
+        Returns:
+            The decoded capture, or None if the decoder did not read all
+            `total_size` bytes (stopped idle, or the file failed to parse)
+        """
+        self.stop.set()
+        self.thread.join()
+        if self.error is not None or self.bytes_read != total_size:
+            return None
+        return self.packets
+
+    def cancel(self):
+        self.stop.set()
@@ -0,0 +1,25 @@
+import uuid
+from sqlalchemy import BigInteger, Column, DateTime, String
+from sqlalchemy.sql import func
+from database import Base
+
+
+class UploadSession(Base):
+    """
+    A chunked upload in progress. Chunks are appended in order, so
+    received_bytes is both the stored prefix length and the offset the
+    client resumes from.
+    """
+
+    __tablename__ = "upload_sessions"
+
+    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    user_id = Column(String, nullable=False)
+    filename = Column(String, nullable=False)
+    total_size = Column(BigInteger, nullable=False)
+    received_bytes = Column(BigInteger, nullable=False, default=0)
+    status = Column(String, nullable=False, default="receiving")  # receiving / complete / aborted
+    sha256 = Column(String, nullable=True)  # Hex digest, set on completion
+    pcapng_id = Column(String, nullable=True)  # Stored capture, set on completion
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -0,0 +1,45 @@
+from pydantic import BaseModel, Field, field_validator
+from datetime import datetime
+from pathlib import PurePosixPath
+from typing import Optional
+from analysis_storage.schema import DetailLevel
+from analysis_service.heavy_hitters.crud import DEFAULT_TOP_K
+from analysis_service.profile.schema import DEFAULT_PROFILE, AnalysisProfile
+
+class UploadSessionCreate(BaseModel):
+    user_id: str
+    filename: str
+    size: int = Field(ge=1)  # Total capture size in bytes
+
+    @field_validator("filename")
+    @classmethod
+    def base_name(cls, filename: str) -> str:
+        """
+        The capture is stored as UPLOAD_DIR / filename: keep only the name
+        itself, and refuse dot names (the caches are dot directories there).
+        """
+        name = PurePosixPath(filename.replace("\\", "/")).name
+        if not name or name.startswith("."):
+            raise ValueError("filename must name a file")
+        return name
+
+class UploadSessionResponse(BaseModel):
+    id: str
+    user_id: str
+    filename: str
+    total_size: int
+    received_bytes: int  # Offset of the next chunk
+    status: str
+    chunk_size: int  # Suggested bytes per PUT
+    decoded_packets: Optional[int] = None  # Packets already decoded from the received prefix
+    sha256: Optional[str] = None
+    pcapng_id: Optional[str] = None
+    created_at: datetime
+    updated_at: datetime
+
+class UploadComplete(BaseModel):
+    sha256: Optional[str] = None  # Checked against the received bytes when given
+    detail: DetailLevel = DetailLevel.FLOWS
+    top_k: int = Field(DEFAULT_TOP_K, ge=1)
+    profile: AnalysisProfile = DEFAULT_PROFILE
+    background: bool = False